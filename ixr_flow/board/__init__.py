@@ -1 +1,8 @@
+from .board_buffer import BoardBuffer, SampleRing
+from .board_description import BoardDescription
+from .board_state import BoardState, BoardStateBus
 from .brainflow_handler import BrainFlowHandler
+from .data_ready import DataReadyNotifier
+from .health_monitor import Backoff, HealthMonitor
+from .shared_board_buffer import SharedBoardBuffer, SharedBoardStateBus, SharedDataReadyNotifier, SharedSampleRing
+from .simulated_board import PlaybackBoard, SimulatedBoard, SyntheticBoard
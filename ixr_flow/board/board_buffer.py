@@ -0,0 +1,127 @@
+import math
+from threading import Lock
+
+import numpy as np
+import numpy.typing as npt
+from brainflow import BoardShim, BrainFlowError, BrainFlowExitCodes, BrainFlowPresets
+
+
+class SampleRing:
+    """Preallocated ring buffer of the board data of one preset, samples in columns, written by a single thread and
+    read by any number of threads.
+
+    Every sample is stored twice, capacity apart, so the latest samples, up to capacity, are always contiguous and
+    are returned as a read-only view instead of a copy. A view stays valid until the ring is overwritten, i.e.
+    until capacity minus its length samples more have been written.
+
+    :param num_rows: Number of rows of the board data.
+    :type num_rows: int
+    :param capacity: Maximum number of samples held.
+    :type capacity: int
+    """
+
+    def __init__(self, num_rows: int, capacity: int) -> None:
+        self.capacity = capacity
+        self.data = np.zeros((num_rows, 2 * capacity))
+        self.count = 0  # number of samples written since creation.
+        self.lock = Lock()
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def write(self, data: npt.NDArray[np.float64]) -> None:
+        """Appends board data, only the latest capacity samples are kept.
+
+        :param data: Board data, shape (rows, samples).
+        :type data: npt.NDArray[np.float64]
+        """
+        num_samples = data.shape[1]
+        data = data[:, -self.capacity:]
+        with self.lock:
+            first = (self.count + num_samples - data.shape[1]) % self.capacity
+            # the samples wrap around the end of the ring at most once, write each part to both copies.
+            head = min(data.shape[1], self.capacity - first)
+            for start, part in ((first, data[:, :head]), (0, data[:, head:])):
+                self.data[:, start:start + part.shape[1]] = part
+                self.data[:, start + self.capacity:start + self.capacity + part.shape[1]] = part
+            self.count += num_samples
+
+    def latest(self, num_samples: int) -> npt.NDArray[np.float64]:
+        """Returns the latest samples as read-only view, fewer if fewer samples are held.
+
+        :param num_samples: Maximum number of samples.
+        :type num_samples: int
+        :return: Returns board data, shape (rows, samples).
+        :rtype: npt.NDArray[np.float64]
+        """
+        with self.lock:
+            num_samples = max(0, min(num_samples, len(self)))
+            end = (self.count - 1) % self.capacity + self.capacity + 1 if self.count > 0 else self.capacity
+            view = self.data[:, end - num_samples:end]
+        view.flags.writeable = False
+        return view
+
+
+class BoardBuffer:
+    """Shares the samples acquired from a board between all consumers: the dashboard, the data publisher and the
+    classifiers. The acquisition loop, see `BrainFlowHandler`, drains the samples of each preset from the board once
+    and writes them to a `SampleRing` per preset, holding window_s of samples.
+
+    Stands in for the board for consumers: `get_current_board_data` returns a read-only view on the ring instead of
+    a copy out of the Brainflow ring buffer, copy the data before modifying it. All other calls, e.g. the board
+    description, go to the board itself. Samples are only taken from the board by the acquisition loop.
+
+    :param board_shim: Board to share the samples of.
+    :type board_shim: BoardShim
+    :param window_s: Time span of samples held per preset, the longest window consumers read, in s.
+    :type window_s: float
+    """
+
+    def __init__(self, board_shim: BoardShim, window_s: float) -> None:
+        self.board_shim = board_shim
+        self.window_s = window_s
+        board_id = board_shim.get_board_id()
+        self.rings = {}
+        for preset in [BrainFlowPresets.DEFAULT_PRESET, BrainFlowPresets.AUXILIARY_PRESET,
+                       BrainFlowPresets.ANCILLARY_PRESET]:
+            try:
+                capacity = math.ceil(board_shim.get_sampling_rate(board_id, preset) * window_s)
+                self.rings[preset] = SampleRing(board_shim.get_num_rows(board_id, preset), capacity)
+            except BrainFlowError:
+                pass  # preset not supported by this board.
+
+    def __getattr__(self, name: str) -> any:
+        return getattr(self.board_shim, name)
+
+    def write(self, preset: BrainFlowPresets, data: npt.NDArray[np.float64]) -> None:
+        """Appends board data drained from the board, called by the acquisition loop only.
+
+        :param preset: Brainflow preset of the data.
+        :type preset: BrainFlowPresets
+        :param data: Board data, shape (rows, samples).
+        :type data: npt.NDArray[np.float64]
+        """
+        self._ring(preset).write(data)
+
+    def get_board_data_count(self, preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> int:
+        return len(self._ring(preset))
+
+    def get_current_board_data(self, num_samples: int,
+                               preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> npt.NDArray[np.float64]:
+        """Returns the latest num_samples samples, fewer if fewer samples are held, as read-only view.
+
+        :param num_samples: Maximum number of samples.
+        :type num_samples: int
+        :param preset: Brainflow preset, defaults to BrainFlowPresets.DEFAULT_PRESET
+        :type preset: BrainFlowPresets, optional
+        :return: Returns board data, shape (rows, samples).
+        :rtype: npt.NDArray[np.float64]
+        """
+        return self._ring(preset).latest(num_samples)
+
+    def _ring(self, preset: BrainFlowPresets) -> SampleRing:
+        try:
+            return self.rings[preset]
+        except KeyError:
+            raise BrainFlowError(f"Preset {preset} is not supported by the board",
+                                 BrainFlowExitCodes.UNSUPPORTED_BOARD_ERROR) from None
@@ -0,0 +1,96 @@
+from brainflow import BoardShim, BrainFlowError, BrainFlowExitCodes, BrainFlowPresets
+
+
+class BoardDescription:
+    """Describes a board as the static methods of a Brainflow BoardShim do, from the board description of each
+    supported preset, see `BoardShim.get_board_descr`. The methods take a board id, as those of BoardShim do, but
+    always describe this board.
+
+    Stands in for the board where there is no BoardShim, e.g. in processes reading the samples of a board acquired
+    in another process.
+
+    :param board_id: Board id reported by the board.
+    :type board_id: int
+    :param descriptions: Brainflow board description of each supported preset.
+    :type descriptions: dict[BrainFlowPresets, dict]
+    """
+
+    def __init__(self, board_id: int, descriptions: dict[BrainFlowPresets, dict]) -> None:
+        self.board_id = board_id
+        self.descriptions = {int(preset): description for preset, description in descriptions.items()}
+
+    @staticmethod
+    def describe(board_shim: BoardShim) -> dict[BrainFlowPresets, dict]:
+        """Returns the board description of each preset supported by a board.
+
+        :param board_shim: Board to describe.
+        :type board_shim: BoardShim
+        :return: Returns the board description by preset.
+        :rtype: dict[BrainFlowPresets, dict]
+        """
+        descriptions = {}
+        for preset in [BrainFlowPresets.DEFAULT_PRESET, BrainFlowPresets.AUXILIARY_PRESET,
+                       BrainFlowPresets.ANCILLARY_PRESET]:
+            try:
+                descriptions[preset] = board_shim.get_board_descr(board_shim.get_board_id(), preset)
+            except BrainFlowError:
+                pass  # preset not supported by this board.
+        return descriptions
+
+    def get_board_id(self) -> int:
+        return self.board_id
+
+    def get_board_descr(self, board_id: int, preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> dict:
+        return dict(self._description(preset))
+
+    def get_sampling_rate(self, board_id: int, preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> int:
+        return self._field(preset, 'sampling_rate')
+
+    def get_num_rows(self, board_id: int, preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> int:
+        return self._field(preset, 'num_rows')
+
+    def get_timestamp_channel(self, board_id: int,
+                              preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> int:
+        return self._field(preset, 'timestamp_channel')
+
+    def get_marker_channel(self, board_id: int, preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> int:
+        return self._field(preset, 'marker_channel')
+
+    def get_package_num_channel(self, board_id: int,
+                                preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> int:
+        return self._field(preset, 'package_num_channel')
+
+    def get_eeg_names(self, board_id: int, preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> list[str]:
+        return self._field(preset, 'eeg_names').split(',')
+
+    def get_eeg_channels(self, board_id: int, preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> list[int]:
+        return self._field(preset, 'eeg_channels')
+
+    def get_other_channels(self, board_id: int,
+                           preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> list[int]:
+        return self._field(preset, 'other_channels')
+
+    def get_accel_channels(self, board_id: int,
+                           preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> list[int]:
+        return self._field(preset, 'accel_channels')
+
+    def get_gyro_channels(self, board_id: int,
+                          preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> list[int]:
+        return self._field(preset, 'gyro_channels')
+
+    def get_ppg_channels(self, board_id: int, preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> list[int]:
+        return self._field(preset, 'ppg_channels')
+
+    def _description(self, preset: BrainFlowPresets) -> dict:
+        try:
+            return self.descriptions[int(preset)]
+        except KeyError:
+            raise BrainFlowError(f"Preset {preset} is not supported by the board",
+                                 BrainFlowExitCodes.UNSUPPORTED_BOARD_ERROR) from None
+
+    def _field(self, preset: BrainFlowPresets, field: str) -> int | str | list[int]:
+        description = self._description(preset)
+        if field not in description:
+            raise BrainFlowError(f"No {field} in the description of the board",
+                                 BrainFlowExitCodes.NO_SUCH_DATA_IN_JSON_ERROR)
+        return description[field]
@@ -0,0 +1,79 @@
+import logging
+import time
+from enum import Enum
+from threading import Condition
+
+
+class BoardState(Enum):
+    """State of the board connection.
+
+    - connecting: No Brainflow session, a session is being prepared.
+    - ready: The session is prepared and samples are arriving.
+    - stalled: The session is prepared, but no samples arrived for a while.
+    - lost: No samples arrived within the connection timeout, the session is released and prepared again.
+    """
+    CONNECTING = 'connecting'
+    READY = 'ready'
+    STALLED = 'stalled'
+    LOST = 'lost'
+
+
+class BoardStateBus:
+    """Shares the state of the board connection, see `BoardState`, between threads.
+    Threads depending on board data block on the bus until the board is ready, instead of polling the board.
+
+    The bus is fed by the thread that watches the board, see `BrainFlowHandler`.
+    """
+
+    def __init__(self) -> None:
+        self.condition = Condition()
+        self.state = BoardState.CONNECTING
+        self.since = time.time()  # time of the latest transition.
+        self.transitions = 0
+
+    def publish(self, state: BoardState) -> None:
+        """Transitions to state, and wakes up waiting threads. Publishing the current state does nothing.
+
+        :param state: New state.
+        :type state: BoardState
+        """
+        with self.condition:
+            if state == self.state:
+                return
+            logging.info(f"Board {state.value}, was {self.state.value} for {time.time() - self.since:.1f} s.")
+            self.state = state
+            self.since = time.time()
+            self.transitions += 1
+            self.condition.notify_all()
+
+    def is_ready(self) -> bool:
+        """Returns if samples are arriving, without blocking.
+
+        :return: Returns True if the board is ready.
+        :rtype: bool
+        """
+        return self.state == BoardState.READY
+
+    def wait_for(self, states: list[BoardState], timeout: float | None = None) -> bool:
+        """Blocks until the board is in one of the given states.
+
+        :param states: States to wait for.
+        :type states: list[BoardState]
+        :param timeout: Maximum time to wait, in seconds, defaults to None (no timeout)
+        :type timeout: float | None, optional
+        :return: Returns True if the board is in one of the states, False if the timeout expired.
+        :rtype: bool
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.state in states,
+                                           timeout=max(timeout, 0.0) if timeout is not None else None)
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Blocks until samples are arriving.
+
+        :param timeout: Maximum time to wait, in seconds, defaults to None (no timeout)
+        :type timeout: float | None, optional
+        :return: Returns True if the board is ready, False if the timeout expired.
+        :rtype: bool
+        """
+        return self.wait_for([BoardState.READY], timeout)
@@ -1,10 +1,19 @@
 import logging
+import math
+from multiprocessing.synchronize import Condition
 from threading import Event, Thread
 from time import sleep, time
 
 from brainflow import (BoardIds, BoardShim, BrainFlowError, BrainFlowExitCodes,
                        BrainFlowInputParams, BrainFlowPresets)
 
+from .board_buffer import BoardBuffer
+from .board_state import BoardState, BoardStateBus
+from .data_ready import DataReadyNotifier
+from .health_monitor import Backoff, HealthMonitor
+from .shared_board_buffer import SharedBoardBuffer
+from .simulated_board import SimulatedBoard
+
 
 class BrainFlowHandler(Thread):
     def __init__(self,
@@ -20,34 +29,96 @@ class BrainFlowHandler(Thread):
         self.streamer_params = streamer_params
         self.stay_alive = stay_alive
         self.time_out = params.timeout
-        self.ringbuffer_size = 45_000
+        self.poll_interval = 0.005  # in s, interval at which new samples are drained from the board.
+        self.stalled_poll_interval = 0.1  # in s, interval at which a stalled board is checked for new samples.
+        self.stall_timeout = 1.0  # in s, time without new samples after which the board is considered stalled.
+        self.stats_interval = 60.0  # in s, interval at which the connection health is logged.
+        # the timeouts are checked against the clock the samples are timestamped on, a simulated board may run
+        # faster than the wall clock, see `SimulatedBoard.time`.
+        self.clock = board_shim.time if isinstance(board_shim, SimulatedBoard) else time
+        # delay between failed attempts to prepare a session, so no CPU is burnt while the headset is off.
+        self.backoff = Backoff()
+        self.data_ready = DataReadyNotifier()
+        self.board_state = BoardStateBus()
+        self.timestamp_channels = {}
+        sampling_rates = {}
+        for preset in [BrainFlowPresets.DEFAULT_PRESET, BrainFlowPresets.AUXILIARY_PRESET,
+                       BrainFlowPresets.ANCILLARY_PRESET]:
+            try:
+                self.timestamp_channels[preset] = self.board_shim.get_timestamp_channel(self.board_id, preset)
+                sampling_rates[preset] = self.board_shim.get_sampling_rate(self.board_id, preset)
+            except BrainFlowError:
+                pass  # preset not supported by this board.
+        # in s, longest window of samples consumers read, with margin: the dashboard plots 10 s,
+        # and classifiers bridge up to 10 s of filter history.
+        self.window_s = 30.0
+        # in s, samples Brainflow buffers until they are drained, covering stalled polling.
+        self.drain_margin_s = 10.0
+        # Brainflow's ring buffer only holds samples until they are drained, sized for the fastest preset.
+        self.ringbuffer_size = math.ceil(max(sampling_rates.values()) * self.drain_margin_s)
+        self.board_buffer = BoardBuffer(self.board_shim, self.window_s)
+        self.health = HealthMonitor(sampling_rates)
+
+    def share(self, condition: Condition) -> SharedBoardBuffer:
+        """Moves the board buffer, the board state and the latest timestamps to shared memory, so consumers in
+        other processes read the samples of the board, see `SharedBoardBuffer`. Call before the thread is started.
+
+        :param condition: Condition shared with the processes of the consumers.
+        :type condition: Condition
+        :return: Returns the shared board buffer, the consumers attach to it with its spec.
+        :rtype: SharedBoardBuffer
+        """
+        self.board_buffer = SharedBoardBuffer.create(self.board_shim, self.window_s, condition)
+        self.board_state = self.board_buffer.board_state
+        self.data_ready = self.board_buffer.data_ready
+        return self.board_buffer
 
     def run(self) -> None:
+        last_timestamp = self.clock()
+        last_stats = time()
         while self.stay_alive.is_set():
             if not self.board_shim.is_prepared():
                 logging.info("Starting brainflow session.")
-                last_timestamp = 0.0
+                self.board_state.publish(BoardState.CONNECTING)
+                self.data_ready.reset()
+                self.health.connecting()
                 try:
                     self._prepare_board()
+                    self.health.prepared()
                     logging.info("Succesfully started brainflow session.")
-                    # Brainflow and the Muse S need a few seconds after board preparation to actually start sending data.
-                    sleep(2)
+                    # the connection time out counts from the moment the session was prepared.
+                    last_timestamp = self.clock()
                 except BrainFlowError as e:
                     if e.exit_code == BrainFlowExitCodes.BOARD_NOT_READY_ERROR:
                         pass  # Brainflow throws this error if no board is found, ignore.
                     else:
                         raise e
-                    logging.info("Failed to prepare sessions, trying again.")
-            else:  # if board_shim is prepared, keep checking for incoming data.
-                data_timestamp = self.board_shim.get_current_board_data(1, BrainFlowPresets.DEFAULT_PRESET)[
-                    self.board_shim.get_timestamp_channel(self.board_id, BrainFlowPresets.DEFAULT_PRESET)]
-                if len(data_timestamp) > 0:
-                    last_timestamp = float(data_timestamp)
-                # after timeout of no data received, consider connection dead.
-                current_time = time()
+                    self.health.attempt_failed()
+                    delay = self.backoff.next()
+                    logging.info(f"Failed to prepare sessions, trying again in {delay:.1f} s.")
+                    self._wait(delay)
+            else:  # if board_shim is prepared, keep draining incoming data.
+                self._acquire()
+                latest_timestamp = self.data_ready.latest(BrainFlowPresets.DEFAULT_PRESET)
+                last_timestamp = max(last_timestamp, latest_timestamp)
+                current_time = self.clock()
                 if current_time - last_timestamp > self.time_out:
+                    # after timeout of no data received, consider connection dead.
                     logging.warning("Brainflow session connection time out, trying to reconnect.")
+                    self.board_state.publish(BoardState.LOST)
                     self.board_shim.release_session()
+                elif latest_timestamp > 0:  # the board is ready as soon as the first valid samples arrive.
+                    was_connecting = self.board_state.state == BoardState.CONNECTING
+                    self.board_state.publish(BoardState.STALLED if current_time - latest_timestamp > self.stall_timeout
+                                             else BoardState.READY)
+                    if was_connecting:
+                        self.backoff.reset()
+                        logging.info(f"First samples arrived after {self.health.time_to_first_sample:.2f} s.")
+                if time() - last_stats > self.stats_interval:
+                    last_stats = time()
+                    logging.info(f"Board health: {self.health.stats()}")
+                sleep(self.poll_interval if self.board_state.is_ready() else self.stalled_poll_interval)
+        logging.info(f"Board health: {self.health.stats()}")
 
     def __del__(self) -> None:
         self.release_brainflow()
@@ -59,6 +130,31 @@ class BrainFlowHandler(Thread):
         except BrainFlowError as e:
             logging.exception(e)
 
+    def _acquire(self) -> None:
+        """Drains the new samples of each preset from the board into the shared board buffer, and passes the
+        timestamp of the latest sample on to the data ready notifier, once the samples are in the buffer.
+        Samples with invalid timestamps, see `HealthMonitor`, are buffered, but do not count as arrived.
+        """
+        for preset, timestamp_channel in self.timestamp_channels.items():
+            try:
+                data = self.board_shim.get_board_data(preset=preset)
+            except BrainFlowError as e:
+                # Right after board preparation the Brainflow connection might be a bit unstable.
+                # In that case Brainflow throws an INVALID_ARGUMENTS_ERROR exception, try again later.
+                if e.exit_code == BrainFlowExitCodes.INVALID_ARGUMENTS_ERROR:
+                    continue
+                raise e
+            if data.shape[1] > 0:
+                self.board_buffer.write(preset, data)
+                if self.health.update(preset, data[timestamp_channel]):
+                    self.data_ready.update(preset, float(data[timestamp_channel, -1]))
+
+    def _wait(self, duration: float) -> None:
+        """Sleeps for duration, returning early once the thread should stop."""
+        end = time() + duration
+        while self.stay_alive.is_set() and time() < end:
+            sleep(min(self.stalled_poll_interval, end - time()))
+
     def _prepare_board(self) -> None:
         self.board_shim.prepare_session()
         if self.board_id in [BoardIds.MUSE_2_BOARD, BoardIds.MUSE_S_BOARD]:
@@ -0,0 +1,61 @@
+from threading import Condition
+
+from brainflow import BrainFlowPresets
+
+
+class DataReadyNotifier:
+    """Keeps track of the timestamp of the latest sample received per Brainflow preset,
+    and wakes up waiting threads as soon as new samples arrive.
+
+    The notifier is fed by the thread that watches the board, see `BrainFlowHandler`.
+    """
+
+    def __init__(self) -> None:
+        self.condition = Condition()
+        self.latest_timestamps = {}
+
+    def update(self, preset: BrainFlowPresets, timestamp: float) -> None:
+        """Registers the timestamp of the latest sample of a preset, notifies waiting threads if it is newer.
+
+        :param preset: Brainflow preset the sample belongs to.
+        :type preset: BrainFlowPresets
+        :param timestamp: Timestamp of the latest sample, in seconds.
+        :type timestamp: float
+        """
+        with self.condition:
+            if timestamp > self.latest_timestamps.get(preset, 0.0):
+                self.latest_timestamps[preset] = timestamp
+                self.condition.notify_all()
+
+    def reset(self) -> None:
+        """Forgets all latest timestamps, e.g. after the board connection has been lost."""
+        with self.condition:
+            self.latest_timestamps.clear()
+
+    def latest(self, preset: BrainFlowPresets) -> float:
+        """Returns the timestamp of the latest sample of a preset, 0.0 if nothing has been received yet.
+
+        :param preset: Brainflow preset.
+        :type preset: BrainFlowPresets
+        :return: Returns the latest timestamp, in seconds.
+        :rtype: float
+        """
+        with self.condition:
+            return self.latest_timestamps.get(preset, 0.0)
+
+    def wait_for(self, presets: list[BrainFlowPresets], timestamp: float, timeout: float) -> bool:
+        """Blocks until samples stamped at or after timestamp have been received for all given presets.
+
+        :param presets: Brainflow presets to wait for.
+        :type presets: list[BrainFlowPresets]
+        :param timestamp: Timestamp to wait for, in seconds.
+        :type timestamp: float
+        :param timeout: Maximum time to wait, in seconds.
+        :type timeout: float
+        :return: Returns True if the data is ready, False if the timeout expired.
+        :rtype: bool
+        """
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: all(self.latest_timestamps.get(preset, 0.0) >= timestamp for preset in presets),
+                timeout=max(timeout, 0.0))
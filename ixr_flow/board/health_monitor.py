@@ -0,0 +1,156 @@
+import math
+import random
+import time
+from collections import deque
+from threading import Lock
+
+import numpy as np
+import numpy.typing as npt
+from brainflow import BrainFlowPresets
+
+
+class Backoff:
+    """Jittered exponential backoff between attempts to connect to the board. The delay doubles after every failed
+    attempt, up to maximum, and is drawn at random between (1 - jitter) and 1 times that delay, so boards that failed
+    together do not retry in lockstep.
+
+    :param initial: Delay after the first failed attempt, in s, defaults to 0.5
+    :type initial: float, optional
+    :param maximum: Maximum delay, in s, defaults to 10.0
+    :type maximum: float, optional
+    :param factor: Growth of the delay per failed attempt, defaults to 2.0
+    :type factor: float, optional
+    :param jitter: Fraction of the delay drawn at random, defaults to 0.5
+    :type jitter: float, optional
+    """
+
+    def __init__(self, initial: float = 0.5, maximum: float = 10.0, factor: float = 2.0, jitter: float = 0.5) -> None:
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0  # number of failed attempts since the latest reset.
+
+    def next(self) -> float:
+        """Registers a failed attempt, and returns the delay before the next attempt.
+
+        :return: Returns the delay, in s.
+        :rtype: float
+        """
+        delay = min(self.maximum, self.initial * self.factor ** min(self.attempts, 64))
+        self.attempts += 1
+        return delay * random.uniform(1.0 - self.jitter, 1.0)
+
+    def reset(self) -> None:
+        """Starts over from the initial delay, e.g. once the board delivers samples."""
+        self.attempts = 0
+
+
+class HealthMonitor:
+    """Watches the health of the board connection: whether valid samples arrive, at which rate per Brainflow preset
+    compared to the nominal sampling rate, how long it took from connecting to the first sample, and how often the
+    board had to be reconnected. The stream is ready as soon as the first valid samples arrive, samples are valid
+    if their timestamps are finite and positive.
+
+    The monitor is fed by the thread that watches the board, see `BrainFlowHandler`, and read by any thread.
+
+    :param nominal_rates: Nominal sampling rate per Brainflow preset, in Hz.
+    :type nominal_rates: dict[BrainFlowPresets, float]
+    :param rate_window: Time span of samples the rate is measured over, in s of sample timestamps, defaults to 5.0
+    :type rate_window: float, optional
+    """
+
+    def __init__(self, nominal_rates: dict[BrainFlowPresets, float], rate_window: float = 5.0) -> None:
+        self.nominal_rates = nominal_rates
+        self.rate_window = rate_window
+        self.lock = Lock()
+        self.arrivals = {preset: deque() for preset in nominal_rates}  # (latest timestamp, total samples) per drain.
+        self.total_samples = {preset: 0 for preset in nominal_rates}
+        self.sessions = 0  # number of sessions prepared.
+        self.failed_attempts = 0
+        self.connecting_since = None  # time connecting started, None once samples arrive.
+        self.time_to_first_sample = None  # in s, of the latest connection.
+        self.last_sample_time = None  # time the latest valid samples arrived.
+
+    @property
+    def reconnects(self) -> int:
+        """Number of sessions prepared after the first one."""
+        return max(self.sessions - 1, 0)
+
+    def connecting(self) -> None:
+        """Registers that the board is being connected, after start up or after the connection has been lost.
+        The time to the first sample is measured from the first call until samples arrive.
+        """
+        with self.lock:
+            if self.connecting_since is None:
+                self.connecting_since = time.time()
+            for arrivals in self.arrivals.values():
+                arrivals.clear()
+
+    def attempt_failed(self) -> None:
+        """Registers a failed attempt to prepare a session."""
+        with self.lock:
+            self.failed_attempts += 1
+
+    def prepared(self) -> None:
+        """Registers that a session has been prepared, the stream is ready once samples arrive."""
+        with self.lock:
+            self.sessions += 1
+
+    def update(self, preset: BrainFlowPresets, timestamps: npt.NDArray[np.float64]) -> bool:
+        """Registers the timestamps of samples drained from the board.
+
+        :param preset: Brainflow preset the samples belong to.
+        :type preset: BrainFlowPresets
+        :param timestamps: Timestamps of the samples, in s.
+        :type timestamps: npt.NDArray[np.float64]
+        :return: Returns True if the samples are valid.
+        :rtype: bool
+        """
+        if len(timestamps) == 0 or not np.isfinite(timestamps).all() or timestamps[-1] <= 0:
+            return False
+        now = time.time()
+        with self.lock:
+            self.total_samples[preset] += len(timestamps)
+            arrivals = self.arrivals[preset]
+            arrivals.append((float(timestamps[-1]), self.total_samples[preset]))
+            while len(arrivals) > 2 and arrivals[-1][0] - arrivals[1][0] >= self.rate_window:
+                arrivals.popleft()
+            self.last_sample_time = now
+            if self.connecting_since is not None:
+                self.time_to_first_sample = now - self.connecting_since
+                self.connecting_since = None
+        return True
+
+    def measured_rate(self, preset: BrainFlowPresets) -> float:
+        """Returns the rate samples arrived at over the rate window, by their timestamps.
+
+        :param preset: Brainflow preset.
+        :type preset: BrainFlowPresets
+        :return: Returns the rate, in Hz, NaN if too few samples arrived to measure it.
+        :rtype: float
+        """
+        with self.lock:
+            arrivals = self.arrivals[preset]
+            if len(arrivals) < 2 or arrivals[-1][0] <= arrivals[0][0]:
+                return math.nan
+            return (arrivals[-1][1] - arrivals[0][1]) / (arrivals[-1][0] - arrivals[0][0])
+
+    def stats(self) -> dict:
+        """Returns the number of reconnects and failed attempts, the time to the first sample of the latest
+        connection, the time since the latest samples arrived, and per preset the nominal and measured sampling rate.
+        Times are in s and rates in Hz, None if not known yet.
+
+        :return: Returns the statistics.
+        :rtype: dict
+        """
+        rates = {preset: self.measured_rate(preset) for preset in self.nominal_rates}
+        with self.lock:
+            return {'reconnects': self.reconnects, 'failed_attempts': self.failed_attempts,
+                    'time_to_first_sample': self.time_to_first_sample,
+                    'time_since_last_sample': time.time() - self.last_sample_time
+                    if self.last_sample_time is not None else None,
+                    'presets': {BrainFlowPresets(preset).name.lower(): {
+                        'nominal_rate': self.nominal_rates[preset],
+                        'measured_rate': None if math.isnan(rates[preset]) else rates[preset]}
+                        for preset in self.nominal_rates}}
@@ -0,0 +1,263 @@
+import math
+import time
+import uuid
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.synchronize import Condition
+from threading import Lock
+
+import numpy as np
+import numpy.typing as npt
+from brainflow import BoardShim, BrainFlowError, BrainFlowExitCodes, BrainFlowPresets
+
+from .board_buffer import SampleRing
+from .board_description import BoardDescription
+from .board_state import BoardState, BoardStateBus
+from .data_ready import DataReadyNotifier
+
+# layout of the header at the start of the shared memory, in 8 byte slots: as integers the board state, the number
+# of state transitions and per preset the number of samples written, then as floats the time of the latest state
+# transition and per preset the latest timestamp. The rings of the presets follow the header.
+STATES = list(BoardState)
+STATE, TRANSITIONS, COUNTS = 0, 1, 2
+SINCE, LATEST = 0, 1
+NUM_PRESETS = 3
+HEADER_SLOTS = 2 + NUM_PRESETS
+
+
+class SharedSampleRing(SampleRing):
+    """`SampleRing` in shared memory, written by a single process and read by any number of processes.
+
+    The samples are written before the count, so readers in other processes see complete samples only.
+
+    :param data: Ring data, rows by twice the capacity, in shared memory.
+    :type data: npt.NDArray[np.float64]
+    :param counts: Header slots holding the number of samples written, in shared memory.
+    :type counts: npt.NDArray[np.int64]
+    :param index: Slot of this ring in counts.
+    :type index: int
+    """
+
+    def __init__(self, data: npt.NDArray[np.float64], counts: npt.NDArray[np.int64], index: int) -> None:
+        self.capacity = data.shape[1] // 2
+        self.data = data
+        self.counts = counts
+        self.index = index
+        self.lock = Lock()  # only guards threads of this process.
+
+    @property
+    def count(self) -> int:
+        return int(self.counts[self.index])
+
+    @count.setter
+    def count(self, value: int) -> None:
+        self.counts[self.index] = value
+
+
+class SharedBoardStateBus(BoardStateBus):
+    """`BoardStateBus` in shared memory, shared between processes, see `SharedBoardBuffer`.
+
+    :param ints: Integer header slots, in shared memory.
+    :type ints: npt.NDArray[np.int64]
+    :param floats: Float header slots, in shared memory.
+    :type floats: npt.NDArray[np.float64]
+    :param condition: Condition shared between the processes.
+    :type condition: Condition
+    """
+
+    def __init__(self, ints: npt.NDArray[np.int64], floats: npt.NDArray[np.float64], condition: Condition) -> None:
+        self.ints = ints
+        self.floats = floats
+        self.condition = condition
+
+    @property
+    def state(self) -> BoardState:
+        return STATES[self.ints[STATE]]
+
+    @state.setter
+    def state(self, value: BoardState) -> None:
+        self.ints[STATE] = STATES.index(value)
+
+    @property
+    def since(self) -> float:
+        return float(self.floats[SINCE])
+
+    @since.setter
+    def since(self, value: float) -> None:
+        self.floats[SINCE] = value
+
+    @property
+    def transitions(self) -> int:
+        return int(self.ints[TRANSITIONS])
+
+    @transitions.setter
+    def transitions(self, value: int) -> None:
+        self.ints[TRANSITIONS] = value
+
+
+class _SharedTimestamps:
+    """Latest timestamp per preset in shared memory, with the part of the dict interface used by
+    `DataReadyNotifier`, 0.0 stands for no timestamp."""
+
+    def __init__(self, floats: npt.NDArray[np.float64]) -> None:
+        self.floats = floats
+
+    def get(self, preset: BrainFlowPresets, default: float) -> float:
+        timestamp = float(self.floats[LATEST + int(preset)])
+        return timestamp if timestamp > 0.0 else default
+
+    def __setitem__(self, preset: BrainFlowPresets, timestamp: float) -> None:
+        self.floats[LATEST + int(preset)] = timestamp
+
+    def clear(self) -> None:
+        self.floats[LATEST:LATEST + NUM_PRESETS] = 0.0
+
+
+class SharedDataReadyNotifier(DataReadyNotifier):
+    """`DataReadyNotifier` in shared memory, shared between processes, see `SharedBoardBuffer`.
+
+    :param floats: Float header slots, in shared memory.
+    :type floats: npt.NDArray[np.float64]
+    :param condition: Condition shared between the processes.
+    :type condition: Condition
+    """
+
+    def __init__(self, floats: npt.NDArray[np.float64], condition: Condition) -> None:
+        self.condition = condition
+        self.latest_timestamps = _SharedTimestamps(floats)
+
+
+class SharedBoardBuffer(BoardDescription):
+    """Shares the samples acquired from a board between processes, as `BoardBuffer` does between threads: the
+    acquisition process writes the samples of each preset to a `SharedSampleRing`, consumers in other processes read
+    them as read-only views on the shared memory, without copying them between processes. The state of the board
+    connection and the latest timestamps are shared as well, see `board_state` and `data_ready`.
+
+    Stands in for the board for consumers, e.g. the dashboard, the data publisher and the classifiers, describing the
+    board, see `BoardDescription`. A session counts as prepared while the board is ready or stalled.
+
+    The buffer is created by the acquisition process, see `create`, which sends its `spec` to the other processes,
+    which attach to the buffer with it, see `attach`. Processes wait on a condition shared between all processes,
+    which is passed to the processes when they are started.
+
+    :param spec: Specification of the buffer, see `create`.
+    :type spec: dict
+    :param condition: Condition shared between the processes.
+    :type condition: Condition
+    :param create: Creates the shared memory instead of attaching to it, defaults to False
+    :type create: bool, optional
+    """
+
+    def __init__(self, spec: dict, condition: Condition, create: bool = False) -> None:
+        BoardDescription.__init__(self, spec['board_id'], spec['descriptions'])
+        self.spec = spec
+        self.window_s = spec['window_s']
+        shapes = {int(preset): (self.descriptions[int(preset)]['num_rows'], 2 * capacity)
+                  for preset, capacity in spec['capacities'].items()}
+        header_size = 2 * HEADER_SLOTS * 8
+        size = header_size + sum(rows * columns * 8 for rows, columns in shapes.values())
+        self.shared_memory = SharedMemory(spec['name'], create=create, size=size if create else 0)
+        buffer = self.shared_memory.buf
+        ints = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=buffer)
+        floats = np.ndarray((HEADER_SLOTS,), dtype=np.float64, buffer=buffer, offset=HEADER_SLOTS * 8)
+        if create:
+            ints[:] = 0  # connecting, no samples.
+            floats[:] = 0.0
+            floats[SINCE] = time.time()
+        self.rings = {}
+        offset = header_size
+        for preset, shape in shapes.items():
+            data = np.ndarray(shape, dtype=np.float64, buffer=buffer, offset=offset)
+            self.rings[preset] = SharedSampleRing(data, ints[COUNTS:], preset)
+            offset += data.nbytes
+        self.board_state = SharedBoardStateBus(ints, floats, condition)
+        self.data_ready = SharedDataReadyNotifier(floats, condition)
+
+    @classmethod
+    def create(cls, board_shim: BoardShim, window_s: float, condition: Condition) -> 'SharedBoardBuffer':
+        """Creates the buffer of a board in shared memory, holding window_s of samples per preset.
+
+        :param board_shim: Board to share the samples of.
+        :type board_shim: BoardShim
+        :param window_s: Time span of samples held per preset, in s.
+        :type window_s: float
+        :param condition: Condition shared between the processes.
+        :type condition: Condition
+        :return: Returns the buffer.
+        :rtype: SharedBoardBuffer
+        """
+        descriptions = cls.describe(board_shim)
+        spec = {'name': f'ixr_flow_{uuid.uuid4().hex[:16]}', 'board_id': int(board_shim.get_board_id()),
+                'window_s': window_s, 'descriptions': {int(preset): description
+                                                       for preset, description in descriptions.items()},
+                'capacities': {int(preset): math.ceil(description['sampling_rate'] * window_s)
+                               for preset, description in descriptions.items()}}
+        return cls(spec, condition, create=True)
+
+    @classmethod
+    def attach(cls, spec: dict, condition: Condition) -> 'SharedBoardBuffer':
+        """Attaches to the buffer created by another process.
+
+        :param spec: Specification of the buffer, see `spec` of the created buffer.
+        :type spec: dict
+        :param condition: Condition shared between the processes.
+        :type condition: Condition
+        :return: Returns the buffer.
+        :rtype: SharedBoardBuffer
+        """
+        return cls(spec, condition)
+
+    def unlink(self) -> None:
+        """Frees the shared memory once all processes have detached, called by the acquisition process."""
+        self.shared_memory.unlink()
+
+    @staticmethod
+    def remove(spec: dict) -> None:
+        """Frees the shared memory of a buffer which the acquisition process did not free, e.g. as it was terminated.
+        Nothing happens if it was freed already.
+
+        :param spec: Specification of the buffer, see `spec` of the created buffer.
+        :type spec: dict
+        """
+        try:
+            shared_memory = SharedMemory(spec['name'])
+        except FileNotFoundError:
+            return
+        shared_memory.close()
+        shared_memory.unlink()
+
+    def is_prepared(self) -> bool:
+        return self.board_state.state in [BoardState.READY, BoardState.STALLED]
+
+    def write(self, preset: BrainFlowPresets, data: npt.NDArray[np.float64]) -> None:
+        """Appends board data drained from the board, called by the acquisition process only.
+
+        :param preset: Brainflow preset of the data.
+        :type preset: BrainFlowPresets
+        :param data: Board data, shape (rows, samples).
+        :type data: npt.NDArray[np.float64]
+        """
+        self._ring(preset).write(data)
+
+    def get_board_data_count(self, preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> int:
+        return len(self._ring(preset))
+
+    def get_current_board_data(self, num_samples: int,
+                               preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> npt.NDArray[np.float64]:
+        """Returns the latest num_samples samples, fewer if fewer samples are held, as read-only view on the shared
+        memory.
+
+        :param num_samples: Maximum number of samples.
+        :type num_samples: int
+        :param preset: Brainflow preset, defaults to BrainFlowPresets.DEFAULT_PRESET
+        :type preset: BrainFlowPresets, optional
+        :return: Returns board data, shape (rows, samples).
+        :rtype: npt.NDArray[np.float64]
+        """
+        return self._ring(preset).latest(num_samples)
+
+    def _ring(self, preset: BrainFlowPresets) -> SharedSampleRing:
+        try:
+            return self.rings[int(preset)]
+        except KeyError:
+            raise BrainFlowError(f"Preset {preset} is not supported by the board",
+                                 BrainFlowExitCodes.UNSUPPORTED_BOARD_ERROR) from None
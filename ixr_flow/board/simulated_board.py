@@ -0,0 +1,331 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+import numpy as np
+import numpy.typing as npt
+from brainflow import BoardIds, BrainFlowError, BrainFlowExitCodes, BrainFlowPresets
+from pylsl import StreamInfo, StreamOutlet, cf_string, local_clock
+
+from ixr_flow.recording import SessionRecording
+
+from .board_description import BoardDescription
+
+
+class SimulatedBoard(BoardDescription, ABC):
+    """Stands in for a Brainflow BoardShim, so IXR-flow runs without a headset, e.g. to reproduce a run on any
+    machine. Implements the part of the BoardShim API used by IXR-flow: the board description, see
+    `BoardDescription`, the session and the ring buffer.
+
+    Samples are generated on demand: once the stream is started, a sample is available as soon as its timestamp
+    has passed on the clock of the board. At speed 1 this is the wall clock, at a higher speed the clock runs
+    faster from the moment the stream started, so timestamps run ahead of the wall clock. The health of the board
+    is checked on this clock, see `BrainFlowHandler`. The speed is at least 1, slower than real time consumers would
+    time out waiting for samples, as their timeouts run on the wall clock.
+
+    Subclasses define the samples, see `_num_generated` and `_generate`.
+
+    :param board_id: Board id reported by the board.
+    :type board_id: int
+    :param descriptions: Brainflow board description of each supported preset, see `BoardShim.get_board_descr`.
+    :type descriptions: dict[BrainFlowPresets, dict]
+    :param speed: Playback speed, relative to real time, at least 1.0, defaults to 1.0
+    :type speed: float, optional
+    :raises ValueError: If the speed is below 1.0.
+    """
+
+    def __init__(self, board_id: int, descriptions: dict[BrainFlowPresets, dict], speed: float = 1.0) -> None:
+        if not speed >= 1.0:
+            raise ValueError(f"Speed should be at least 1.0, got {speed}")
+        BoardDescription.__init__(self, board_id, descriptions)
+        self.speed = speed
+        self.prepared = False
+        self.start_time = None  # wall clock time at which the stream started, None while not streaming.
+        self.ringbuffer_size = 0
+        self.taken = {}  # per preset, number of the first sample not yet taken with `get_board_data`.
+        self.lock = Lock()
+
+    def time(self) -> float:
+        """Returns the current time on the clock of the board, see the class description.
+
+        :return: Returns the time, in s.
+        :rtype: float
+        """
+        now = time.time()
+        return self.start_time + (now - self.start_time) * self.speed if self.start_time is not None else now
+
+    def prepare_session(self) -> None:
+        self.prepared = True
+
+    def is_prepared(self) -> bool:
+        return self.prepared
+
+    def config_board(self, config: str) -> str:
+        """Accepts any config, the simulated board has nothing to configure."""
+        logging.debug(f"Simulated board ignores config '{config}'.")
+        return ''
+
+    def start_stream(self, num_samples: int = 450000, streamer_params: str | None = None) -> None:
+        if not self.prepared:
+            raise BrainFlowError("Simulated board session is not prepared", BrainFlowExitCodes.BOARD_NOT_CREATED_ERROR)
+        with self.lock:
+            self.ringbuffer_size = num_samples
+            self.taken = {}
+            self.start_time = time.time()
+
+    def stop_stream(self) -> None:
+        self.start_time = None
+
+    def release_session(self) -> None:
+        self.stop_stream()
+        self.prepared = False
+
+    def release_all_sessions(self) -> None:
+        self.release_session()
+
+    def get_board_data_count(self, preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> int:
+        return self._available(preset)[1]
+
+    def get_current_board_data(self, num_samples: int,
+                               preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> npt.NDArray[np.float64]:
+        """Returns the latest num_samples samples, or less if fewer are in the ring buffer, without taking them.
+
+        :param num_samples: Maximum number of samples.
+        :type num_samples: int
+        :param preset: Brainflow preset, defaults to BrainFlowPresets.DEFAULT_PRESET
+        :type preset: BrainFlowPresets, optional
+        :return: Returns Brainflow data, with samples in columns.
+        :rtype: npt.NDArray[np.float64]
+        """
+        start_time, generated, count = self._available(preset)
+        return self._generate(preset, start_time, generated - min(max(num_samples, 0), count), generated)
+
+    def get_board_data(self, num_samples: int | None = None,
+                       preset: BrainFlowPresets = BrainFlowPresets.DEFAULT_PRESET) -> npt.NDArray[np.float64]:
+        """Takes the oldest num_samples samples from the ring buffer, all samples if num_samples is None.
+
+        :param num_samples: Maximum number of samples, defaults to None
+        :type num_samples: int | None, optional
+        :param preset: Brainflow preset, defaults to BrainFlowPresets.DEFAULT_PRESET
+        :type preset: BrainFlowPresets, optional
+        :return: Returns Brainflow data, with samples in columns.
+        :rtype: npt.NDArray[np.float64]
+        """
+        with self.lock:
+            start_time, generated, count = self._available(preset)
+            first = generated - count
+            last = first + (count if num_samples is None else min(num_samples, count))
+            self.taken[int(preset)] = last
+        return self._generate(preset, start_time, first, last)
+
+    def _available(self, preset: BrainFlowPresets) -> tuple[float | None, int, int]:
+        """Returns the time the stream started, the number of samples generated so far, and the number of those
+        in the ring buffer. The stream may be stopped by another thread, so the start time is read once.
+        """
+        self._description(preset)
+        start_time = self.start_time
+        if start_time is None:
+            return None, 0, 0
+        generated = self._num_generated(preset, (time.time() - start_time) * self.speed)
+        return start_time, generated, max(0, min(generated - self.taken.get(int(preset), 0), self.ringbuffer_size))
+
+    @abstractmethod
+    def _num_generated(self, preset: BrainFlowPresets, elapsed: float) -> int:
+        """Returns the number of samples of a preset generated within elapsed s since the stream started,
+        on the clock of the board.
+        """
+
+    @abstractmethod
+    def _generate(self, preset: BrainFlowPresets, start_time: float | None, first: int,
+                  last: int) -> npt.NDArray[np.float64]:
+        """Returns the samples numbered first up to last of a preset, as Brainflow data with samples in columns,
+        with timestamps on the clock of the board that started at start_time, None if there are no samples.
+        """
+
+
+class SyntheticBoard(SimulatedBoard):
+    """Simulated board generating a deterministic signal, every run generates the same samples.
+
+    EEG is a 10 Hz oscillation with noise, with a phase shift per channel, plus a reference channel of noise only.
+    Motion (accelerometer and gyroscope at 52 Hz) and PPG (3 channels at 64 Hz) are laid out as for the Muse S.
+
+    :param num_channels: Number of EEG channels, defaults to 4
+    :type num_channels: int, optional
+    :param sampling_rate: EEG sampling rate, in Hz, defaults to 256
+    :type sampling_rate: int, optional
+    :param speed: Speed relative to real time, at least 1.0, defaults to 1.0
+    :type speed: float, optional
+    :param seed: Seed of the noise, defaults to 0
+    :type seed: int, optional
+    """
+
+    noise_length_s = 10  # in s, the noise repeats after this time.
+
+    def __init__(self, num_channels: int = 4, sampling_rate: int = 256, speed: float = 1.0, seed: int = 0) -> None:
+        if num_channels < 1 or sampling_rate < 1:
+            raise ValueError(f"Expected at least 1 channel at 1 Hz, got {num_channels} channels at {sampling_rate} Hz")
+        eeg_channels = list(range(1, num_channels + 1))
+        descriptions = {
+            BrainFlowPresets.DEFAULT_PRESET: {
+                'name': 'Synthetic', 'sampling_rate': sampling_rate, 'package_num_channel': 0,
+                'eeg_channels': eeg_channels, 'eeg_names': ','.join(f'EEG{channel}' for channel in eeg_channels),
+                'other_channels': [num_channels + 1], 'timestamp_channel': num_channels + 2,
+                'marker_channel': num_channels + 3, 'num_rows': num_channels + 4},
+            BrainFlowPresets.AUXILIARY_PRESET: {
+                'name': 'SyntheticAux', 'sampling_rate': 52, 'package_num_channel': 0, 'accel_channels': [1, 2, 3],
+                'gyro_channels': [4, 5, 6], 'timestamp_channel': 7, 'marker_channel': 8, 'num_rows': 9},
+            BrainFlowPresets.ANCILLARY_PRESET: {
+                'name': 'SyntheticAnc', 'sampling_rate': 64, 'package_num_channel': 0, 'ppg_channels': [1, 2, 3],
+                'timestamp_channel': 4, 'marker_channel': 5, 'num_rows': 6},
+        }
+        SimulatedBoard.__init__(self, BoardIds.SYNTHETIC_BOARD, descriptions, speed)
+        rng = np.random.default_rng(seed)
+        self.noise = {preset: rng.standard_normal((description['num_rows'],
+                                                   description['sampling_rate'] * self.noise_length_s))
+                      for preset, description in self.descriptions.items()}
+
+    def _num_generated(self, preset: BrainFlowPresets, elapsed: float) -> int:
+        return int(elapsed * self._field(preset, 'sampling_rate')) + 1
+
+    def _generate(self, preset: BrainFlowPresets, start_time: float | None, first: int,
+                  last: int) -> npt.NDArray[np.float64]:
+        description = self._description(preset)
+        sample_numbers = np.arange(first, last)
+        t = sample_numbers / description['sampling_rate']
+        noise = self.noise[int(preset)]
+        noise = noise[:, sample_numbers % noise.shape[1]]
+        data = np.zeros((description['num_rows'], len(sample_numbers)))
+        data[description['package_num_channel']] = sample_numbers % 256
+        data[description['timestamp_channel']] = (start_time or 0.0) + t
+        if preset == BrainFlowPresets.DEFAULT_PRESET:
+            channels = np.array(description['eeg_channels'])
+            data[channels] = 10 * np.sin(2 * np.pi * 10 * t + channels[:, None]) + 5 * noise[channels]
+            data[description['other_channels']] = 5 * noise[description['other_channels']]
+        elif preset == BrainFlowPresets.AUXILIARY_PRESET:
+            data[description['accel_channels']] = 0.01 * noise[description['accel_channels']]
+            data[description['accel_channels'][2]] += 1.0  # gravity
+            data[description['gyro_channels']] = noise[description['gyro_channels']]
+        elif preset == BrainFlowPresets.ANCILLARY_PRESET:
+            data[description['ppg_channels']] = 1e5 + 500 * np.sin(2 * np.pi * 1.2 * t) \
+                + 50 * noise[description['ppg_channels']]
+        return data
+
+
+class PlaybackBoard(SimulatedBoard):
+    """Simulated board playing back a session recorded with `SessionRecorder`, see `SessionRecording`.
+    The board reports the board id and layout of the recorded board, so classifiers saved for that board can be
+    loaded.
+
+    Sample timestamps are shifted, so the recording starts when the stream starts. The recorded markers are pushed,
+    shifted likewise, on an LSL marker stream, so they reach the event listener as they did while recording.
+    LSL only delivers samples pushed after an inlet connected, so the stream waits up to consumer_timeout for the
+    event listener to connect before it starts. Playback stops at the end of the recording, and starts over when the
+    stream is started again.
+
+    :param path: Directory of the recording.
+    :type path: str | Path
+    :param speed: Playback speed, relative to real time, at least 1.0, defaults to 1.0
+    :type speed: float, optional
+    :param marker_stream: Name of the LSL stream to push the markers on, defaults to 'SendMarkersOnClick'
+    :type marker_stream: str, optional
+    :param consumer_timeout: Maximum time to wait for a consumer of the markers, in s, defaults to 5.0
+    :type consumer_timeout: float, optional
+    """
+
+    streams = {
+        'eeg': BrainFlowPresets.DEFAULT_PRESET,
+        'gyro': BrainFlowPresets.AUXILIARY_PRESET,
+        'ppg': BrainFlowPresets.ANCILLARY_PRESET,
+    }
+
+    def __init__(self, path: str | Path, speed: float = 1.0, marker_stream: str = 'SendMarkersOnClick',
+                 consumer_timeout: float = 5.0) -> None:
+        self.recording = SessionRecording(path)
+        streams = {name: preset for name, preset in self.streams.items()
+                   if name in self.recording.streams and self.recording.num_samples(name) > 0}
+        if BrainFlowPresets.DEFAULT_PRESET not in streams.values():
+            raise ValueError(f"No EEG recorded in {path}")
+        descriptions = {preset: self._recorded_description(name, preset) for name, preset in streams.items()}
+        board_id = descriptions[BrainFlowPresets.DEFAULT_PRESET].pop('board_id', BoardIds.PLAYBACK_FILE_BOARD)
+        for description in descriptions.values():
+            description.pop('board_id', None)
+        SimulatedBoard.__init__(self, board_id, descriptions, speed)
+
+        self.samples = {int(preset): self.recording.samples(name) for name, preset in streams.items()}
+        self.timestamps = {int(preset): self.recording.timestamps(name) for name, preset in streams.items()}
+        self.recording_start = min(float(timestamps[0]) for timestamps in self.timestamps.values())
+        self.recording_end = max(float(timestamps[-1]) for timestamps in self.timestamps.values())
+        self.markers = self.recording.markers()
+        self.consumer_timeout = consumer_timeout
+        self.marker_outlet = None
+        if len(self.markers) > 0:
+            self.marker_outlet = StreamOutlet(StreamInfo(name=marker_stream, type='Markers', channel_count=1,
+                                                         nominal_srate=0, channel_format=cf_string,
+                                                         source_id='ixr-flow-playback-markers'))
+        self.stopped = Event()
+        self.marker_thread = None
+        logging.info(f"Playing back {path}: {self.recording_end - self.recording_start:.1f} s recorded, "
+                     f"{len(self.markers)} markers, at {speed}x speed.")
+
+    def start_stream(self, num_samples: int = 450000, streamer_params: str | None = None) -> None:
+        if self.marker_outlet is not None and not self.marker_outlet.wait_for_consumers(self.consumer_timeout):
+            logging.warning("No consumer of the played back markers, markers are pushed regardless.")
+        SimulatedBoard.start_stream(self, num_samples, streamer_params)
+        if self.marker_outlet is not None:
+            self.stopped.clear()
+            self.marker_thread = Thread(target=self._push_markers, args=(self.start_time,),
+                                        name="playback_markers", daemon=True)
+            self.marker_thread.start()
+
+    def stop_stream(self) -> None:
+        self.stopped.set()
+        if self.marker_thread is not None:
+            self.marker_thread.join()
+            self.marker_thread = None
+        SimulatedBoard.stop_stream(self)
+
+    def _recorded_description(self, name: str, preset: BrainFlowPresets) -> dict:
+        """Returns the board description recorded with a stream, or derives one from the channel labels
+        for recordings without.
+        """
+        stream = self.recording.streams[name]
+        if 'description' in stream:
+            return dict(stream['description'])
+        labels = stream['labels']
+        description = {'sampling_rate': stream['rate'], 'num_rows': stream['channel_count'],
+                       'timestamp_channel': labels.index('timestamp')}
+        if preset == BrainFlowPresets.DEFAULT_PRESET:
+            eeg_channels = [row for row, label in enumerate(labels) if label != 'timestamp'
+                            and not label.startswith('row_')]
+            description.update({'eeg_channels': eeg_channels, 'other_channels': [],
+                                'eeg_names': ','.join(labels[row] for row in eeg_channels)})
+        for field, prefix in [('accel_channels', 'accel_'), ('gyro_channels', 'gyro_'), ('ppg_channels', 'ppg_')]:
+            channels = [row for row, label in enumerate(labels) if label.startswith(prefix)]
+            if len(channels) > 0:
+                description[field] = channels
+        return description
+
+    def _num_generated(self, preset: BrainFlowPresets, elapsed: float) -> int:
+        return int(np.searchsorted(self.timestamps[int(preset)], self.recording_start + elapsed, side='right'))
+
+    def _generate(self, preset: BrainFlowPresets, start_time: float | None, first: int,
+                  last: int) -> npt.NDArray[np.float64]:
+        data = np.array(self.samples[int(preset)][first:last].T, dtype=np.float64)
+        data[self._field(preset, 'timestamp_channel')] = \
+            self.timestamps[int(preset)][first:last] - self.recording_start + (start_time or 0.0)
+        return data
+
+    def _push_markers(self, start_time: float) -> None:
+        """Pushes the markers when they are due, with their timestamp shifted to the clock of the board,
+        converted to the LSL clock.
+        """
+        for timestamp, message in self.markers:
+            due = start_time + timestamp - self.recording_start
+            while not self.stopped.is_set() and self.time() < due:
+                self.stopped.wait(min(0.1, (due - self.time()) / self.speed))
+            if self.stopped.is_set():
+                return
+            self.marker_outlet.push_sample([message], local_clock() + due - time.time())
+        logging.info("Played back all markers.")
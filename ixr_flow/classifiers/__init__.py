@@ -1 +1,4 @@
 from .classifier import Classifier, ClfError
+from .batch import predict_all
+from .epoch_cache import EpochCache
+from .trace import STAGES, EventTrace
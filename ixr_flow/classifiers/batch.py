@@ -0,0 +1,50 @@
+import logging
+
+from .classifier import Classifier, ClfError
+from .trace import EventTrace
+
+
+def predict_all(classifiers: dict[str, Classifier], event_timestamp: float,
+                trace: EventTrace | None = None) -> dict[str, tuple]:
+    """Collects and predicts a single event sample with all trained classifiers.
+    The board data is fetched once, covering the time ranges of all classifiers,
+    and features are extracted once per group of classifiers with equal feature parameters, except for classifiers
+    with a streaming filter, which extract their own features so the state of their filter keeps up.
+    Classifiers that have not been trained yet are skipped.
+
+    :param classifiers: Classifiers by name.
+    :type classifiers: dict[str, Classifier]
+    :param event_timestamp: Original event timestamp
+    :type event_timestamp: float
+    :param trace: Trace to record the stages of handling the event in, defaults to None
+    :type trace: EventTrace | None, optional
+    :raises ClfError: "No trained classifiers to predict with"
+    :return: Returns the prediction and distance to the decision boundary per classifier name.
+    :rtype: dict[str, tuple]
+    """
+    trained = {name: clf for name, clf in classifiers.items() if hasattr(clf.model, 'classes_')}
+    if len(trained) < 1:
+        raise ClfError("No trained classifiers to predict with")
+
+    first = next(iter(trained.values()))
+    time_range = [min(clf.time_range[0] for clf in trained.values()),
+                  max(clf.time_range[1] for clf in trained.values())]
+    use_motion = any(clf.use_motion for clf in trained.values())
+    data_eeg, data_motion = first.fetch_epoch(event_timestamp, time_range, use_motion, trace)
+
+    features = {}
+    predictions = {}
+    for name, clf in trained.items():
+        try:
+            if clf.eeg_filter is not None:
+                # the streaming filter of every classifier has to see the event, or its history goes stale.
+                x_data = clf.extract_features(data_eeg, event_timestamp, data_motion, trace=trace)
+            else:
+                if clf.feature_key not in features:
+                    features[clf.feature_key] = clf.extract_features(data_eeg, event_timestamp, data_motion,
+                                                                       trace=trace)
+                x_data = features[clf.feature_key]
+            predictions[name] = clf.predict_features(x_data, trace)
+        except ClfError as e:
+            logging.warning(f"{e}. Skipping prediction of {name}.")
+    return predictions
@@ -1,26 +1,54 @@
+import json
+import logging
 import math
+import pickle
 import threading
 import time
+from concurrent.futures import Executor, Future
+from pathlib import Path
 
 import numpy as np
 import numpy.typing as npt
-import pandas as pd
 from brainflow import (BoardShim, BrainFlowError, BrainFlowExitCodes,
                        BrainFlowPresets)
 from scipy import signal
+from sklearn.base import clone
 from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
 from sklearn.exceptions import NotFittedError
-from sklearn.metrics import (accuracy_score, f1_score, precision_score,
-                             recall_score)
-from sklearn.model_selection import cross_validate
+from sklearn.linear_model import SGDClassifier
+from sklearn.model_selection import StratifiedKFold
 from sklearn.svm import SVC
 from sklearn.utils.validation import check_is_fitted
 
+from ixr_flow.board import BoardStateBus, DataReadyNotifier
+
+from .epochs import rereference, window_average, window_bounds, window_edges
+from .epoch_cache import EpochCache
+from .epoch_store import EpochStore, GrowableArray, save_array
+from .filter_bank import FREQUENCY_BANDS, band_responses, log_band_power
+from .filters import StreamingFilter, bandpass_sos
+from .online import OnlineLDA
+from .trace import EventTrace
+from .training import fit_model, score_fold
+
 
 class ClfError(Exception):
     pass
 
 
+class _InlineExecutor(Executor):
+    """Executor that runs submitted calls directly in the calling thread."""
+
+    def submit(self, fn: callable, /, *args, **kwargs) -> Future:
+        future = Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
 class Classifier:
     """Implements a classifier that holds a model, collect's samples,
     trains and predicts the model, and returns potential scores.
@@ -35,25 +63,57 @@ class Classifier:
     :type filter_freq_cutoff: list[float]
     :param method: Method to use when collecting samples.
     :type method: str
+    :param reference: Re-referencing method, defaults to 'mean'
+    :type reference: str, optional
+    :param stream_filter: Keeps a running filter state, so successive samples reuse already filtered data,
+                          instead of filtering every sample from scratch, defaults to False
+    :type stream_filter: bool, optional
+    :param data_ready: Notifies when board data has arrived, when given samples are collected as soon as
+                       the data covers the event, instead of after a fixed waiting time, defaults to None
+    :type data_ready: DataReadyNotifier | None, optional
+    :param executor: Executor to train models in, e.g. a process pool, when None models are trained in the
+                     calling thread, defaults to None
+    :type executor: Executor | None, optional
+    :param epoch_cache: Cache to share fetched board data with other classifiers handling the same event,
+                        defaults to None
+    :type epoch_cache: EpochCache | None, optional
+    :param epoch_dir: Directory to memory-map the raw epochs of train samples to, defaults to None (kept in memory)
+    :type epoch_dir: str | Path | None, optional
+    :param board_state: State of the board connection, when given fetching board data blocks until the board is
+                        ready, up to the data timeout, defaults to None
+    :type board_state: BoardStateBus | None, optional
     """
 
     def __init__(self, board_shim: BoardShim, model_type: str, time_range: list[int],
-                 filter_freq_cutoff: list[float], method: str, reference: str = 'mean') -> None:
+                 filter_freq_cutoff: list[float], method: str, reference: str = 'mean',
+                 stream_filter: bool = False, data_ready: DataReadyNotifier | None = None,
+                 executor: Executor | None = None, epoch_cache: EpochCache | None = None,
+                 epoch_dir: str | Path | None = None, board_state: BoardStateBus | None = None) -> None:
         self.board_shim = board_shim
+        self.board_state = board_state
+        self.epoch_cache = epoch_cache
+        self.data_ready = data_ready
+        self.executor = executor
+        self.model_type = model_type
         self.model = self._create_model(model_type)
-        self.time_range = time_range
-        self.filter_freq_cutoff = filter_freq_cutoff
-        self.method = self._cast_method(method)
         self.reference = reference
 
         self.lock = threading.Lock()
-        self.train_x = []
+        self.train_x = GrowableArray()
         self.train_y = []
         self.scores = {}
+        self.auto_update = False
+        self.num_updated = 0  # number of train samples the model has been updated with, when using online updates.
+        self.train_generation = 0  # number of trainings started.
+        self.model_generation = 0  # training the current model resulted from.
 
         # set some stuff
         self.window_size = 50  # in ms
         self.baseline_timeframe = 200  # in ms
+        self.filter_order = 5
+        self.filter_history_s = 10  # in s, gaps up to this length are bridged when stream_filter is set
+        self.data_timeout = 1000  # in ms, maximum delay of board data after the end of an event
+        self.epoch_margin = 100  # in ms, raw epochs are stored with this margin around the time range
         self.board_id = self.board_shim.get_board_id()
 
         self.eeg_preset = BrainFlowPresets.DEFAULT_PRESET
@@ -69,17 +129,82 @@ class Classifier:
         self.motion_timestamp_channel = board_shim.get_timestamp_channel(self.board_id, self.motion_preset)
 
         # compute some stuff
-        self.wait_time = self.time_range[1] + 100  # Add additional 100ms waiting time to be safe
+        self.stream_filter = stream_filter
+        self._set_feature_params(time_range, filter_freq_cutoff, method)
+
+        # Raw epochs of the train samples, covering the time range plus margin, so features can be derived again.
+        self.epoch_dir = epoch_dir
+        self.epochs = self._create_epoch_store([time_range[0] - self.epoch_margin, time_range[1] + self.epoch_margin])
+
+    def _create_epoch_store(self, epoch_range: list[int]) -> EpochStore:
+        """Creates an empty store for raw epochs covering epoch_range (in ms) of each event, plus the
+        additional window the windowed average methods use, of both the EEG and motion preset."""
+        self.epoch_range = epoch_range
+        epoch_duration = (epoch_range[1] + self.window_size - epoch_range[0]) / 1000
+        return EpochStore(epoch_range[0] / 1000, {
+            'eeg': (self.board_shim.get_num_rows(self.board_id, self.eeg_preset),
+                    math.ceil(epoch_duration * self.eeg_sample_rate) + 1),
+            'motion': (self.board_shim.get_num_rows(self.board_id, self.motion_preset),
+                       math.ceil(epoch_duration * self.motion_sample_rate) + 1),
+        }, {'eeg': self.eeg_timestamp_channel, 'motion': self.motion_timestamp_channel}, self.epoch_dir)
+
+    def _set_feature_params(self, time_range: list[int], filter_freq_cutoff: list[float], method: str) -> None:
+        """Sets the parameters that determine the features of a sample, and everything derived from them."""
+        self.method, self.use_motion = self._cast_method(method, filter_freq_cutoff)
+        self.method_name = method
+        self.time_range = time_range
+        self.filter_freq_cutoff = filter_freq_cutoff
+
         self.total_event_duration = self.time_range[1] - self.time_range[0]
         # Add 100ms + 100ms to capture enough including the 100ms additional wait time.
         self.eeg_num_samples = math.ceil((self.total_event_duration + 200) / 1000 * self.eeg_sample_rate)
         self.motion_num_samples = math.ceil((self.total_event_duration + 200) / 1000 * self.motion_sample_rate)
 
-    def _cast_method(self, method: str) -> any:
+        # Filters are designed once, and shared between classifiers with identical parameters.
+        self.sos = bandpass_sos(tuple(self.filter_freq_cutoff), self.eeg_sample_rate, self.filter_order)
+        self.eeg_filter = self.create_streaming_filter() if self.stream_filter else None
+
+    def _cast_method(self, method: str, filter_freq_cutoff: list[float]) -> tuple[any, bool]:
+        """Returns the feature extraction method, and whether it uses motion data.
+        Filter bank methods are named `filter-bank-<band>-<band>...`, without bands all bands in
+        FREQUENCY_BANDS are used, e.g. `filter-bank-alpha-theta` only uses the alpha and theta bands.
+        Every band filter is in series with the cutoff filter, so bands outside the cutoff hold no power, and band
+        filters have to stay below the Nyquist frequency. Such bands are rejected when given. Without bands, bands not
+        below the Nyquist frequency are left out, bands outside the cutoff are kept with a warning.
+        """
         if method == 'windowed-average-EEG':
-            return self._window_averaged_eeg
-        elif method == 'windowed-average-EEG-motion':
-            return self._window_averaged_eeg_motion
+            return self._window_averaged_eeg, False
+        elif method in ['windowed-average-EEG-motion', 'windowed-average-EEG-plus-headmovement']:
+            return self._window_averaged_eeg, True
+        elif method.startswith('filter-bank'):
+            use_motion = method.endswith('-plus-headmovement')
+            band_names = method.removeprefix('filter-bank').removesuffix('-plus-headmovement').strip('-')
+            all_bands = band_names == ''
+            band_names = list(FREQUENCY_BANDS) if all_bands else band_names.split('-')
+            if any(band_name not in FREQUENCY_BANDS for band_name in band_names):
+                raise ClfError(f"Unknown frequency band, choose from: {', '.join(FREQUENCY_BANDS)}")
+            # bands outside the cutoff hold no power, band filters can not be designed up to the Nyquist frequency.
+            outside = [band_name for band_name in band_names if FREQUENCY_BANDS[band_name][1] <= filter_freq_cutoff[0]
+                       or FREQUENCY_BANDS[band_name][0] >= filter_freq_cutoff[1]]
+            above_nyquist = [band_name for band_name in band_names
+                             if FREQUENCY_BANDS[band_name][1] >= self.eeg_sample_rate / 2]
+            if not all_bands and len(outside + above_nyquist) > 0:
+                raise ClfError(f"Frequency bands {', '.join(sorted(set(outside + above_nyquist)))} are outside the "
+                               f"filter cutoff of {filter_freq_cutoff[0]}-{filter_freq_cutoff[1]} Hz or not below the "
+                               f"Nyquist frequency of {self.eeg_sample_rate / 2} Hz")
+            if len(above_nyquist) > 0:
+                logging.warning(f"Leaving out frequency bands {', '.join(above_nyquist)}, not below the Nyquist "
+                                f"frequency of {self.eeg_sample_rate / 2} Hz.")
+            outside = [band_name for band_name in outside if band_name not in above_nyquist]
+            if len(outside) > 0:
+                # kept, so the features match those of classifiers saved before.
+                logging.warning(f"Frequency bands {', '.join(outside)} are outside the filter cutoff of "
+                                f"{filter_freq_cutoff[0]}-{filter_freq_cutoff[1]} Hz, their features hold no power.")
+            self.bands = tuple(FREQUENCY_BANDS[band_name] for band_name in band_names
+                               if band_name not in above_nyquist)
+            if len(self.bands) == 0:
+                raise ClfError(f"No frequency band below the Nyquist frequency of {self.eeg_sample_rate / 2} Hz")
+            return self._filter_bank, use_motion
         else:
             raise ClfError("Unknown collection method")
 
@@ -88,6 +213,10 @@ class Classifier:
             return SVC()
         elif model_type == 'lda':
             return LinearDiscriminantAnalysis()
+        elif model_type == 'sgd':
+            return SGDClassifier()
+        elif model_type == 'online-lda':
+            return OnlineLDA()
         else:
             raise ClfError("Unknown model_type")
 
@@ -95,58 +224,211 @@ class Classifier:
     # data collection methods #
     #-------------------------#
 
-    def collect_sample(self, label: int | None, event_timestamp: float) -> None | npt.NDArray[np.float64]:
+    def collect_sample(self, label: int | None, event_timestamp: float,
+                       trace: EventTrace | None = None) -> None | npt.NDArray[np.float64]:
         """Collects sample data using the collection method and parameters provided when creating the model.
-        If a label is given the sample is considered train data and stored as such internally.
+        If a label is given the sample is considered train data and stored as such internally,
+        together with its raw epoch, see `refeaturize`.
         If label is None the sample is considered target data and X data is returned.
 
         :param label: Label, when None the sample is considered target data
         :type label: int | None
         :param event_timestamp: Original event timestamp
         :type event_timestamp: float
+        :param trace: Trace to record the stages of handling the event in, defaults to None
+        :type trace: EventTrace | None, optional
         :return: Returns None when collecting train samples, returns X data when collecting a target sample
         :rtype: None | npt.NDArray[np.float64]
         """
-        x_data = self.method(event_timestamp)
         if label is None:  # predicting, return X data
-            return x_data
-        else:  # training, save X and y data, return nothing
+            data_eeg, data_motion = self.fetch_epoch(event_timestamp, trace=trace)
+            return self.extract_features(data_eeg, event_timestamp, data_motion, trace=trace)
+        else:  # training, save X and y data and the raw epoch, return nothing
+            data_eeg, data_motion = self.fetch_epoch(event_timestamp, self.epoch_range, True, trace)
+            x_data = self.extract_features(data_eeg, event_timestamp, data_motion, trace=trace)
             with self.lock:
                 self.train_x.append(x_data)
                 self.train_y.append(label)
+                self.epochs.append(event_timestamp, {'eeg': data_eeg, 'motion': data_motion})
+                if self.auto_update:
+                    self._update_model()
             return None
 
-    def _window_averaged_eeg_motion(self, event_timestamp: float) -> npt.NDArray[np.float64]:
-        """Internal wrapper for `_window_averaged_eeg`, sets use_motion to True.
-
+    def refeaturize(self, time_range: list[int] | None = None, filter_freq_cutoff: list[float] | None = None,
+                    method: str | None = None) -> None:
+        """Derives the X data of all train samples again from their raw epochs, with new feature parameters,
+        so changing them does not require collecting all samples again. Parameters that are None are kept.
+        The raw epochs are filtered from scratch, without the streaming filter.
+
+        As the features change, the model is reset and should be trained again,
+        trainings started before are discarded. Online models with auto update enabled are updated right away.
+
+        :param time_range: The time range of data to use, within the time range of the stored epochs,
+                           defaults to None
+        :type time_range: list[int] | None, optional
+        :param filter_freq_cutoff: Lower- and upper-bound filter cutoff frequencies, defaults to None
+        :type filter_freq_cutoff: list[float] | None, optional
+        :param method: Method to use, defaults to None
+        :type method: str | None, optional
+        :raises ClfError: "Raw epochs are missing for some samples"
+        :raises ClfError: "Stored epochs do not cover the time range"
+        """
+        time_range = self.time_range if time_range is None else time_range
+        filter_freq_cutoff = self.filter_freq_cutoff if filter_freq_cutoff is None else filter_freq_cutoff
+        method = self.method_name if method is None else method
+        if time_range[0] < self.epoch_range[0] or time_range[1] > self.epoch_range[1]:
+            raise ClfError(f"Stored epochs do not cover the time range, choose a time range within "
+                           f"{self.epoch_range[0]},{self.epoch_range[1]}")
+
+        with self.lock:  # lock so no samples are collected with the old parameters meanwhile.
+            if len(self.epochs) != len(self.train_y):
+                raise ClfError("Raw epochs are missing for some samples, e.g. when loaded from an older save")
+            previous = self.time_range, self.filter_freq_cutoff, self.method_name
+            self._set_feature_params(time_range, filter_freq_cutoff, method)
+            train_x = GrowableArray(capacity=len(self.train_y))
+            try:
+                for index in range(len(self.epochs)):
+                    epoch = self.epochs.get(index)
+                    train_x.append(self.method(epoch['eeg'], 0.0, epoch['motion'] if self.use_motion else None))
+            except ClfError as e:
+                self._set_feature_params(*previous)
+                raise ClfError(f"{e}, sample {index}")
+
+            self.train_x = train_x
+            self.model = self._create_model(self.model_type)
+            self.scores = {}
+            self.num_updated = 0
+            self.model_generation = self.train_generation  # discard trainings on the old features.
+            if self.auto_update:
+                self._update_model()
+
+    def extract_features(self, data_eeg: npt.NDArray[np.float64], event_timestamp: float,
+                         data_motion: npt.NDArray[np.float64] | None = None,
+                         eeg_filter: StreamingFilter | None = None,
+                         trace: EventTrace | None = None) -> npt.NDArray[np.float64]:
+        """Extracts X data from board data arrays, using the collection method provided when creating the model.
+
+        :param data_eeg: Board data of the EEG preset, as returned by Brainflow, shape (rows, samples).
+        :type data_eeg: npt.NDArray[np.float64]
         :param event_timestamp: Original event timestamp
         :type event_timestamp: float
+        :param data_motion: Board data of the motion preset, required if the method uses motion, defaults to None
+        :type data_motion: npt.NDArray[np.float64] | None, optional
+        :param eeg_filter: Streaming filter to use instead of the classifier's own filter, defaults to None
+        :type eeg_filter: StreamingFilter | None, optional
+        :param trace: Trace to record the stages of handling the event in, defaults to None
+        :type trace: EventTrace | None, optional
         :return: Returns X data
         :rtype: npt.NDArray[np.float64]
         """
-        return self._window_averaged_eeg(event_timestamp, use_motion=True)
+        x_data = self.method(data_eeg, event_timestamp, data_motion if self.use_motion else None,
+                             eeg_filter if eeg_filter is not None else self.eeg_filter, trace)
+        if trace is not None:
+            trace.mark('featurized')
+        return x_data
 
-    def _window_averaged_eeg(self, event_timestamp: float, use_motion: bool = False) -> npt.NDArray[np.float64]:
-        """Collects X data using the `window_averaged_eeg` method.
-        Also implements `window_averaged_eeg`, by setting use_motion.
-        Uses a window size of self.window_size, in ms.
-        Re-references EEG data and applies baseline calculation as post-processing step
+    @property
+    def feature_key(self) -> tuple:
+        """Parameters that determine the features of a sample, classifiers with equal keys extract the same
+        features from the same event."""
+        return (self.method_name, tuple(self.time_range), tuple(self.filter_freq_cutoff), self.reference)
+
+    def create_streaming_filter(self) -> StreamingFilter:
+        """Creates a streaming EEG filter matching the filter parameters of this classifier.
+
+        :return: Returns a new streaming filter.
+        :rtype: StreamingFilter
+        """
+        return StreamingFilter(self.sos, len(self.eeg_data_channels),
+                               self.eeg_num_samples + self.filter_history_s * self.eeg_sample_rate)
+
+    def fetch_epoch(self, event_timestamp: float, time_range: list[int] | None = None, use_motion: bool | None = None,
+                    trace: EventTrace | None = None) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64] | None]:
+        """Fetches the board data covering the event given by `event_timestamp`.
+        When an epoch cache was given, the data is shared with other classifiers fetching the same event.
 
         :param event_timestamp: Original event timestamp
         :type event_timestamp: float
-        :param use_motion: Allows using motion data, defaults to False
-        :type use_motion: bool, optional
-        :return: Returns X data
-        :rtype: npt.NDArray[np.float64]
+        :param time_range: The time range of data to fetch, defaults to None (the classifier's time range)
+        :type time_range: list[int] | None, optional
+        :param use_motion: Also fetch motion data, defaults to None (if the collection method uses motion)
+        :type use_motion: bool | None, optional
+        :param trace: Trace to record the stages of handling the event in, defaults to None
+        :type trace: EventTrace | None, optional
+        :return: Returns EEG board data, and motion board data if fetched.
+        :rtype: tuple[npt.NDArray[np.float64], npt.NDArray[np.float64] | None]
         """
-        if not self.board_shim.is_prepared():
+        time_range = self.time_range if time_range is None else time_range
+        use_motion = self.use_motion if use_motion is None else use_motion
+        if self.epoch_cache is None:
+            data = self._fetch_epoch(event_timestamp, time_range, use_motion, trace)
+        else:
+            data = self.epoch_cache.fetch(event_timestamp, time_range, use_motion,
+                                          lambda: self._fetch_epoch(event_timestamp, time_range, use_motion, trace))
+        if trace is not None:
+            trace.mark('fetched')
+        return data
+
+    def _fetch_epoch(self, event_timestamp: float, time_range: list[int], use_motion: bool,
+                     trace: EventTrace | None = None) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64] | None]:
+        """Fetches the board data covering time_range around the event given by `event_timestamp`.
+        Waits until the data has arrived when a data ready notifier was given, otherwise waits a fixed time.
+
+        :param event_timestamp: Original event timestamp
+        :type event_timestamp: float
+        :param time_range: The time range of data to fetch.
+        :type time_range: list[int]
+        :param use_motion: Also fetch motion data.
+        :type use_motion: bool
+        :param trace: Trace to record the stages of handling the event in, defaults to None
+        :type trace: EventTrace | None, optional
+        :raises ClfError: "BoardShim not prepared"
+        :raises ClfError: "Board not ready"
+        :raises ClfError: "Timed out waiting for board data"
+        :return: Returns EEG board data, and motion board data if use_motion is set.
+        :rtype: tuple[npt.NDArray[np.float64], npt.NDArray[np.float64] | None]
+        """
+        if self.board_state is not None:
+            if not self.board_state.wait_ready(self.data_timeout / 1000):
+                raise ClfError(f"Board not ready, the board is {self.board_state.state.value}")
+        elif not self.board_shim.is_prepared():
             raise ClfError("BoardShim not prepared")
 
-        time.sleep(self.wait_time / 1000)  # wait_time is in ms
-        try:
-            data_eeg = self.board_shim.get_current_board_data(self.eeg_num_samples, self.eeg_preset).T
+        event_start = event_timestamp + time_range[0] / 1000
+        event_end = event_timestamp + (time_range[1] + self.window_size) / 1000
+        # Add 100ms + 100ms to capture enough including the 100ms additional wait time.
+        eeg_num_samples = math.ceil((time_range[1] - time_range[0] + 200) / 1000 * self.eeg_sample_rate)
+        motion_num_samples = math.ceil((time_range[1] - time_range[0] + 200) / 1000 * self.motion_sample_rate)
+        if self.data_ready is not None:
+            presets = [self.eeg_preset, self.motion_preset] if use_motion else [self.eeg_preset]
+            timeout = event_end + self.data_timeout / 1000 - time.time()
+            if not self.data_ready.wait_for(presets, event_end, timeout):
+                raise ClfError(f"Timed out waiting for board data, no data received up to "
+                               f"{self.data_timeout} ms after the event ended")
+            # Fetch back to the start of the event, more samples than expected may have arrived in a burst.
+            # Add 100ms for samples arriving between now and fetching the data.
+            eeg_num_samples = max(eeg_num_samples, math.ceil(
+                (self.data_ready.latest(self.eeg_preset) - event_start + 0.1) * self.eeg_sample_rate))
             if use_motion:
-                data_motion = self.board_shim.get_current_board_data(self.motion_num_samples, self.motion_preset).T
+                motion_num_samples = max(motion_num_samples, math.ceil(
+                    (self.data_ready.latest(self.motion_preset) - event_start + 0.1) * self.motion_sample_rate))
+        else:
+            # Add additional 100ms waiting time to be safe, events that were queued may have ended already.
+            time.sleep(max(0.0, event_timestamp + (time_range[1] + 100) / 1000 - time.time()))
+            # Fetch back to the start of the event, also when the event is handled later than it arrived.
+            since_start = time.time() - event_start + 0.1
+            eeg_num_samples = max(eeg_num_samples, math.ceil(since_start * self.eeg_sample_rate))
+            motion_num_samples = max(motion_num_samples, math.ceil(since_start * self.motion_sample_rate))
+        if self.eeg_filter is not None and self.eeg_filter.last_timestamp > 0:
+            # Fetch back to the last filtered sample, so the filter state carries over to this sample.
+            since_last = math.ceil((time.time() - self.eeg_filter.last_timestamp) * self.eeg_sample_rate) + 1
+            eeg_num_samples = min(max(eeg_num_samples, since_last), self.eeg_filter.history_size)
+        if trace is not None:
+            trace.mark('data-ready')
+        try:
+            data_eeg = self.board_shim.get_current_board_data(eeg_num_samples, self.eeg_preset)
+            data_motion = self.board_shim.get_current_board_data(motion_num_samples, self.motion_preset) \
+                if use_motion else None
         except BrainFlowError as e:
             # Right after board preparation the Brainflow connection might be a bit unstable.
             # In that case Brainflow throws an INVALID_ARGUMENTS_ERROR exception.
@@ -157,44 +439,120 @@ class Classifier:
             else:
                 raise e
 
-        eeg_df = pd.DataFrame(data_eeg[:, self.eeg_data_channels], index=pd.to_datetime(
-            data_eeg[:, self.eeg_timestamp_channel], unit='s'))
-        if use_motion:
-            motion_df = pd.DataFrame(data_motion[:, self.motion_data_channels],
-                                     index=pd.to_datetime(data_motion[:, self.motion_timestamp_channel], unit='s'))
+        return data_eeg, data_motion
+
+    def _window_averaged_eeg(self, data_eeg: npt.NDArray[np.float64], event_timestamp: float,
+                             data_motion: npt.NDArray[np.float64] | None = None,
+                             eeg_filter: StreamingFilter | None = None,
+                             trace: EventTrace | None = None) -> npt.NDArray[np.float64]:
+        """Extracts X data from board data arrays using the `window_averaged_eeg` method.
+        Uses a window size of self.window_size, in ms.
+        Re-references EEG data and applies baseline calculation as post-processing step.
+        Works directly on the float timestamp channels, windows are located with a binary search.
+
+        :param data_eeg: Board data of the EEG preset, as returned by Brainflow, shape (rows, samples).
+        :type data_eeg: npt.NDArray[np.float64]
+        :param event_timestamp: Original event timestamp
+        :type event_timestamp: float
+        :param data_motion: Board data of the motion preset, when given motion features are appended,
+                            defaults to None
+        :type data_motion: npt.NDArray[np.float64] | None, optional
+        :param eeg_filter: Streaming filter, when None EEG data is filtered from scratch, defaults to None
+        :type eeg_filter: StreamingFilter | None, optional
+        :param trace: Trace to record the stages of handling the event in, defaults to None
+        :type trace: EventTrace | None, optional
+        :raises ClfError: "Board data does not cover the full event"
+        :return: Returns X data
+        :rtype: npt.NDArray[np.float64]
+        """
+        eeg_timestamps = data_eeg[self.eeg_timestamp_channel]
 
         # Use a Butterworth filter for EEG data
-        Wn = np.array(self.filter_freq_cutoff) / self.eeg_sample_rate * 2
-        b, a = signal.butter(5, Wn, btype='bandpass')
-        eeg_df.loc[:, :] = signal.lfilter(b, a, eeg_df.to_numpy().T).T
+        if eeg_filter is not None:
+            eeg = eeg_filter.filter(data_eeg[self.eeg_data_channels], eeg_timestamps)
+        else:
+            eeg = signal.sosfilt(self.sos, data_eeg[self.eeg_data_channels], axis=1)
 
         # re-reference EEG data
-        if self.reference == 'mean':
-            eeg_mean = eeg_df.mean(axis=1)
-            eeg_df['negative_mean'] = 0.0
-            eeg_df = eeg_df.apply(lambda x: x - eeg_mean)  # subtract channel means from each channel
-        if self.reference == 'fpz':
-            reference = data_eeg[:, self.eeg_ref_channel]
-            eeg_df = eeg_df.apply(lambda x: x - reference)
-            eeg_df['fpz'] = reference
-
-        # Baseline calculation
-        event_timestamp = pd.to_datetime(event_timestamp, unit='s')
-        event_start = event_timestamp + pd.Timedelta(milliseconds=self.time_range[0])
+        eeg = rereference(eeg, self.reference, data_eeg[self.eeg_ref_channel])
+        if trace is not None:
+            trace.mark('filtered')
+
+        # Baseline calculation, all offsets relative to the event are in ms.
+        event_start = self.time_range[0]
         # Add an additional window_size of milliseconds so downsampling has enough data to compute means.
-        event_end = event_timestamp + pd.Timedelta(milliseconds=self.time_range[1] + self.window_size)
-        baseline_end = event_start + pd.Timedelta(milliseconds=self.baseline_timeframe)
-
-        baseline_mean = eeg_df.loc[event_start:event_end].mean(axis=0)
-        eeg_df = eeg_df.loc[baseline_end:event_end] - baseline_mean
-
-        # Downsample and flatten
-        eeg_df = eeg_df.resample(f'{self.window_size}ms', origin=event_timestamp).mean()
-        x_data = eeg_df.to_numpy().flatten()
-        if use_motion:
-            motion_df = motion_df.loc[baseline_end:event_end]
-            motion_df = motion_df.resample(f'{self.window_size}ms', origin=event_timestamp).mean()
-            x_data = np.concatenate([x_data, motion_df.to_numpy().flatten()])
+        event_end = self.time_range[1] + self.window_size
+        baseline_end = event_start + self.baseline_timeframe
+
+        if len(eeg_timestamps) < 1 or eeg_timestamps[0] > event_timestamp + event_start / 1000:
+            raise ClfError("Board data does not cover the full event")
+        start, stop = window_bounds(eeg_timestamps, event_timestamp + event_start / 1000,
+                                    event_timestamp + event_end / 1000)
+        baseline_mean = eeg[:, start:stop].mean(axis=1, keepdims=True)
+
+        # Downsample and flatten, as window means are linear the baseline is subtracted afterwards.
+        edges = window_edges(event_timestamp, baseline_end, event_end, self.window_size)
+        eeg_windows = window_average(eeg, eeg_timestamps, edges) - baseline_mean
+        x_data = [eeg_windows.T.ravel()]
+        if data_motion is not None:
+            motion_windows = window_average(data_motion[self.motion_data_channels],
+                                            data_motion[self.motion_timestamp_channel], edges)
+            x_data.append(motion_windows.T.ravel())
+        x_data = np.concatenate(x_data)
+
+        if np.isnan(x_data).any():
+            raise ClfError("Board data does not cover the full event")
+        return x_data
+
+    def _filter_bank(self, data_eeg: npt.NDArray[np.float64], event_timestamp: float,
+                     data_motion: npt.NDArray[np.float64] | None = None,
+                     eeg_filter: StreamingFilter | None = None,
+                     trace: EventTrace | None = None) -> npt.NDArray[np.float64]:
+        """Extracts X data from board data arrays using the `filter-bank` method.
+        Computes the log band power of all bands in self.bands for all (re-referenced) EEG channels
+        over the event's time range, in one batched pass, see `log_band_power`.
+        The bandpass filter given by filter_freq_cutoff is applied on top of each band.
+        Motion features are the same as for the `window_averaged_eeg` method.
+
+        :param data_eeg: Board data of the EEG preset, as returned by Brainflow, shape (rows, samples).
+        :type data_eeg: npt.NDArray[np.float64]
+        :param event_timestamp: Original event timestamp
+        :type event_timestamp: float
+        :param data_motion: Board data of the motion preset, when given motion features are appended,
+                            defaults to None
+        :type data_motion: npt.NDArray[np.float64] | None, optional
+        :param eeg_filter: Unused, filtering is part of the band power computation, defaults to None
+        :type eeg_filter: StreamingFilter | None, optional
+        :param trace: Trace to record the stages of handling the event in, defaults to None
+        :type trace: EventTrace | None, optional
+        :raises ClfError: "Board data does not cover the full event"
+        :return: Returns X data
+        :rtype: npt.NDArray[np.float64]
+        """
+        eeg_timestamps = data_eeg[self.eeg_timestamp_channel]
+        event_start = event_timestamp + self.time_range[0] / 1000
+        event_end = event_timestamp + self.time_range[1] / 1000
+        if len(eeg_timestamps) < 1 or eeg_timestamps[0] > event_start or eeg_timestamps[-1] < event_end:
+            raise ClfError("Board data does not cover the full event")
+
+        start, stop = window_bounds(eeg_timestamps, event_start, event_end)
+        eeg = rereference(data_eeg[self.eeg_data_channels, start:stop], self.reference,
+                          data_eeg[self.eeg_ref_channel, start:stop])
+        eeg = eeg - eeg.mean(axis=1, keepdims=True)
+        if trace is not None:
+            trace.mark('filtered')
+        responses = band_responses(self.bands, tuple(self.filter_freq_cutoff), self.eeg_sample_rate, stop - start)
+        x_data = [log_band_power(eeg, responses).ravel()]
+        if data_motion is not None:
+            edges = window_edges(event_timestamp, self.time_range[0] + self.baseline_timeframe,
+                                 self.time_range[1] + self.window_size, self.window_size)
+            motion_windows = window_average(data_motion[self.motion_data_channels],
+                                            data_motion[self.motion_timestamp_channel], edges)
+            x_data.append(motion_windows.T.ravel())
+        x_data = np.concatenate(x_data)
+
+        if np.isnan(x_data).any():
+            raise ClfError("Board data does not cover the full event")
         return x_data
 
     #---------------#
@@ -202,9 +560,8 @@ class Classifier:
     #---------------#
 
     def train(self, use_cv: bool = True, n_folds: int = 5) -> dict:
-        """Trains model given as model_type on object instantiation.
-        By defaults uses a cross validation (CV) technique to compute scores.
-        If use_cv is False, scores are only computed over train data.
+        """Trains model given as model_type on object instantiation, blocks until training is done.
+        See `train_async` for details.
 
         :param use_cv: Use cross validation to train model, defaults to True
         :type use_cv: bool, optional
@@ -213,35 +570,87 @@ class Classifier:
         :return: Returns train (and test) scores.
         :rtype: dict
         """
+        return self.train_async(use_cv, n_folds).result()
+
+    def train_async(self, use_cv: bool = True, n_folds: int = 5) -> Future:
+        """Trains model given as model_type on object instantiation, without blocking.
+        By defaults uses a cross validation (CV) technique to compute scores.
+        If use_cv is False, scores are only computed over train data.
+
+        A copy of the model is trained on the samples collected so far, in the executor given on object
+        instantiation, with the CV folds in parallel. Meanwhile the current model keeps serving predictions,
+        once trained the new model is swapped in atomically. Without executor the model is trained in this thread.
+
+        :param use_cv: Use cross validation to train model, defaults to True
+        :type use_cv: bool, optional
+        :param n_folds: Number of CV folds, defaults to 5
+        :type n_folds: int, optional
+        :raises ClfError: "No samples collected yet."
+        :return: Returns a future holding the train (and test) scores, or a ClfError if training failed.
+        :rtype: Future
+        """
         with self.lock:  # lock to prevent race condition
-            train_x = np.array(self.train_x)
+            train_x = self.train_x.data  # rows of the view are never modified, no need to copy.
             train_y = np.array(self.train_y)
+            self.train_generation += 1
+            generation = self.train_generation
 
         if len(train_y) < 1:
             raise ClfError("No samples collected yet.")
 
+        result = Future()
+        result.set_running_or_notify_cancel()
+        start = time.perf_counter()
         try:
-            self.model.fit(train_x, train_y)
-            if use_cv is True:
-                self.scores = cross_validate(self.model, train_x, train_y, cv=n_folds,
-                                             scoring=['precision', 'recall', 'f1', 'accuracy'],
-                                             return_train_score=True)
-            else:
-                train_pred = self.model.predict(train_y)
-                self.scores['train_precision'] = precision_score(train_y, train_pred)
-                self.scores['train_recall'] = recall_score(train_y, train_pred)
-                self.scores['train_f1'] = f1_score(train_y, train_pred)
-                self.scores['train_accuracy'] = accuracy_score(train_y, train_pred)
+            folds = list(StratifiedKFold(n_folds).split(train_x, train_y)) if use_cv else []
         except ValueError as e:
             raise ClfError(e)
 
-        return self.scores
-
-    def predict(self, event_timestamp: float) -> list:
+        executor = self.executor if self.executor is not None else _InlineExecutor()
+        futures = [executor.submit(fit_model, clone(self.model), train_x, train_y, not use_cv)]
+        futures += [executor.submit(score_fold, clone(self.model), train_x, train_y, train_index, test_index)
+                    for train_index, test_index in folds]
+
+        pending = [len(futures)]
+        pending_lock = threading.Lock()
+
+        def on_done(_: Future) -> None:
+            with pending_lock:
+                pending[0] -= 1
+                if pending[0] > 0:
+                    return
+            try:
+                model, scores = futures[0].result()
+                if use_cv:
+                    fold_scores = [future.result() for future in futures[1:]]
+                    scores = {key: np.array([fold[key] for fold in fold_scores]) for key in fold_scores[0]}
+            except ValueError as e:
+                result.set_exception(ClfError(e))
+                return
+            except Exception as e:
+                result.set_exception(e)
+                return
+
+            with self.lock:  # swap the trained model in, unless a more recently started training finished first.
+                scores['train_duration'] = time.perf_counter() - start  # complete before the scores are shared.
+                if generation > self.model_generation:
+                    self.model = model
+                    self.model_generation = generation
+                    self.num_updated = len(train_y)
+                    self.scores = scores
+            result.set_result(scores)
+
+        for future in futures:
+            future.add_done_callback(on_done)
+        return result
+
+    def predict(self, event_timestamp: float, trace: EventTrace | None = None) -> list:
         """Collects and predicts single event sample given by `event_timestamp`.
 
         :param event_timestamp: Original event timestamp
         :type event_timestamp: float
+        :param trace: Trace to record the stages of handling the event in, defaults to None
+        :type trace: EventTrace | None, optional
         :raises ClfError: Passes on sklearn.exception.NotFittedError as ClfError
         :return: Returns a list containing the sample prediction, the probabilities, the log probabilities,
                  and possible classes.
@@ -252,7 +661,149 @@ class Classifier:
         except NotFittedError as e:
             raise ClfError(e)
 
-        target_x = self.collect_sample(None, event_timestamp).reshape((1, -1))
-        target_pred = self.model.predict(target_x)
-        target_distance = self.model.decision_function(target_x)
+        return self.predict_features(self.collect_sample(None, event_timestamp, trace), trace)
+
+    def predict_features(self, x_data: npt.NDArray[np.float64], trace: EventTrace | None = None) -> list:
+        """Predicts a single sample of X data, e.g. as returned by `extract_features`.
+
+        :param x_data: X data of a single sample.
+        :type x_data: npt.NDArray[np.float64]
+        :param trace: Trace to record the stages of handling the event in, defaults to None
+        :type trace: EventTrace | None, optional
+        :raises ClfError: Passes on sklearn.exception.NotFittedError as ClfError
+        :return: Returns a list containing the sample prediction and the distance to the decision boundary.
+        :rtype: list
+        """
+        target_x = x_data.reshape((1, -1))
+        with self.lock:  # lock to prevent predicting while the model is being updated.
+            try:
+                target_pred = self.model.predict(target_x)
+                target_distance = self.model.decision_function(target_x)
+            except NotFittedError as e:
+                raise ClfError(e)
+        if trace is not None:
+            trace.mark('predicted')
         return target_pred, target_distance
+
+    #--------------------------#
+    # Save and load classifier #
+    #--------------------------#
+
+    def save(self, path: str | Path) -> None:
+        """Saves the classifier to a directory: the creation parameters as `params.json`, the (fitted) model
+        as `model.pkl`, and the train samples and labels as `train_x.npy` and `train_y.npy`.
+        The train data, and the raw epochs of the train samples, are stored as raw binary arrays,
+        so they can be memory-mapped when loading.
+        A classifier can be saved to the directory it was loaded from. `params.json` is written last, so a save that
+        did not complete is reported as corrupt when loading, instead of mixing files of different saves.
+
+        :param path: Directory to save the classifier to, created if it does not exist.
+        :type path: str | Path
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / 'params.json').unlink(missing_ok=True)
+        with self.lock:  # lock to save a consistent snapshot
+            train_x = self.train_x.data
+            train_y = np.array(self.train_y)
+            model = self.model
+            num_updated = self.num_updated
+            self.epochs.save(path)
+
+        params = {
+            'board_id': self.board_id,
+            'model_type': self.model_type,
+            'time_range': self.time_range,
+            'filter_freq_cutoff': self.filter_freq_cutoff,
+            'method': self.method_name,
+            'reference': self.reference,
+            'num_samples': len(train_y),
+            'num_updated': num_updated,
+            'epoch_range': self.epoch_range,
+        }
+        save_array(path / 'train_x.npy', train_x)
+        save_array(path / 'train_y.npy', train_y)
+        with open(path / 'model.pkl', 'wb') as file:
+            pickle.dump(model, file, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(path / 'params.json', 'w') as file:
+            json.dump(params, file, indent=4)
+
+    @classmethod
+    def load(cls, path: str | Path, board_shim: BoardShim, **kwargs) -> 'Classifier':
+        """Loads a classifier saved with `save`, the train data is memory-mapped instead of read.
+        Only load classifiers from trusted sources, the model is stored as a pickle.
+
+        :param path: Directory the classifier was saved to.
+        :type path: str | Path
+        :param board_shim: Brainflow BoardShim to collect data from EEG devices.
+        :type board_shim: BoardShim
+        :param kwargs: Other keyword arguments passed on to the classifier, e.g. `stream_filter`, `executor`.
+        :raises ClfError: "No saved classifier found"
+        :raises ClfError: "Saved classifier is corrupt"
+        :raises ClfError: "Saved classifier was created for another board"
+        :return: Returns the loaded classifier.
+        :rtype: Classifier
+        """
+        path = Path(path)
+        try:
+            with open(path / 'params.json') as file:
+                params = json.load(file)
+            if params['board_id'] != board_shim.get_board_id():
+                raise ClfError("Saved classifier was created for another board")
+            with open(path / 'model.pkl', 'rb') as file:
+                model = pickle.load(file)
+            mmap_mode = 'r' if params['num_samples'] > 0 else None  # empty files can not be memory-mapped.
+            train_x = np.load(path / 'train_x.npy', mmap_mode=mmap_mode)
+            train_y = np.load(path / 'train_y.npy', mmap_mode=mmap_mode)
+
+            clf = cls(board_shim, params['model_type'], params['time_range'], params['filter_freq_cutoff'],
+                      params['method'], params['reference'], **kwargs)
+            clf.model = model
+            clf.num_updated = params['num_updated']
+            if len(train_x) > 0:
+                clf.train_x = GrowableArray.wrap(train_x)  # copied once samples are collected.
+            clf.train_y = train_y.tolist()
+            if 'epoch_range' in params:  # the time range may have changed since collecting, see `refeaturize`.
+                clf.epochs = clf._create_epoch_store(params['epoch_range'])
+            clf.epochs.load(path)
+        except FileNotFoundError as e:
+            if any((path / name).exists() for name in ['params.json', 'model.pkl', 'train_x.npy']):
+                raise ClfError(f"Saved classifier is corrupt, the save did not complete: {e}")
+            raise ClfError(f"No saved classifier found: {e}")
+        except (ValueError, KeyError, TypeError, pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            # e.g. a partially written params.json or model.pkl, or a model of an incompatible sklearn version.
+            raise ClfError(f"Saved classifier is corrupt: {type(e).__name__}: {e}")
+        return clf
+
+    def set_auto_update(self, enabled: bool) -> None:
+        """Enables or disables updating the model on every collected train sample.
+        Only works with online model types, e.g. 'sgd' and 'online-lda', which are updated in constant time per sample.
+        When enabled, the model is first updated with the samples collected so far.
+
+        :param enabled: Enables auto updating when True, disables it when False.
+        :type enabled: bool
+        :raises ClfError: "Model type does not support online updates"
+        """
+        if enabled and not hasattr(self.model, 'partial_fit'):
+            raise ClfError("Model type does not support online updates")
+        with self.lock:
+            self.auto_update = enabled
+            if enabled:
+                self._update_model()
+
+    def _update_model(self) -> None:
+        """Updates the model with the train samples it has not seen yet. Should be called while holding self.lock.
+
+        :raises ClfError: Passes on ValueError, e.g. when a new class appears after the first update, as ClfError
+        """
+        if self.num_updated >= len(self.train_y):
+            return
+        classes = np.unique(self.train_y)
+        if not hasattr(self.model, 'classes_') and len(classes) < 2:
+            return  # online models need samples of at least two classes to start with.
+        try:
+            self.model.partial_fit(self.train_x.data[self.num_updated:],
+                                   np.array(self.train_y[self.num_updated:]), classes=classes)
+        except ValueError as e:
+            raise ClfError(e)
+        self.num_updated = len(self.train_y)
@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import numpy.typing as npt
+
+
+class _Entry:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.time_range = None
+        self.use_motion = False
+        self.data = None
+
+    def covers(self, time_range: list[int], use_motion: bool) -> bool:
+        return self.data is not None and (self.use_motion or not use_motion) and \
+            self.time_range[0] <= time_range[0] and self.time_range[1] >= time_range[1]
+
+
+class EpochCache:
+    """Caches the raw board data fetched for an event by the event timestamp, so classifiers handling
+    the same event share a single fetch. Data is cached as fetched and should not be modified.
+
+    Concurrent requests for the same event wait for the first request to finish fetching,
+    and reuse its data if it covers their time range, instead of fetching it again.
+
+    :param max_size: Maximum number of events to keep, least recently used events are dropped first,
+                     defaults to 16
+    :type max_size: int, optional
+    """
+
+    def __init__(self, max_size: int = 16) -> None:
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def fetch(self, event_timestamp: float, time_range: list[int], use_motion: bool,
+              fetch: callable) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64] | None]:
+        """Returns the cached board data of an event if it covers time_range (and motion data if use_motion is set),
+        otherwise fetches the data by calling fetch and caches it.
+
+        :param event_timestamp: Original event timestamp
+        :type event_timestamp: float
+        :param time_range: The time range of data needed, relative to the event, in ms.
+        :type time_range: list[int]
+        :param use_motion: Whether motion data is needed.
+        :type use_motion: bool
+        :param fetch: Function without arguments returning EEG and motion board data covering time_range.
+        :type fetch: callable
+        :return: Returns EEG board data, and motion board data if cached or use_motion is set.
+        :rtype: tuple[npt.NDArray[np.float64], npt.NDArray[np.float64] | None]
+        """
+        with self.lock:
+            entry = self.entries.setdefault(event_timestamp, _Entry())
+            self.entries.move_to_end(event_timestamp)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+        with entry.lock:
+            if not entry.covers(time_range, use_motion):
+                entry.data = fetch()
+                entry.time_range = time_range
+                entry.use_motion = use_motion
+            return entry.data
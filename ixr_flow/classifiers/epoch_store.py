@@ -0,0 +1,230 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from .epochs import window_bounds
+
+
+def save_array(path: str | Path, array: npt.NDArray) -> None:
+    """Saves an array to a `.npy` file, through a temporary file next to it which then replaces the file.
+    The file may be memory-mapped, e.g. by the array itself when it was loaded from there, `np.save` would truncate
+    the file under the mapping.
+
+    :param path: File to save the array to.
+    :type path: str | Path
+    :param array: Array to save.
+    :type array: npt.NDArray
+    """
+    path = Path(path)
+    temporary = path.with_name(f'{path.name}.tmp')
+    with open(temporary, 'wb') as file:
+        np.save(file, array)
+    os.replace(temporary, path)
+
+
+class GrowableArray:
+    """Array of equally shaped rows that can be appended to in amortized constant time.
+    Rows are stored in a preallocated buffer that grows geometrically when full, instead of in a list of arrays,
+    so all rows are available as a single contiguous array without copying, see `data`.
+    The shape of the rows is taken from the first row appended, unless given.
+
+    When a path is given the buffer is a memory-mapped file at that path, so rows are kept on disk instead
+    of in memory. The file holds the raw buffer, including the unused capacity. When the buffer grows, it moves
+    to a new file next to it, numbered by the times it grew.
+
+    :param row_shape: Shape of a single row, defaults to None (shape of the first row appended)
+    :type row_shape: tuple[int, ...] | None, optional
+    :param dtype: Data type of the rows, defaults to np.float64
+    :type dtype: npt.DTypeLike, optional
+    :param capacity: Number of rows to preallocate, defaults to 16
+    :type capacity: int, optional
+    :param path: File to memory-map the buffer to, defaults to None (kept in memory)
+    :type path: str | Path | None, optional
+    """
+
+    growth_factor = 2
+
+    def __init__(self, row_shape: tuple[int, ...] | None = None, dtype: npt.DTypeLike = np.float64,
+                 capacity: int = 16, path: str | Path | None = None) -> None:
+        self.row_shape = row_shape
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.path = Path(path) if path is not None else None
+        self.size = 0
+        self.buffer = None
+        self.owns_file = False  # whether the buffer is a memory-mapped file created by this array.
+        self.generation = 0  # number of files the buffer has been mapped to.
+
+    @classmethod
+    def wrap(cls, array: npt.NDArray, path: str | Path | None = None) -> 'GrowableArray':
+        """Creates a growable array holding the rows of an existing array, without copying it.
+        The array is only copied when appending rows, e.g. so read-only memory-mapped arrays can be wrapped.
+
+        :param array: Array of rows, shape (rows, ...).
+        :type array: npt.NDArray
+        :param path: File to memory-map the buffer to once it grows, defaults to None (kept in memory)
+        :type path: str | Path | None, optional
+        :return: Returns the growable array.
+        :rtype: GrowableArray
+        """
+        growable = cls(array.shape[1:], array.dtype, len(array), path)
+        growable.buffer = array
+        growable.size = len(array)
+        return growable
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def data(self) -> npt.NDArray:
+        """All rows appended so far, as a view onto the buffer. The rows of a view are never modified by
+        appending, so a view can be used as a snapshot."""
+        if self.buffer is None:
+            return np.empty((0, *(self.row_shape or ())), self.dtype)
+        return self.buffer[:self.size]
+
+    def append(self, row: npt.ArrayLike) -> None:
+        """Appends a row, growing the buffer if it is full.
+
+        :param row: Row to append, cast to the data type of the array.
+        :type row: npt.ArrayLike
+        :raises ValueError: If the row does not have the shape of the rows appended before.
+        """
+        row = np.asarray(row)
+        if self.row_shape is None:
+            self.row_shape = row.shape
+        elif row.shape != tuple(self.row_shape):
+            raise ValueError(f"Row of shape {row.shape} does not match rows of shape {self.row_shape}")
+        if self.buffer is None or self.size >= len(self.buffer):
+            self._grow()
+        self.buffer[self.size] = row
+        self.size += 1
+
+    def _grow(self) -> None:
+        capacity = max(self.capacity, self.size * self.growth_factor, 1)
+        shape = (capacity, *self.row_shape)
+        previous_file = None
+        if self.path is None:
+            buffer = np.empty(shape, self.dtype)
+        else:
+            # A file can not be enlarged while it is mapped on all platforms, so the buffer grows into a new file,
+            # the previous mapping, and views onto it, stay valid until they are released.
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            previous_file = Path(self.buffer.filename) if self.owns_file else None
+            self.generation += 1
+            path = self.path if self.generation == 1 else \
+                self.path.with_name(f'{self.path.stem}.{self.generation}{self.path.suffix}')
+            buffer = np.memmap(path, self.dtype, 'w+', shape=shape)
+            self.owns_file = True
+        if self.buffer is not None:
+            buffer[:self.size] = self.buffer[:self.size]
+        self.buffer = buffer
+        self.capacity = capacity
+        if previous_file is not None:
+            try:
+                previous_file.unlink()
+            except OSError:
+                pass  # still mapped by views handed out, on Windows, the file is left behind.
+
+
+class EpochStore:
+    """Stores the raw board data of the events of several presets (e.g. EEG and motion), so features can be
+    derived again later, e.g. with another time range or method, without collecting the events again.
+
+    Every epoch holds a fixed number of samples per preset starting at `start` relative to its event, and is
+    stored as float32 in a `GrowableArray` of shape (epochs, rows, samples). Timestamps are stored relative
+    to the event, so they keep their precision in float32. Epochs with fewer samples are padded by repeating
+    their last sample, the actual number of samples is stored alongside.
+
+    :param start: Start of the epochs relative to the event, in s.
+    :type start: float
+    :param shapes: Number of rows and samples of the epochs of each preset, by preset name.
+    :type shapes: dict[str, tuple[int, int]]
+    :param timestamp_channels: Timestamp row of each preset, by preset name.
+    :type timestamp_channels: dict[str, int]
+    :param path: Directory to memory-map the epochs to, defaults to None (kept in memory)
+    :type path: str | Path | None, optional
+    """
+
+    def __init__(self, start: float, shapes: dict[str, tuple[int, int]], timestamp_channels: dict[str, int],
+                 path: str | Path | None = None) -> None:
+        self.start = start
+        self.shapes = shapes
+        self.timestamp_channels = timestamp_channels
+        self.path = Path(path) if path is not None else None
+        self.epochs = {key: GrowableArray(shape, np.float32, path=self._file(f'{key}_epochs.dat'))
+                       for key, shape in shapes.items()}
+        self.lengths = {key: GrowableArray((), np.int32, path=self._file(f'{key}_lengths.dat')) for key in shapes}
+
+    def _file(self, name: str) -> Path | None:
+        return self.path / name if self.path is not None else None
+
+    def __len__(self) -> int:
+        return min(len(lengths) for lengths in self.lengths.values())
+
+    def append(self, event_timestamp: float, data: dict[str, npt.NDArray[np.float64]]) -> None:
+        """Stores the epoch of an event, taken from board data of each preset covering the event.
+
+        :param event_timestamp: Original event timestamp
+        :type event_timestamp: float
+        :param data: Board data of each preset, as returned by Brainflow, shape (rows, samples), by preset name.
+        :type data: dict[str, npt.NDArray[np.float64]]
+        """
+        for key, (_, num_samples) in self.shapes.items():
+            timestamps = data[key][self.timestamp_channels[key]]
+            start, _ = window_bounds(timestamps, event_timestamp + self.start, event_timestamp + self.start)
+            epoch = data[key][:, start:start + num_samples].astype(np.float32)
+            epoch[self.timestamp_channels[key]] = timestamps[start:start + num_samples] - event_timestamp
+            length = epoch.shape[1]
+            if 0 < length < num_samples:
+                epoch = np.pad(epoch, ((0, 0), (0, num_samples - length)), mode='edge')
+            elif length == 0:
+                epoch = np.zeros(self.shapes[key], np.float32)
+            self.epochs[key].append(epoch)
+            self.lengths[key].append(length)
+
+    def get(self, index: int) -> dict[str, npt.NDArray[np.float64]]:
+        """Returns a stored epoch as board data with timestamps relative to the event, i.e. at event timestamp 0.
+
+        :param index: Index of the epoch.
+        :type index: int
+        :return: Returns the board data of each preset, shape (rows, samples), by preset name.
+        :rtype: dict[str, npt.NDArray[np.float64]]
+        """
+        return {key: self.epochs[key].data[index, :, :self.lengths[key].data[index]].astype(np.float64)
+                for key in self.shapes}
+
+    def save(self, path: str | Path) -> None:
+        """Saves the epochs to `<preset>_epochs.npy` and `<preset>_lengths.npy` files in the directory path,
+        which may be the directory the epochs were loaded from, see `save_array`.
+
+        :param path: Directory to save the epochs to, should exist.
+        :type path: str | Path
+        """
+        path = Path(path)
+        for key in self.shapes:
+            save_array(path / f'{key}_epochs.npy', self.epochs[key].data)
+            save_array(path / f'{key}_lengths.npy', self.lengths[key].data)
+
+    def load(self, path: str | Path) -> None:
+        """Loads epochs saved with `save` from the directory path, the epochs are memory-mapped instead of read.
+        Nothing is loaded if any of the files is missing, or the epochs do not have the shape of this store.
+
+        :param path: Directory the epochs were saved to.
+        :type path: str | Path
+        """
+        path = Path(path)
+        epochs, lengths = {}, {}
+        for key, shape in self.shapes.items():
+            try:
+                epochs[key] = np.load(path / f'{key}_epochs.npy', mmap_mode='r')
+                lengths[key] = np.load(path / f'{key}_lengths.npy')
+            except (FileNotFoundError, ValueError):
+                return
+            if epochs[key].shape[1:] != tuple(shape) or len(epochs[key]) != len(lengths[key]):
+                return
+        for key in self.shapes:
+            self.epochs[key] = GrowableArray.wrap(epochs[key], self._file(f'{key}_epochs.dat'))
+            self.lengths[key] = GrowableArray.wrap(lengths[key], self._file(f'{key}_lengths.dat'))
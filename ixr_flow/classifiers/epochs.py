@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+import numpy.typing as npt
+
+
+def window_bounds(timestamps: npt.NDArray[np.float64], start: float, end: float) -> tuple[int, int]:
+    """Returns the index bounds of the samples with a timestamp in the closed interval [start, end].
+    Timestamps are expected to be sorted in ascending order.
+
+    :param timestamps: Sample timestamps, in seconds.
+    :type timestamps: npt.NDArray[np.float64]
+    :param start: Start of the interval, in seconds.
+    :type start: float
+    :param end: End of the interval, in seconds.
+    :type end: float
+    :return: Returns the first index and one past the last index of the interval.
+    :rtype: tuple[int, int]
+    """
+    return int(np.searchsorted(timestamps, start, side='left')), int(np.searchsorted(timestamps, end, side='right'))
+
+
+def window_edges(origin: float, start_ms: float, end_ms: float, window_ms: float) -> npt.NDArray[np.float64]:
+    """Computes the edges of fixed size windows aligned to origin and covering [origin + start_ms, origin + end_ms].
+    The first and last edges are clipped to the interval, so partial windows only cover samples inside of it.
+
+    :param origin: Timestamp windows are aligned to, in seconds.
+    :type origin: float
+    :param start_ms: Start of the interval relative to origin, in ms.
+    :type start_ms: float
+    :param end_ms: End of the interval relative to origin, in ms.
+    :type end_ms: float
+    :param window_ms: Window size, in ms.
+    :type window_ms: float
+    :return: Returns the window edges, in seconds.
+    :rtype: npt.NDArray[np.float64]
+    """
+    offsets = np.arange(math.floor(start_ms / window_ms), math.ceil(end_ms / window_ms) + 1) * window_ms
+    offsets = np.clip(offsets, start_ms, end_ms)
+    return origin + offsets / 1000
+
+
+def window_average(data: npt.NDArray[np.float64], timestamps: npt.NDArray[np.float64],
+                   edges: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Averages data over the windows given by edges. Each window is half open, [edge_i, edge_i+1),
+    except for the last one, which also includes samples stamped exactly on the last edge.
+    Windows that hold no samples are returned as NaN.
+
+    :param data: Data to average, shape (channels, samples).
+    :type data: npt.NDArray[np.float64]
+    :param timestamps: Sample timestamps, in seconds, sorted in ascending order.
+    :type timestamps: npt.NDArray[np.float64]
+    :param edges: Window edges as returned by `window_edges`, in seconds.
+    :type edges: npt.NDArray[np.float64]
+    :return: Returns the window averages, shape (channels, windows).
+    :rtype: npt.NDArray[np.float64]
+    """
+    indices = np.searchsorted(timestamps, edges, side='left')
+    indices[-1] = np.searchsorted(timestamps, edges[-1], side='right')
+    cumulative = np.zeros((data.shape[0], data.shape[1] + 1))
+    np.cumsum(data, axis=1, out=cumulative[:, 1:])
+    sums = cumulative[:, indices[1:]] - cumulative[:, indices[:-1]]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / np.diff(indices)
+
+
+def rereference(eeg: npt.NDArray[np.float64], reference: str,
+                ref_data: npt.NDArray[np.float64] | None = None) -> npt.NDArray[np.float64]:
+    """Re-references EEG data. The reference signal itself is appended as an extra channel,
+    with 'mean' the negated channel mean is appended, with 'fpz' the reference electrode(s).
+    Any other reference returns the data untouched.
+
+    :param eeg: EEG data, shape (channels, samples).
+    :type eeg: npt.NDArray[np.float64]
+    :param reference: Re-referencing method, 'mean' or 'fpz'.
+    :type reference: str
+    :param ref_data: Reference electrode data, shape (channels, samples), only used with 'fpz', defaults to None
+    :type ref_data: npt.NDArray[np.float64] | None, optional
+    :return: Returns re-referenced EEG data, shape (channels + 1, samples) when re-referenced.
+    :rtype: npt.NDArray[np.float64]
+    """
+    if reference == 'mean':
+        eeg_mean = eeg.mean(axis=0)
+        return np.vstack([eeg - eeg_mean, -eeg_mean])
+    if reference == 'fpz':
+        ref_mean = ref_data.mean(axis=0)
+        return np.vstack([eeg - ref_mean, ref_mean])
+    return eeg
@@ -0,0 +1,69 @@
+from functools import lru_cache
+
+import numpy as np
+import numpy.typing as npt
+from scipy import signal
+
+from .filters import bandpass_sos
+
+# Frequency bands in Hz, the same bands as displayed on the dashboard.
+FREQUENCY_BANDS = {
+    'delta': (1.0, 4.0),
+    'theta': (4.0, 8.0),
+    'alpha': (8.0, 13.0),
+    'beta': (13.0, 30.0),
+    'gamma': (30.0, 60.0),
+}
+
+
+@lru_cache(maxsize=64)
+def band_responses(bands: tuple[tuple[float, float], ...], filter_freq_cutoff: tuple[float, float],
+                   sample_rate: float, num_samples: int, order: int = 4) -> npt.NDArray[np.float64]:
+    """Computes the power responses of a bank of Butterworth bandpass filters (SOS form), each in series with
+    the bandpass filter given by filter_freq_cutoff, at the frequencies of a real FFT of num_samples samples.
+    The one-sided spectrum weights and FFT normalization are folded into the responses, see `log_band_power`.
+    Responses are cached, epochs of equal length share them.
+
+    :param bands: Lower- and upper-bound frequencies of each band.
+    :type bands: tuple[tuple[float, float], ...]
+    :param filter_freq_cutoff: Lower- and upper-bound filter cutoff frequencies, applied on top of every band.
+    :type filter_freq_cutoff: tuple[float, float]
+    :param sample_rate: Sample rate of the data, in Hz.
+    :type sample_rate: float
+    :param num_samples: Number of samples of the data.
+    :type num_samples: int
+    :param order: Order of the band filters, defaults to 4
+    :type order: int, optional
+    :return: Returns the weighted power responses, shape (bands, frequencies).
+    :rtype: npt.NDArray[np.float64]
+    """
+    freqs = np.fft.rfftfreq(num_samples, 1 / sample_rate)
+    _, cutoff_response = signal.sosfreqz(bandpass_sos(filter_freq_cutoff, sample_rate), worN=freqs, fs=sample_rate)
+    responses = np.empty((len(bands), len(freqs)))
+    for i, band in enumerate(bands):
+        _, band_response = signal.sosfreqz(bandpass_sos(band, sample_rate, order), worN=freqs, fs=sample_rate)
+        responses[i] = np.abs(band_response * cutoff_response) ** 2
+
+    # one-sided spectrum: all bins but DC (and Nyquist for even lengths) stand for two bins of the full spectrum.
+    weights = np.full(len(freqs), 2.0)
+    weights[0] = 1.0
+    if num_samples % 2 == 0:
+        weights[-1] = 1.0
+    return responses * weights / num_samples ** 2
+
+
+def log_band_power(data: npt.NDArray[np.float64], responses: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+    """Computes the log power of every channel in every band of a filter bank at once.
+    The spectrum of all channels is computed with a single FFT, by Parseval's theorem the mean power of each
+    filtered channel then follows from a single matrix product of the power spectrum and the band responses.
+
+    :param data: Data, shape (channels, samples).
+    :type data: npt.NDArray[np.float64]
+    :param responses: Weighted band power responses as returned by `band_responses`, shape (bands, frequencies).
+    :type responses: npt.NDArray[np.float64]
+    :return: Returns the log band power, shape (bands, channels).
+    :rtype: npt.NDArray[np.float64]
+    """
+    spectrum = np.fft.rfft(data, axis=1)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    return np.log(responses @ power.T + np.finfo(np.float64).tiny)
@@ -0,0 +1,94 @@
+import threading
+from functools import lru_cache
+
+import numpy as np
+import numpy.typing as npt
+from scipy import signal
+
+
+@lru_cache(maxsize=None)
+def bandpass_sos(filter_freq_cutoff: tuple[float, float], sample_rate: float,
+                 order: int = 5) -> npt.NDArray[np.float64]:
+    """Designs a Butterworth bandpass filter in second-order sections (SOS) form.
+    Designs are cached by their parameters, so classifiers with identical parameters share the same filter.
+    The returned array should therefore not be modified.
+
+    :param filter_freq_cutoff: Lower- and upper-bound filter cutoff frequencies, respectively.
+    :type filter_freq_cutoff: tuple[float, float]
+    :param sample_rate: Sample rate of the data to filter, in Hz.
+    :type sample_rate: float
+    :param order: Filter order, defaults to 5
+    :type order: int, optional
+    :return: Returns the filter second-order sections, shape (sections, 6).
+    :rtype: npt.NDArray[np.float64]
+    """
+    return signal.butter(order, filter_freq_cutoff, btype='bandpass', output='sos', fs=sample_rate)
+
+
+class StreamingFilter:
+    """Applies a SOS filter to a continuous stream of board data, keeping the filter state between calls.
+    Samples are only filtered once, successive (overlapping) windows reuse the already filtered samples.
+    A history of the most recently filtered samples is kept to serve these windows.
+
+    When a window does not connect to the previously filtered samples, the filter state is reset
+    to its steady state for the first sample of the window, this minimizes edge transients.
+
+    :param sos: Filter second-order sections, as returned by `bandpass_sos`.
+    :type sos: npt.NDArray[np.float64]
+    :param num_channels: Number of channels to filter.
+    :type num_channels: int
+    :param history_size: Number of filtered samples to keep.
+    :type history_size: int
+    """
+
+    def __init__(self, sos: npt.NDArray[np.float64], num_channels: int, history_size: int) -> None:
+        self.sos = sos
+        self.history_size = history_size
+        self.history = np.empty((num_channels, 0))
+        self.history_timestamps = np.empty(0)
+        self.zi = None
+        self.lock = threading.Lock()
+
+    @property
+    def last_timestamp(self) -> float:
+        """Timestamp of the last filtered sample, 0.0 if nothing has been filtered yet."""
+        return float(self.history_timestamps[-1]) if len(self.history_timestamps) > 0 else 0.0
+
+    def reset(self) -> None:
+        """Clears the filter state and the history of filtered samples."""
+        with self.lock:
+            self.history = self.history[:, :0]
+            self.history_timestamps = self.history_timestamps[:0]
+            self.zi = None
+
+    def filter(self, data: npt.NDArray[np.float64], timestamps: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """Filters a window of data. Only samples stamped after the last filtered sample are passed through the filter.
+
+        :param data: Data to filter, shape (channels, samples).
+        :type data: npt.NDArray[np.float64]
+        :param timestamps: Sample timestamps, in seconds, sorted in ascending order.
+        :type timestamps: npt.NDArray[np.float64]
+        :return: Returns the filtered data, shape (channels, samples).
+        :rtype: npt.NDArray[np.float64]
+        """
+        with self.lock:
+            first_new = int(np.searchsorted(timestamps, self.last_timestamp, side='right'))
+            if self.zi is None or first_new == 0 or timestamps[0] < self.history_timestamps[0]:
+                # No overlap with the filtered samples, samples in between were missed, or the window starts
+                # before the history, start over.
+                self.history = self.history[:, :0]
+                self.history_timestamps = self.history_timestamps[:0]
+                self.zi = signal.sosfilt_zi(self.sos)[:, np.newaxis, :] * data[:, :1]
+                first_new = 0
+
+            # samples of the window filtered before, taken before the history is trimmed to its size.
+            start = int(np.searchsorted(self.history_timestamps, timestamps[0], side='left'))
+            result = self.history[:, start:start + len(timestamps)]
+            if first_new < len(timestamps):
+                filtered, self.zi = signal.sosfilt(self.sos, data[:, first_new:], axis=1, zi=self.zi)
+                result = np.concatenate([result, filtered], axis=1)
+                self.history = np.concatenate([self.history, filtered], axis=1)[:, -self.history_size:]
+                self.history_timestamps = np.concatenate([self.history_timestamps,
+                                                          timestamps[first_new:]])[-self.history_size:]
+            assert result.shape[1] == len(timestamps), "filtered window is not aligned with its timestamps"
+            return result
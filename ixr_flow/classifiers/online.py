@@ -0,0 +1,127 @@
+import numpy as np
+import numpy.typing as npt
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.exceptions import NotFittedError
+
+
+class OnlineLDA(BaseEstimator, ClassifierMixin):
+    """Linear discriminant analysis with shrinkage that can be updated one sample at a time.
+
+    Keeps running class means and a pooled within-class scatter matrix (Welford's algorithm),
+    so an update costs O(n_features^2), independent of the number of samples seen.
+    The discriminant is only solved again when predicting after an update.
+
+    With shrinkage 'auto' the shrinkage intensity is estimated with the Ledoit-Wolf formula,
+    using running moments of the samples centered on the class mean at the time they were added.
+
+    :param shrinkage: Shrinkage intensity between 0 and 1, or 'auto', defaults to 'auto'
+    :type shrinkage: float | str, optional
+    """
+
+    def __init__(self, shrinkage: float | str = 'auto') -> None:
+        self.shrinkage = shrinkage
+
+    def fit(self, x: npt.NDArray[np.float64], y: npt.NDArray) -> 'OnlineLDA':
+        """Resets the model and fits it to all samples given.
+
+        :param x: Samples, shape (samples, features).
+        :type x: npt.NDArray[np.float64]
+        :param y: Labels, shape (samples,).
+        :type y: npt.NDArray
+        :return: Returns itself.
+        :rtype: OnlineLDA
+        """
+        for attribute in ['classes_', 'counts_', 'means_', 'scatter_', 'sum_norm4_']:
+            self.__dict__.pop(attribute, None)
+        return self.partial_fit(x, y)
+
+    def partial_fit(self, x: npt.NDArray[np.float64], y: npt.NDArray,
+                    classes: npt.NDArray | None = None) -> 'OnlineLDA':
+        """Updates the model with the samples given.
+
+        :param x: Samples, shape (samples, features).
+        :type x: npt.NDArray[np.float64]
+        :param y: Labels, shape (samples,).
+        :type y: npt.NDArray
+        :param classes: Unused, accepted for compatibility with other online estimators, defaults to None
+        :type classes: npt.NDArray | None, optional
+        :return: Returns itself.
+        :rtype: OnlineLDA
+        """
+        x = np.asarray(x, dtype=np.float64)
+        if not hasattr(self, 'classes_'):
+            self.classes_ = np.empty(0, dtype=np.asarray(y).dtype)
+            self.counts_ = np.empty(0, dtype=np.int64)
+            self.means_ = np.empty((0, x.shape[1]))
+            self.scatter_ = np.zeros((x.shape[1], x.shape[1]))
+            self.sum_norm4_ = 0.0
+
+        for sample, label in zip(x, y):
+            index = np.searchsorted(self.classes_, label)
+            if index == len(self.classes_) or self.classes_[index] != label:
+                self.classes_ = np.insert(self.classes_, index, label)
+                self.counts_ = np.insert(self.counts_, index, 0)
+                self.means_ = np.insert(self.means_, index, 0.0, axis=0)
+            self.counts_[index] += 1
+            delta = sample - self.means_[index]
+            self.means_[index] += delta / self.counts_[index]
+            centered = sample - self.means_[index]
+            self.scatter_ += np.outer(delta, centered)
+            self.sum_norm4_ += np.dot(centered, centered) ** 2
+        self._coef = None
+        return self
+
+    def _covariance(self) -> npt.NDArray[np.float64]:
+        n_samples = self.counts_.sum()
+        n_features = self.scatter_.shape[0]
+        if self.shrinkage == 'auto':
+            # Ledoit-Wolf, based on the running sums of the centered samples. The target, delta and beta all derive
+            # from the empirical covariance normalised by the number of samples, as in `sklearn.covariance`.
+            empirical = self.scatter_ / n_samples
+            mu = np.trace(empirical) / n_features
+            delta = np.sum((empirical - mu * np.eye(n_features)) ** 2) / n_features
+            beta = (self.sum_norm4_ / n_samples - np.sum(empirical ** 2)) / (n_features * n_samples)
+            shrinkage = 0.0 if delta == 0 else min(max(beta / delta, 0.0), 1.0)
+        else:
+            shrinkage = self.shrinkage
+        # the intensity is applied to the pooled covariance, shrunk towards its own mean variance.
+        covariance = self.scatter_ / max(n_samples - len(self.classes_), 1)
+        mu = np.trace(covariance) / n_features
+        covariance *= 1 - shrinkage
+        covariance.flat[::n_features + 1] += shrinkage * mu
+        return covariance
+
+    def _solve(self) -> None:
+        if not hasattr(self, 'classes_') or len(self.classes_) < 2:
+            raise NotFittedError("OnlineLDA needs samples of at least two classes before predicting.")
+        if self._coef is None:
+            priors = self.counts_ / self.counts_.sum()
+            self._coef = np.linalg.lstsq(self._covariance(), self.means_.T, rcond=None)[0].T
+            self._intercept = -0.5 * np.sum(self.means_ * self._coef, axis=1) + np.log(priors)
+
+    def decision_function(self, x: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """Computes the decision function, for two classes a positive value means the second class.
+
+        :param x: Samples, shape (samples, features).
+        :type x: npt.NDArray[np.float64]
+        :return: Returns decision values, shape (samples,) for two classes, (samples, classes) otherwise.
+        :rtype: npt.NDArray[np.float64]
+        """
+        self._solve()
+        scores = np.asarray(x, dtype=np.float64) @ self._coef.T + self._intercept
+        if len(self.classes_) == 2:
+            return scores[:, 1] - scores[:, 0]
+        return scores
+
+    def predict(self, x: npt.NDArray[np.float64]) -> npt.NDArray:
+        """Predicts the class of each sample.
+
+        :param x: Samples, shape (samples, features).
+        :type x: npt.NDArray[np.float64]
+        :return: Returns predicted labels, shape (samples,).
+        :rtype: npt.NDArray
+        """
+        scores = self.decision_function(x)
+        if scores.ndim == 1:
+            return self.classes_[(scores > 0).astype(int)]
+        return self.classes_[np.argmax(scores, axis=1)]
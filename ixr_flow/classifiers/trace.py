@@ -0,0 +1,44 @@
+import time
+
+# Stages an event passes through, in order, from receiving the LSL marker up to pushing the result.
+STAGES = ('received', 'decoded', 'started', 'data-ready', 'fetched', 'filtered', 'featurized', 'predicted', 'pushed')
+
+
+class EventTrace:
+    """Records when an event reached each stage of handling it, see STAGES, using a monotonic clock.
+    Stages an event does not pass through, e.g. `predicted` when collecting, are not recorded.
+    When a stage is reached more than once, e.g. when predicting with several classifiers, the last time counts.
+
+    :param name: Name of the classifier handling the event, empty for events handled by all classifiers.
+    :type name: str
+    :param task: Task of the event, e.g. 'collect' or 'predict'.
+    :type task: str
+    :param marks: Stages reached so far, as `time.perf_counter()` times by stage, defaults to None
+    :type marks: dict[str, float] | None, optional
+    """
+
+    def __init__(self, name: str, task: str, marks: dict[str, float] | None = None) -> None:
+        self.name = name
+        self.task = task
+        self.marks = dict(marks) if marks is not None else {}
+
+    def mark(self, stage: str) -> None:
+        """Records that the event reached stage now.
+
+        :param stage: Stage, one of STAGES.
+        :type stage: str
+        """
+        self.marks[stage] = time.perf_counter()
+
+    def durations(self) -> dict[str, float]:
+        """Returns the time spent on each stage reached, i.e. since reaching the previous stage,
+        and the total time since the first stage, in ms.
+
+        :return: Returns the durations by stage, and the total duration as 'total'.
+        :rtype: dict[str, float]
+        """
+        reached = [(stage, self.marks[stage]) for stage in STAGES if stage in self.marks]
+        durations = {stage: (mark - previous) * 1000 for (_, previous), (stage, mark) in zip(reached, reached[1:])}
+        if len(reached) > 0:
+            durations['total'] = (reached[-1][1] - reached[0][1]) * 1000
+        return durations
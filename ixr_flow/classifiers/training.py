@@ -0,0 +1,66 @@
+import time
+
+import numpy as np
+import numpy.typing as npt
+from sklearn.metrics import (accuracy_score, f1_score, precision_score,
+                             recall_score)
+
+SCORERS = {
+    'precision': precision_score,
+    'recall': recall_score,
+    'f1': f1_score,
+    'accuracy': accuracy_score,
+}
+
+
+def _score(model: any, x: npt.NDArray[np.float64], y: npt.NDArray, prefix: str) -> dict[str, float]:
+    pred = model.predict(x)
+    return {f'{prefix}_{name}': scorer(y, pred) for name, scorer in SCORERS.items()}
+
+
+def fit_model(model: any, x: npt.NDArray[np.float64], y: npt.NDArray, score_train: bool = False) -> tuple[any, dict]:
+    """Fits a model, meant to be executed in a worker process.
+
+    :param model: Unfitted sklearn model.
+    :type model: any
+    :param x: Train samples, shape (samples, features).
+    :type x: npt.NDArray[np.float64]
+    :param y: Train labels, shape (samples,).
+    :type y: npt.NDArray
+    :param score_train: Also computes scores over the train data, defaults to False
+    :type score_train: bool, optional
+    :return: Returns the fitted model and its fit time, plus train scores if score_train is set.
+    :rtype: tuple[any, dict]
+    """
+    start = time.perf_counter()
+    model.fit(x, y)
+    scores = {'fit_time': time.perf_counter() - start}
+    if score_train:
+        scores.update(_score(model, x, y, 'train'))
+    return model, scores
+
+
+def score_fold(model: any, x: npt.NDArray[np.float64], y: npt.NDArray,
+               train_index: npt.NDArray[np.int64], test_index: npt.NDArray[np.int64]) -> dict:
+    """Fits and scores a model on a single cross validation fold, meant to be executed in a worker process.
+    Returns the same scores as `sklearn.model_selection.cross_validate` for a single fold.
+
+    :param model: Unfitted sklearn model.
+    :type model: any
+    :param x: All samples, shape (samples, features).
+    :type x: npt.NDArray[np.float64]
+    :param y: All labels, shape (samples,).
+    :type y: npt.NDArray
+    :param train_index: Indices of the train samples of this fold.
+    :type train_index: npt.NDArray[np.int64]
+    :param test_index: Indices of the test samples of this fold.
+    :type test_index: npt.NDArray[np.int64]
+    :return: Returns fit time, score time, and train and test scores.
+    :rtype: dict
+    """
+    model, scores = fit_model(model, x[train_index], y[train_index])
+    start = time.perf_counter()
+    scores.update(_score(model, x[test_index], y[test_index], 'test'))
+    scores['score_time'] = time.perf_counter() - start
+    scores.update(_score(model, x[train_index], y[train_index], 'train'))
+    return scores
@@ -1,2 +1,3 @@
+from .dashboard_app import DashboardApp
 from .ixrdashboard import IXRDashboard
 from .tooltip import ToolTip
@@ -0,0 +1,31 @@
+from threading import Thread
+
+from pyqtgraph.Qt import QtGui
+
+from .ixrdashboard import IXRDashboard
+
+
+class DashboardApp(Thread):
+    """Runs the dashboards of all boards in a single Qt application, one window per board, executed in it's own
+    thread of control. The dashboards should not be started themselves.
+
+    The thread runs until all windows are closed.
+
+    :param dashboards: Dashboards to open a window for.
+    :type dashboards: list[IXRDashboard]
+    :param thread_name: Thread name, defaults to "thread_graph"
+    :type thread_name: str, optional
+    :param thread_daemon: Sets thread as daemon, or not, defaults to False
+    :type thread_daemon: bool, optional
+    """
+
+    def __init__(self, dashboards: list[IXRDashboard], thread_name: str = "thread_graph",
+                 thread_daemon: bool = False) -> None:
+        Thread.__init__(self, name=thread_name, daemon=thread_daemon)
+        self.dashboards = dashboards
+
+    def run(self) -> None:
+        app = QtGui.QApplication([])
+        for dashboard in self.dashboards:
+            dashboard.open_window(app)
+        app.exec_()
@@ -10,6 +10,9 @@ from brainflow import (BoardShim, BrainFlowError, BrainFlowExitCodes,
 from pylsl import StreamInfo, StreamOutlet, cf_double64
 from pyqtgraph.Qt import QtCore, QtGui
 
+from ixr_flow.board import BoardStateBus
+from ixr_flow.lsl_utility import namespaced
+
 
 @dataclass
 class Channel:
@@ -34,6 +37,12 @@ class IXRDashboard(Thread):
 
     :param board_shim: Brainflow BoardShim to collect data from EEG devices.
     :type board_shim: BoardShim
+    :param board_state: State of the board connection, when given updates are skipped while the board is not ready,
+                        without querying the board, defaults to None
+    :type board_state: BoardStateBus | None, optional
+    :param namespace: Name of the board, shown in the window title and prefixed to the name of the power metric
+                      stream when running several boards, see `namespaced`, defaults to '' (single board)
+    :type namespace: str, optional
     :param thread_name: Thread name, defaults to "graph"
     :type thread_name: str, optional
     :param thread_daemon: Sets thread as daemon, or not, defaults to False
@@ -41,12 +50,15 @@ class IXRDashboard(Thread):
     """
 
     def __init__(self, board_shim: BoardShim, reference: str = 'mean', display_ref: bool = False,
-                 thread_name: str = "thread_graph", thread_daemon: bool = False) -> None:
+                 board_state: BoardStateBus | None = None, namespace: str = '', thread_name: str = "thread_graph",
+                 thread_daemon: bool = False) -> None:
         Thread.__init__(self, name=thread_name, daemon=thread_daemon)
         self.board_shim = board_shim
+        self.board_state = board_state
         self.board_id = board_shim.get_board_id()
         self.reference = reference
         self.display_ref = display_ref
+        self.namespace = namespace
 
         pg.setConfigOption('background', '#264653')
         pg.setConfigOption('foreground', '#e9f5db')
@@ -55,16 +67,16 @@ class IXRDashboard(Thread):
         self.gyro_preset = BrainFlowPresets.AUXILIARY_PRESET
         self.ppg_preset = BrainFlowPresets.ANCILLARY_PRESET
 
-        eeg_description = BoardShim.get_board_descr(self.board_id, self.eeg_preset)
+        eeg_description = board_shim.get_board_descr(self.board_id, self.eeg_preset)
         self.eeg_channels = [Channel(ch_number, eeg_description['eeg_names'].split(',')[i], False, True)
                              for i, ch_number in enumerate(eeg_description['eeg_channels'])]
         self.eeg_channels += [Channel(ch_number, 'Fpz', True, self.display_ref)
                               for ch_number in eeg_description['other_channels']]
-        self.gyro_channels = BoardShim.get_gyro_channels(self.board_id, self.gyro_preset)
-        self.ppg_channels = BoardShim.get_ppg_channels(self.board_id, self.ppg_preset)
-        self.eeg_sampling_rate = BoardShim.get_sampling_rate(self.board_id, self.eeg_preset)
-        self.gyro_sampling_rate = BoardShim.get_sampling_rate(self.board_id, self.gyro_preset)
-        self.ppg_sampling_rate = BoardShim.get_sampling_rate(self.board_id, self.ppg_preset)
+        self.gyro_channels = board_shim.get_gyro_channels(self.board_id, self.gyro_preset)
+        self.ppg_channels = board_shim.get_ppg_channels(self.board_id, self.ppg_preset)
+        self.eeg_sampling_rate = board_shim.get_sampling_rate(self.board_id, self.eeg_preset)
+        self.gyro_sampling_rate = board_shim.get_sampling_rate(self.board_id, self.gyro_preset)
+        self.ppg_sampling_rate = board_shim.get_sampling_rate(self.board_id, self.ppg_preset)
         self.update_speed_ms = 100
         self.plot_window_s = 10  # should always be bigger then power_metric_window_ms
         self.power_metric_window_s = 1.5  # should always be bigger then psd size
@@ -82,16 +94,25 @@ class IXRDashboard(Thread):
         self.power_metrics = 0
 
         # LSL stream
-        name = 'BrainPower'
+        name = namespaced('BrainPower', namespace)
         logging.info(f"Starting '{name}' Power Metric stream.")
-        info_transmit = StreamInfo(name=name, type='IXR-metric', channel_count=1,
-                                   channel_format=cf_double64, source_id='ixrflow_transmit_power')
+        info_transmit = StreamInfo(name=name, type='IXR-metric', channel_count=1, channel_format=cf_double64,
+                                   source_id=namespaced('ixrflow_transmit_power', namespace))
         self.outlet_transmit = StreamOutlet(info_transmit)
         logging.info(f"'{self.outlet_transmit.get_info().name()}' Power Metric stream started.")
 
     def run(self):
-        self.app = QtGui.QApplication([])
-        self.win = pg.GraphicsWindow(title='IXR-flow', size=(1500, 1000))
+        self.open_window(QtGui.QApplication([]))
+        QtGui.QApplication.instance().exec_()
+
+    def open_window(self, app: QtCore.QCoreApplication) -> None:
+        """Opens the dashboard window and starts updating it, in the thread running the Qt application.
+
+        :param app: Qt application the window belongs to.
+        :type app: QtCore.QCoreApplication
+        """
+        self.app = app
+        self.win = pg.GraphicsWindow(title=f'IXR-flow {self.namespace}'.strip(), size=(1500, 1000))
 
         self._init_pens()
         self._init_timeseries()
@@ -99,10 +120,9 @@ class IXRDashboard(Thread):
         self._init_band_plot()
         self._init_brain_power_plot()
 
-        timer = QtCore.QTimer()
-        timer.timeout.connect(self._update)
-        timer.start(self.update_speed_ms)
-        QtGui.QApplication.instance().exec_()
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self._update)
+        self.timer.start(self.update_speed_ms)
 
     def set_parameters(self, calib_length: int = 600, power_length: int = 10, scale: float = 1.5,
                        offset: float = 0.5, head_impact: float = 0.2) -> None:
@@ -233,18 +253,22 @@ class IXRDashboard(Thread):
         ay.setTicks([tickdict.items()])
 
     def _update(self) -> None:
+        if self.board_state is not None and not self.board_state.is_ready():
+            # if no samples are arriving, abort this method.
+            return
         if not self.board_shim.is_prepared():
             # if no connection is established, abort this method.
             return
 
         try:
-            eeg_data = self.board_shim.get_current_board_data(int(self.plot_window_s * self.eeg_sampling_rate),
-                                                              self.eeg_preset)
+            # The data is filtered in place below, copy it, the board data may be a read-only view on a shared buffer.
+            eeg_data = np.array(self.board_shim.get_current_board_data(
+                int(self.plot_window_s * self.eeg_sampling_rate), self.eeg_preset))
             gyro_data = self.board_shim.get_current_board_data(int(self.plot_window_s * self.gyro_sampling_rate),
                                                                self.gyro_preset)[self.gyro_channels, :]
             # Only pick the first of the PPG channels, which is channel 1 (zero indexed) of the board data array
-            ppg_data = self.board_shim.get_current_board_data(int(self.plot_window_s * self.ppg_sampling_rate),
-                                                              self.ppg_preset)[self.ppg_channels[0], :]
+            ppg_data = np.array(self.board_shim.get_current_board_data(
+                int(self.plot_window_s * self.ppg_sampling_rate), self.ppg_preset)[self.ppg_channels[0], :])
         except BrainFlowError as e:
             # Right after board preparation the Brainflow connection might be a bit unstable.
             # In that case Brainflow throws an INVALID_ARGUMENTS_ERROR exception.
@@ -1,14 +1,20 @@
 import argparse
 import logging
+import re
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
 from pathlib import Path
 from threading import Event
 from time import strftime
 
 from brainflow.board_shim import BoardIds, BoardShim, BrainFlowInputParams
 
-from ixr_flow.board import BrainFlowHandler
-from ixr_flow.lsl_utility import BfLslDataPublisher, LslEventListener, LslLogger
-from ixr_flow.gui import IXRDashboard
+from ixr_flow.board import BrainFlowHandler, PlaybackBoard, SyntheticBoard
+from ixr_flow.lsl_utility import (AsyncLslRuntime, BfLslDataPublisher, ClockSync, CommandDispatcher, LslEventListener,
+                                  LslLogger, namespaced)
+from ixr_flow.gui import DashboardApp, IXRDashboard
+from ixr_flow.process_runtime import ProcessRuntime
+from ixr_flow.recording import SessionRecorder
 
 
 class IXRFlow:
@@ -18,6 +24,10 @@ class IXRFlow:
 
         parser = self.create_parser()
         self.args = parser.parse_args(args)
+        if self.args.boards is not None:
+            names = [name for name, _ in self.args.boards]
+            if len(set(names)) < len(names):
+                parser.error(f"board names should be unique, got {', '.join(names)}")
 
         log_file_path = Path(self.args.log_file)
         if not log_file_path.parent.exists():
@@ -48,44 +58,225 @@ class IXRFlow:
         logging.getLogger().handlers = []  # release all root logger handlers
 
     def run(self) -> None:
-        params = BrainFlowInputParams()
-        params.timeout = self.args.timeout
+        record_path = None
+        if self.args.record is not None:
+            record_path = Path(self.args.record)
+            if record_path.exists() and any(record_path.iterdir()):
+                logging.warning(f"A recording with this name {self.args.record} already exists. "
+                                "The old recording has been renamed with a timestamp.")
+                record_path.rename(record_path.with_name(f'{record_path.name}_{strftime("%Y-%m-%d_%H-%M-%S")}'))
+
+        if self.args.runtime == 'processes':
+            logging.info("Starting IXR-flow split over processes.")
+            ProcessRuntime(self.args, self.create_board, self.board_file, record_path).run()
+            return
 
         stay_alive = Event()
         stay_alive.set()
 
-        logging.info("Starting Brainflow Session (with Bluetooth connection)")
-        board_shim = BoardShim(self.args.board_id, params)
-        brainflow_thread = BrainFlowHandler(board_shim, params, stay_alive, self.args.streamer_params)
-        brainflow_thread.start()
+        logging.info("Starting clock synchronization.")
+        clock_sync = ClockSync(stay_alive, interval=self.args.clock_sync_interval)
+        clock_sync.start()
+
+        # the boards share the training processes and the event worker threads. The training processes are
+        # spawned, forking a process running Qt, Brainflow and LSL threads is not safe.
+        train_executor = ProcessPoolExecutor(max_workers=self.args.train_workers, mp_context=get_context('spawn'))
+        dispatcher = CommandDispatcher(self.args.event_workers, self.args.event_queue_depth)
+
+        # without --board a single board is run, of which the streams are not namespaced.
+        boards = self.args.boards if self.args.boards is not None else [('', self.args.source)]
+        brainflow_threads, dashboards, recorders, listeners, publishers = [], [], [], [], []
+        for name, source in boards:
+            params = BrainFlowInputParams()
+            params.timeout = self.args.timeout
+            board_shim = self.create_board(self.args, source, params, name)
+            brainflow_thread = BrainFlowHandler(board_shim, params, stay_alive, self.args.streamer_params,
+                                                thread_name=namespaced("thread_brainflow", name))
+            brainflow_thread.start()
+            brainflow_threads.append(brainflow_thread)
+            # consumers read the samples the Brainflow thread drains from the board into its shared buffer.
+            board_buffer = brainflow_thread.board_buffer
+
+            dashboard = IXRDashboard(board_buffer, self.args.reference, self.args.display_ref,
+                                     board_state=brainflow_thread.board_state, namespace=name)
+            dashboard.set_parameters(self.args.calib_length, self.args.power_length,
+                                     self.args.scale, self.args.offset, self.args.head_impact)
+            dashboards.append(dashboard)
+
+            recorder = None
+            if record_path is not None:
+                recorder = SessionRecorder(record_path / name, stay_alive,
+                                           thread_name=namespaced("session_recorder", name))
+                recorder.start()
+                recorders.append(recorder)
+
+            logging.info(f"Creating LSL event listener and Brainflow LSL data publisher"
+                         f"{f' of board {name}' if name != '' else ''}.")
+            listeners.append(LslEventListener(board_buffer, reference=self.args.reference,
+                                              stream_filter=self.args.stream_filter,
+                                              data_ready=brainflow_thread.data_ready,
+                                              train_executor=train_executor,
+                                              epoch_dir=str(Path(self.args.epoch_dir) / name)
+                                              if self.args.epoch_dir is not None else None,
+                                              dispatcher=dispatcher,
+                                              latency_dump=self.board_file(self.args.latency_dump, name),
+                                              clock_sync=clock_sync,
+                                              board_state=brainflow_thread.board_state,
+                                              health=brainflow_thread.health,
+                                              recorder=recorder, namespace=name,
+                                              stay_alive=stay_alive, thread_name=namespaced("lsl_event_listener", name),
+                                              thread_daemon=False))
+
+            publishers.append(BfLslDataPublisher(board_buffer, push_full_vec=self.args.push_full_vec,
+                                                 float32=self.args.lsl_float32,
+                                                 push_interval=self.args.push_interval,
+                                                 chunk_size=self.args.lsl_chunk_size,
+                                                 max_buffered=self.args.lsl_max_buffered,
+                                                 stay_alive=stay_alive, clock_sync=clock_sync,
+                                                 board_state=brainflow_thread.board_state,
+                                                 recorder=recorder, namespace=name,
+                                                 thread_name=namespaced("lsl_data_pusher", name), thread_daemon=False))
 
         logging.info("Starting dashboard.")
-        dashboard_thread = IXRDashboard(board_shim, self.args.reference, self.args.display_ref,
-                                      thread_name="graph_1", thread_daemon=False)
-        dashboard_thread.set_parameters(self.args.calib_length, self.args.power_length,
-                                        self.args.scale, self.args.offset, self.args.head_impact)
+        dashboard_thread = DashboardApp(dashboards, thread_name="graph_1", thread_daemon=False)
         dashboard_thread.start()
 
-        logging.info("Starting LSL event listener.")
-        lsl_event_listener_thread = LslEventListener(board_shim, reference=self.args.reference,
-                                                     stay_alive=stay_alive, thread_daemon=False)
-        lsl_event_listener_thread.start()
-
-        logging.info("Starting Brainflow LSL data publisher.")
-        lsl_data_pusher_thread = BfLslDataPublisher(board_shim, push_full_vec=self.args.push_full_vec, stay_alive=stay_alive, thread_daemon=False)
-        lsl_data_pusher_thread.start()
+        if self.args.runtime == 'asyncio':
+            logging.info("Starting LSL event listener and Brainflow LSL data publisher on an asyncio runtime.")
+            lsl_runtime = AsyncLslRuntime(stay_alive, listeners, publishers)
+            lsl_threads = [lsl_runtime]
+        else:
+            logging.info("Starting LSL event listener and Brainflow LSL data publisher.")
+            lsl_runtime = None
+            lsl_threads = listeners + publishers
+        for lsl_thread in lsl_threads:
+            lsl_thread.start()
 
         logging.info("Running IXR-flow as long as the dashboard is open, please close the dashboard to close IXR-flow.")
         dashboard_thread.join()
 
         logging.info("IXR-flow dashboard closed, terminating all child threads.")
         stay_alive.clear()
-        lsl_event_listener_thread.join()
-        lsl_data_pusher_thread.join()
-        brainflow_thread.join()
-        brainflow_thread.release_brainflow()
+        if lsl_runtime is not None:
+            lsl_runtime.stop()
+        for lsl_thread in lsl_threads:
+            lsl_thread.join()
+        dispatcher.shutdown()
+        train_executor.shutdown(cancel_futures=True)
+        clock_sync.join()
+        for recorder in recorders:
+            recorder.join()
+        for brainflow_thread in brainflow_threads:
+            brainflow_thread.join()
+            brainflow_thread.release_brainflow()
         logging.info("Successfully shutdown.")
 
+    @staticmethod
+    def create_board(args: argparse.Namespace, source: tuple[str, list], params: BrainFlowInputParams,
+                     namespace: str = '') -> BoardShim | PlaybackBoard | SyntheticBoard:
+        """Creates the board of a source, see `parse_source`.
+
+        :param args: Parsed arguments.
+        :type args: argparse.Namespace
+        :param source: Source and its arguments.
+        :type source: tuple[str, list]
+        :param params: Brainflow input parameters of a live board.
+        :type params: BrainFlowInputParams
+        :param namespace: Name of the board, prefixed to the name of the marker stream of a playback, defaults to ''
+        :type namespace: str, optional
+        :return: Returns the board.
+        :rtype: BoardShim | PlaybackBoard | SyntheticBoard
+        """
+        source, arguments = source
+        if source == 'playback':
+            logging.info(f"Playing back recording {arguments[0]} at {args.speed}x speed, without a board.")
+            return PlaybackBoard(arguments[0], speed=args.speed,
+                                 marker_stream=namespaced('SendMarkersOnClick', namespace))
+        if source == 'synthetic':
+            logging.info(f"Generating a synthetic signal of {arguments[0]} channels at {arguments[1]} Hz at "
+                         f"{args.speed}x speed, without a board.")
+            return SyntheticBoard(arguments[0], arguments[1], speed=args.speed)
+        logging.info("Starting Brainflow Session (with Bluetooth connection)")
+        if len(arguments) > 0:
+            params.serial_number = arguments[0]  # the device name of a Muse, e.g. MuseS-1A2B.
+        return BoardShim(args.board_id, params)
+
+    @staticmethod
+    def board_file(path: str | None, namespace: str) -> str | None:
+        """Returns the file of a board, given the file passed as argument: without a namespace, i.e. a single board,
+        the file as given, otherwise the file with the namespace appended to its name, e.g. `latency_p1.json`.
+
+        :param path: File passed as argument, or None.
+        :type path: str | None
+        :param namespace: Name of the board.
+        :type namespace: str
+        :return: Returns the file of the board, None if path is None.
+        :rtype: str | None
+        """
+        if path is None or namespace == '':
+            return path
+        return str(Path(path).with_stem(f'{Path(path).stem}_{namespace}'))
+
+    @staticmethod
+    def parse_source(value: str) -> tuple[str, list]:
+        """Parses the --source argument: `board[:<serial number>]`, `playback:<directory>` or
+        `synthetic[:<channels>,<rate>]`.
+
+        :param value: Argument value.
+        :type value: str
+        :raises argparse.ArgumentTypeError: If the value is not a valid source.
+        :return: Returns the source and its arguments.
+        :rtype: tuple[str, list]
+        """
+        source, _, arguments = value.partition(':')
+        if source == 'board':
+            return source, [arguments] if arguments != '' else []
+        if source == 'playback' and arguments != '':
+            return source, [arguments]
+        if source == 'synthetic':
+            try:
+                channels, rate = (int(argument) for argument in (arguments or '4,256').split(','))
+            except ValueError:
+                raise argparse.ArgumentTypeError(f"expected synthetic:<channels>,<rate>, got '{value}'") from None
+            if channels > 0 and rate > 0:
+                return source, [channels, rate]
+        raise argparse.ArgumentTypeError(f"expected board, playback:<directory> or synthetic:<channels>,<rate>, "
+                                         f"got '{value}'")
+
+    @staticmethod
+    def parse_board(value: str) -> tuple[str, tuple[str, list]]:
+        """Parses a --board argument: `<name>[=<source>]`, the source as `parse_source`, defaults to `board`.
+
+        :param value: Argument value.
+        :type value: str
+        :raises argparse.ArgumentTypeError: If the name is not a valid board name or the source is not valid.
+        :return: Returns the board name, and the source and its arguments.
+        :rtype: tuple[str, tuple[str, list]]
+        """
+        name, _, source = value.partition('=')
+        if re.fullmatch(r'[A-Za-z0-9_]+', name) is None:
+            raise argparse.ArgumentTypeError(f"expected a board name of letters, digits and underscores, got '{name}'")
+        return name, IXRFlow.parse_source(source or 'board')
+
+    @staticmethod
+    def parse_speed(value: str) -> float:
+        """Parses the --speed argument, at least real time, as the stall detection and the timeouts of the
+        consumers run on the wall clock.
+
+        :param value: Argument value.
+        :type value: str
+        :raises argparse.ArgumentTypeError: If the value is not a number of at least 1.0.
+        :return: Returns the speed.
+        :rtype: float
+        """
+        try:
+            speed = float(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected a number, got '{value}'") from None
+        if not speed >= 1.0:
+            raise argparse.ArgumentTypeError(f"expected a speed of at least 1.0, got '{value}'")
+        return speed
+
     @staticmethod
     def create_parser() -> argparse.ArgumentParser:
         parser = argparse.ArgumentParser("IXR-flow")
@@ -98,6 +289,24 @@ class IXRFlow:
         parser.add_argument('--timeout', type=int, help='timeout for device discovery or connection', required=False,
                             default=30)
         parser.add_argument('--streamer-params', type=str, help='streamer params', required=False, default='')
+        parser.add_argument('--source', type=IXRFlow.parse_source, default='board',
+                            help="Source of the data. "
+                                 " - board[:<serial number>] (default): The Brainflow board given by --board-id, "
+                                 "optionally the one with the given serial number, the device name for a Muse."
+                                 " - playback:<directory>: Plays back a session recorded with --record, including "
+                                 "the markers, which are pushed on the SendMarkersOnClick LSL stream."
+                                 " - synthetic:<channels>,<rate>: Generates a deterministic EEG signal of channels "
+                                 "channels at rate Hz, and motion and PPG data, defaults to 4 channels at 256 Hz.")
+        parser.add_argument('--board', type=IXRFlow.parse_board, action='append', dest='boards', default=None,
+                            metavar='<name>[=<source>]',
+                            help="Runs a board named name, with a source as --source, defaults to board. Repeat to "
+                                 "run several boards in one process, e.g. --board p1=board:MuseS-1A2B --board "
+                                 "p2=board:MuseS-3C4D. All LSL streams of a board are prefixed with its name, e.g. "
+                                 "p1-ixr-flow-eeg-data, its events are received on p1-SendMarkersOnClick. "
+                                 "Replaces --source, all other arguments apply to every board.")
+        parser.add_argument('--speed', type=IXRFlow.parse_speed, default=1.0,
+                            help="Speed of a playback or synthetic source relative to real time, at least 1.0, "
+                                 "defaults to 1.0. Above 1.0 the timestamps of the data run ahead of the wall clock.")
 
         # re-referencing options.
         parser.add_argument('--reference', type=str, default='mean', choices=['none', 'mean', 'ref'],
@@ -108,6 +317,23 @@ class IXRFlow:
         parser.add_argument('--display-ref', action='store_true',
                             help="Displays signal of the reference electrode(s) on the dashboard. ")
 
+        # classifier options.
+        parser.add_argument('--stream-filter', action='store_true',
+                            help="Keeps a running filter state per classifier, so collected samples reuse already "
+                                 "filtered data instead of filtering each sample from scratch.")
+        parser.add_argument('--train-workers', type=int, default=None,
+                            help="Number of worker processes to train classifiers in, defaults to the number of CPUs.")
+        parser.add_argument('--event-workers', type=int, default=4,
+                            help="Number of threads handling LSL events, events of one classifier are handled in "
+                                 "order, events of different classifiers in parallel, defaults to 4.")
+        parser.add_argument('--event-queue-depth', type=int, default=16,
+                            help="Maximum number of queued LSL events per classifier, defaults to 16.")
+        parser.add_argument('--latency-dump', type=str, default=None,
+                            help="File to write the latency percentiles of handling LSL events to at shutdown.")
+        parser.add_argument('--epoch-dir', type=str, default=None,
+                            help="Directory to keep the raw epochs of collected samples in, memory-mapped, "
+                                 "instead of in memory.")
+
         # IXR-flow Dashboard arguments
         parser.add_argument('--calib-length', type=int, default=600, help='Calibration length, defaults to 600')
         parser.add_argument('--power-length', type=int, default=10, help='Power length, defaults to 10')
@@ -125,4 +351,28 @@ class IXRFlow:
                             help="Disables logging over lsl.")
         parser.add_argument('--push_full_vec', action='store_true',
                             help='Push the full vector over LSL received by Brainflow.')
+        parser.add_argument('--lsl-float32', action='store_true',
+                            help="Push the data over LSL as 32 bit floats, halving the bandwidth. Timestamps in the "
+                                 "full vector lose their precision, use the LSL timestamps instead.")
+        parser.add_argument('--push-interval', type=float, default=0.02,
+                            help="Time between pushing new board data over LSL, in s, defaults to 0.02")
+        parser.add_argument('--lsl-chunk-size', type=int, default=0,
+                            help="Chunk size of the LSL data streams, in samples, defaults to 0 (one chunk per push).")
+        parser.add_argument('--lsl-max-buffered', type=int, default=360,
+                            help="Maximum time the LSL data streams buffer data for a receiver, in s, defaults to 360")
+        parser.add_argument('--runtime', type=str, default='threads', choices=['threads', 'asyncio', 'processes'],
+                            help="Determines how LSL I/O is run. "
+                                 " - threads (default): The event listener and data publisher run in threads of "
+                                 "their own."
+                                 " - asyncio: The event listener and data publisher run as tasks on one asyncio "
+                                 "event loop, shutting down right away."
+                                 " - processes: The acquisition of each board, the dashboard, the data publisher "
+                                 "and the event listener run in processes of their own, sharing the board data in "
+                                 "shared memory, so they do not compete for the GIL.")
+        parser.add_argument('--record', type=str, default=None,
+                            help="Directory to record the raw EEG, motion and PPG data and the received markers to, "
+                                 "see ixr_flow.recording.")
+        parser.add_argument('--clock-sync-interval', type=float, default=1.0,
+                            help="Time between measurements of the offset between the LSL clock and the wall clock, "
+                                 "in s, defaults to 1.0")
         return parser
@@ -1,3 +1,10 @@
+from .async_runtime import AsyncLslRuntime
 from .bf_lsl_data_publisher import BfLslDataPublisher
+from .clock_sync import ClockSync
+from .command_dispatcher import CommandDispatcher
+from .commands import Command, parse_message
+from .latency_tracer import LatencyTracer
 from .lsl_event_listener import LslEventListener, DecodeError
 from .lsl_logger import LslLogger
+from .lsl_prediction_streamer import LslPredictionStreamer
+from .stream_names import namespaced
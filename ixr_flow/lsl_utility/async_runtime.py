@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Thread
+from typing import Any
+
+from .bf_lsl_data_publisher import BfLslDataPublisher
+from .lsl_event_listener import LslEventListener
+
+
+class AsyncLslRuntime(Thread):
+    """Alternative to running the LSL event listener and the data publisher in threads of their own,
+    runs their LSL I/O as tasks on a single asyncio event loop, executed in it's own thread of control.
+    When running several boards, the event listeners and data publishers of all boards run on the same loop.
+
+    Looking for the event stream, pulling events and pushing data block in pylsl, these calls run in a small thread
+    pool with short timeouts, so they never hold up the event loop. Commands are handled by the workers of the event
+    listener, and classifiers are trained in its process pool, as in the threaded runtime.
+
+    Call `stop` after clearing stay_alive to shut down right away, all tasks are cancelled, blocking calls still
+    running in the thread pool are waited for, they time out within io_timeout, then the components are shut down.
+    Without calling `stop`, stay_alive is checked every stop_check_interval.
+
+    :param stay_alive: Life line to indicate that the thread should stay alive.
+    :type stay_alive: Event
+    :param event_listeners: Event listeners to run, they should not be started themselves, defaults to None
+    :type event_listeners: list[LslEventListener] | None, optional
+    :param data_publishers: Data publishers to run, they should not be started themselves, defaults to None
+    :type data_publishers: list[BfLslDataPublisher] | None, optional
+    :param io_workers: Number of threads for blocking pylsl calls, defaults to None (one per event listener and
+                       data publisher)
+    :type io_workers: int | None, optional
+    :param io_timeout: Timeout of blocking pylsl calls, in s, defaults to 0.2
+    :type io_timeout: float, optional
+    :param thread_name: Thread name, defaults to "lsl_async_runtime"
+    :type thread_name: str, optional
+    :param thread_daemon: Sets thread as daemon, or not, defaults to False
+    :type thread_daemon: bool, optional
+    """
+
+    stop_check_interval = 0.1  # in s
+
+    def __init__(self, stay_alive: Event, event_listeners: list[LslEventListener] | None = None,
+                 data_publishers: list[BfLslDataPublisher] | None = None, io_workers: int | None = None,
+                 io_timeout: float = 0.2, thread_name: str = "lsl_async_runtime", thread_daemon: bool = False) -> None:
+        Thread.__init__(self, name=thread_name, daemon=thread_daemon)
+        self.stay_alive = stay_alive
+        self.event_listeners = event_listeners if event_listeners is not None else []
+        self.data_publishers = data_publishers if data_publishers is not None else []
+        self.io_workers = io_workers if io_workers is not None \
+            else max(len(self.event_listeners) + len(self.data_publishers), 1)
+        self.io_timeout = io_timeout
+        self.loop = None
+        self.stopped = None
+        self.executor = None
+        self.inlets = {}  # inlet of the event stream per connected event listener.
+
+    def run(self) -> None:
+        """Once a thread object is created, its activity must be started by calling the thread’s start() method.
+        This invokes the run() method in a separate thread of control.
+        """
+        asyncio.run(self._main())
+
+    def stop(self) -> None:
+        """Stops the runtime right away, can be called from any thread."""
+        if self.loop is None:
+            return  # not running yet, stay_alive is checked once it does.
+        try:
+            self.loop.call_soon_threadsafe(self.stopped.set)
+        except RuntimeError:
+            pass  # the loop has already been closed.
+
+    async def _main(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.stopped = asyncio.Event()
+        self.executor = ThreadPoolExecutor(self.io_workers, thread_name_prefix="lsl_io")
+        tasks = [asyncio.create_task(self._listen(listener), name=listener.name) for listener in self.event_listeners]
+        tasks += [asyncio.create_task(self._publish(publisher), name=publisher.name)
+                  for publisher in self.data_publishers]
+
+        watch = asyncio.create_task(self._watch_stay_alive())
+        await asyncio.wait(tasks + [watch], return_when=asyncio.FIRST_COMPLETED)
+        for task in tasks + [watch]:
+            task.cancel()
+        results = await asyncio.gather(*tasks, watch, return_exceptions=True)
+        for task, result in zip(tasks, results):
+            if isinstance(result, Exception):
+                logging.error(f"LSL task {task.get_name()} failed: {result!r}")
+
+        # blocking calls still running finish within io_timeout, wait for them before the inlets and outlets they
+        # use are closed, without holding up the loop.
+        await asyncio.to_thread(self.executor.shutdown, wait=True, cancel_futures=True)
+        for publisher in self.data_publishers:
+            publisher.shutdown()
+        for listener in self.event_listeners:
+            listener.shutdown(self.inlets.get(listener))
+
+    async def _watch_stay_alive(self) -> None:
+        while self.stay_alive.is_set() and not self.stopped.is_set():
+            try:
+                await asyncio.wait_for(self.stopped.wait(), self.stop_check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _io(self, function: Callable, *args) -> Any:
+        """Runs a blocking call in the thread pool, without holding up the loop."""
+        return await self.loop.run_in_executor(self.executor, function, *args)
+
+    async def _listen(self, listener: LslEventListener) -> None:
+        inlet = None
+        while inlet is None:
+            inlet = await self._io(listener.connect, self.io_timeout)
+        self.inlets[listener] = inlet
+        while True:
+            events = await self._io(listener.pull_events, inlet, self.io_timeout)
+            if len(events) > 0:
+                # queuing commands blocks while the queue of a classifier is full.
+                await self._io(listener.handle_events, events)
+
+    async def _publish(self, publisher: BfLslDataPublisher) -> None:
+        publisher.open_outlets()
+        next_push = self.loop.time()
+        while True:
+            if not await self._io(publisher.push_available):
+                if publisher.board_state is not None:
+                    # wait until the board is ready again, without holding up the loop.
+                    await self._io(publisher.board_state.wait_ready, self.io_timeout)
+                    next_push = self.loop.time()
+                    continue
+            next_push = max(next_push + publisher.push_interval, self.loop.time())
+            await asyncio.sleep(next_push - self.loop.time())
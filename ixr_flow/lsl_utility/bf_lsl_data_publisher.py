@@ -2,9 +2,16 @@ import logging
 import time
 from threading import Event, Thread
 
+import numpy as np
 from brainflow import (BoardShim, BrainFlowError, BrainFlowExitCodes,
                        BrainFlowPresets)
-from pylsl import StreamInfo, StreamOutlet, cf_double64, local_clock
+from pylsl import StreamInfo, StreamOutlet, cf_double64, cf_float32
+
+from ixr_flow.board import BoardStateBus
+from ixr_flow.recording import SessionRecorder
+
+from .clock_sync import ClockSync
+from .stream_names import namespaced
 
 
 class BfLslDataPublisher(Thread):
@@ -19,46 +26,121 @@ class BfLslDataPublisher(Thread):
     If thread_daemon the parameter is set, the thread is launched in daemon mode,
     the significance of this flag is that a deamon thread does not keep the Python process alive.
 
+    Every push_interval only the samples that arrived since the previous push are taken from the Brainflow ring
+    buffer, so every sample is pushed exactly once. Gaps in the data, i.e. consecutive samples further apart than
+    gap_tolerance sample periods, are counted, see `stats`. Samples that were overwritten in the ring buffer before
+    they could be pushed are counted as well, and reported as a warning.
+
+    Chunks are copied once, from the Brainflow data into a reused buffer of samples by channels in the format of
+    the outlet, which LSL takes without further conversion.
+
     :param board_shim: Brainflow BoardShim to collect data from EEG devices.
     :type board_shim: BoardShim
     :param stay_alive: Life line to indicate that the thread should stay alive.
     :type stay_alive: Event
+    :param push_full_vec: Push all rows of the Brainflow data instead of the data channels only, defaults to False
+    :type push_full_vec: bool, optional
+    :param float32: Push the data as 32 bit floats instead of 64 bit floats, halving the bandwidth.
+                    Note that full vector timestamps lose their precision, use the LSL timestamps instead,
+                    defaults to False
+    :type float32: bool, optional
+    :param push_interval: Time between pushes, in s, defaults to 0.02
+    :type push_interval: float, optional
+    :param chunk_size: Chunk size of the LSL outlets, in samples, 0 uses the chunk size of each push,
+                       defaults to 0
+    :type chunk_size: int, optional
+    :param max_buffered: Maximum time the LSL outlets buffer data for a receiver, in s, defaults to 360
+    :type max_buffered: int, optional
+    :param gap_tolerance: Number of sample periods between consecutive samples above which a gap is counted,
+                          defaults to 5.0
+    :type gap_tolerance: float, optional
+    :param clock_sync: Clock synchronization service to convert Brainflow timestamps to LSL timestamps,
+                       defaults to None (the clock offset is measured once)
+    :type clock_sync: ClockSync | None, optional
+    :param board_state: State of the board connection, when given the publisher blocks while the board is not
+                        ready, instead of checking the board every push interval, defaults to None
+    :type board_state: BoardStateBus | None, optional
+    :param recorder: Records all rows of the pushed data, per data type, defaults to None
+    :type recorder: SessionRecorder | None, optional
+    :param namespace: Name of the board, prefixed to the stream names when running several boards, see
+                      `namespaced`, defaults to '' (single board)
+    :type namespace: str, optional
     :param thread_name: Thread name, defaults to "lsl_data_pusher"
     :type thread_name: str, optional
     :param thread_daemon: Sets thread as daemon, or not, defaults to False
     :type thread_daemon: bool, optional
     """
 
-    def __init__(self, board_shim: BoardShim, stay_alive: Event, push_full_vec: bool = False,
-                 thread_name: str = "lsl_data_pusher", thread_daemon: bool = False) -> None:
+    def __init__(self, board_shim: BoardShim, stay_alive: Event, push_full_vec: bool = False, float32: bool = False,
+                 push_interval: float = 0.02, chunk_size: int = 0, max_buffered: int = 360,
+                 gap_tolerance: float = 5.0, clock_sync: ClockSync | None = None,
+                 board_state: BoardStateBus | None = None, recorder: SessionRecorder | None = None,
+                 namespace: str = '', thread_name: str = "lsl_data_pusher", thread_daemon: bool = False) -> None:
         Thread.__init__(self, name=thread_name, daemon=thread_daemon)
         self.stay_alive = stay_alive
         self.board_shim = board_shim
         self.board_id = board_shim.get_board_id()
         self.push_full_vec = push_full_vec
+        self.channel_format = cf_float32 if float32 else cf_double64
+        self.dtype = np.float32 if float32 else np.float64
+        self.push_interval = push_interval
+        self.chunk_size = chunk_size
+        self.max_buffered = max_buffered
+        self.gap_tolerance = gap_tolerance
         self.data_types = {
             'eeg': BrainFlowPresets.DEFAULT_PRESET,
             'gyro': BrainFlowPresets.AUXILIARY_PRESET,
             'ppg': BrainFlowPresets.ANCILLARY_PRESET,
         }
         self.channels = {k: self.get_channels(v) for k, v in self.data_types.items()}
+        self.rates = {k: board_shim.get_sampling_rate(self.board_id, v) for k, v in self.data_types.items()}
+        self.timestamp_channels = {k: board_shim.get_timestamp_channel(self.board_id, v)
+                                   for k, v in self.data_types.items()}
+        # rows to push per data type, None pushes all rows, as runs of consecutive rows, see `_chunk`.
+        self.channel_runs = {k: None if push_full_vec else self._row_runs(list(v.keys()))
+                             for k, v in self.channels.items()}
+        self.buffers = {k: np.empty((0, board_shim.get_num_rows(self.board_id, v) if push_full_vec
+                                     else len(self.channels[k])), dtype=self.dtype)
+                        for k, v in self.data_types.items()}
         self.outlets = {}
         self.previous_timestamp = {'eeg': 0, 'gyro': 0, 'ppg': 0}
-        self.local2lsl_time_diff = time.time() - local_clock()  # compute time difference with LSL system.
+        self.counts = {k: {'pushed': 0, 'gaps': 0, 'missing': 0, 'overruns': 0, 'lost': 0} for k in self.data_types}
+        # data types with the previous push before the board was not ready, e.g. the session was prepared again.
+        self.resumed = set()
+        self.clock_sync = clock_sync if clock_sync is not None else ClockSync(stay_alive)
+        self.board_state = board_state
+        self.recorder = recorder
+        self.namespace = namespace
 
     def run(self) -> None:
         """Once a thread object is created, its activity must be started by calling the thread’s start() method.
         This invokes the run() method in a separate thread of control.
         """
+        self.open_outlets()
+        next_push = time.monotonic()
+        while self.stay_alive.is_set():
+            if not self.push_available():
+                if self.board_state is not None:
+                    # block until the board is ready again, checking stay_alive every second.
+                    self.board_state.wait_ready(timeout=1.0)
+                    next_push = time.monotonic()
+                    continue
+            next_push = max(next_push + self.push_interval, time.monotonic())
+            time.sleep(max(0.0, next_push - time.monotonic()))
+
+        self.shutdown()
+
+    def open_outlets(self) -> None:
+        """Creates the LSL outlets of all data types."""
         for data_type, preset in self.data_types.items():
-            rate = self.board_shim.get_sampling_rate(self.board_id, preset)
-            name = f'ixr-flow-{data_type}-data'
-            channel_count = self.board_shim.get_board_descr(self.board_id, preset)['num_rows'] \
-                if self.push_full_vec else len(self.channels[data_type])
+            rate = self.rates[data_type]
+            name = namespaced(f'ixr-flow-{data_type}-data', self.namespace)
+            channel_count = self.buffers[data_type].shape[1]
 
             logging.info(f"Starting '{name}' LSL Data Publisher stream.")
             info_data = StreamInfo(name=name, type=data_type, channel_count=channel_count, nominal_srate=rate,
-                                   channel_format=cf_double64, source_id='ixr-flow-lsl-data-publisher')
+                                   channel_format=self.channel_format,
+                                   source_id=namespaced('ixr-flow-lsl-data-publisher', self.namespace))
             stream_channels = info_data.desc().append_child("channels")
             for _, label in self.channels[data_type].items():
                 ch = stream_channels.append_child("channel")
@@ -66,43 +148,187 @@ class BfLslDataPublisher(Thread):
                 if data_type == 'eeg':
                     ch.append_child_value("unit", 'microvolts')
                 ch.append_child_value("type", data_type)
-            self.outlets[data_type] = StreamOutlet(info_data)
+            self.outlets[data_type] = StreamOutlet(info_data, self.chunk_size, self.max_buffered)
             logging.info(f"'{self.outlets[data_type].get_info().name()}' LSL Data Publisher stream started.")
+            if self.recorder is not None:
+                num_rows = self.board_shim.get_num_rows(self.board_id, preset)
+                labels = [self.channels[data_type].get(row, 'timestamp' if row == self.timestamp_channels[data_type]
+                                                       else f'row_{row}') for row in range(num_rows)]
+                description = dict(self.board_shim.get_board_descr(self.board_id, preset), board_id=int(self.board_id))
+                self.recorder.add_stream(data_type, num_rows, rate, data_type, labels, description)
 
-        while self.stay_alive.is_set():
-            if not self.board_shim.is_prepared():
-                # if no connection is established, try again later.
-                continue
-
-            for data_type, preset in self.data_types.items():
-                timestamp_column = self.board_shim.get_timestamp_channel(self.board_id, preset=preset)
-
-                try:
-                    data = self.board_shim.get_current_board_data(1024, preset)
-                except BrainFlowError as e:
-                    # Right after board preparation the Brainflow connection might be a bit unstable.
-                    # In that case Brainflow throws an INVALID_ARGUMENTS_ERROR exception.
-                    # If that case, try again later, but re-raise other exceptions.
-                    if e.exit_code == BrainFlowExitCodes.INVALID_ARGUMENTS_ERROR:
-                        continue
-                    else:
-                        raise e
-
-                # slice rows with timestamps bigger then previous_timestamp
-                data = data[:, data[timestamp_column] > self.previous_timestamp[data_type]]
-
-                # only update timestamp and push if there is something left to push.
-                if data.shape[1] > 0:
-                    self.previous_timestamp[data_type] = data[timestamp_column, -1]
-                    if not self.push_full_vec:
-                        data = data[list(self.channels[data_type].keys()), :]
-                    self.outlets[data_type].push_chunk(data.T.tolist(),
-                                                       self.previous_timestamp[data_type] - self.local2lsl_time_diff)
-            time.sleep(1)
+    def push_available(self) -> bool:
+        """Pushes the samples of all data types that arrived since the previous push.
+
+        :return: Returns False if the board is not ready, and nothing was pushed.
+        :rtype: bool
+        """
+        if (self.board_state is not None and not self.board_state.is_ready()) or not self.board_shim.is_prepared():
+            # if no connection is established, try again later.
+            self.resumed.update(self.data_types)
+            return False
+        for data_type, preset in self.data_types.items():
+            self._push(data_type, preset)
+        return True
+
+    def shutdown(self) -> None:
+        """Logs the statistics of the pushed data, see `stats`."""
+        logging.info(f"LSL Data Publisher statistics: {self.stats()}")
+
+    def _push(self, data_type: str, preset: BrainFlowPresets) -> None:
+        """Pushes the samples of a preset that arrived since the previous push.
+
+        :param data_type: Data type, one of 'eeg', 'gyro' and 'ppg'.
+        :type data_type: str
+        :param preset: Brainflow preset of the data type.
+        :type preset: BrainFlowPresets
+        """
+        timestamp_column = self.timestamp_channels[data_type]
+        previous_timestamp = self.previous_timestamp[data_type]
+        try:
+            data = self._new_samples(data_type, preset)
+        except BrainFlowError as e:
+            # Right after board preparation the Brainflow connection might be a bit unstable.
+            # In that case Brainflow throws an INVALID_ARGUMENTS_ERROR exception.
+            # If that case, try again later, but re-raise other exceptions.
+            if e.exit_code == BrainFlowExitCodes.INVALID_ARGUMENTS_ERROR:
+                return
+            else:
+                raise e
+
+        # the gap to the previous push is only counted if the data reaches back to it, otherwise it is an overrun,
+        # unless the board was not ready meanwhile, samples of a previous session are gone with that session.
+        covered = data.shape[1] > 0 and (data[timestamp_column, 0] <= previous_timestamp or data_type in self.resumed)
+
+        # slice rows with timestamps bigger then previous_timestamp, timestamps are ascending so this is a view.
+        data = data[:, np.searchsorted(data[timestamp_column], previous_timestamp, side='right'):]
+
+        # only update timestamp and push if there is something left to push.
+        if data.shape[1] > 0:
+            self._count_gaps(data_type, previous_timestamp if covered else 0, data[timestamp_column])
+            self.resumed.discard(data_type)
+            self.previous_timestamp[data_type] = data[timestamp_column, -1]
+            self.counts[data_type]['pushed'] += data.shape[1]
+            if self.recorder is not None:
+                self.recorder.record(data_type, data.T, data[timestamp_column])
+            self.outlets[data_type].push_chunk(
+                self._chunk(data_type, data), self.clock_sync.local_to_lsl(self.previous_timestamp[data_type]))
+
+    def _chunk(self, data_type: str, data: np.ndarray) -> np.ndarray:
+        """Copies the rows to push from Brainflow data into the buffer of the data type, grown when needed,
+        as samples by channels in the format of the outlet.
+
+        :param data_type: Data type, one of 'eeg', 'gyro' and 'ppg'.
+        :type data_type: str
+        :param data: Brainflow data, with samples in columns.
+        :type data: np.ndarray
+        :return: Returns a C-contiguous view on the buffer, valid until the next chunk of the data type.
+        :rtype: np.ndarray
+        """
+        num_samples = data.shape[1]
+        buffer = self.buffers[data_type]
+        if len(buffer) < num_samples:
+            # zeroed, when casting numpy may read the buffer before writing it, garbage can hold signaling NaNs.
+            buffer = np.zeros((max(num_samples, 2 * len(buffer)), buffer.shape[1]), dtype=self.dtype)
+            self.buffers[data_type] = buffer
+        chunk = buffer[:num_samples]
+        if self.channel_runs[data_type] is None:
+            np.copyto(chunk, data.T, casting='same_kind')
+        else:
+            # runs of rows are copied as slices, gathering the rows with np.take would copy views on the board
+            # data, e.g. read-only views on the shared board buffer, into a temporary array first.
+            for column, rows in self.channel_runs[data_type]:
+                np.copyto(chunk[:, column:column + rows.stop - rows.start], data[rows].T, casting='same_kind')
+        return chunk
+
+    @staticmethod
+    def _row_runs(rows: list[int]) -> list[tuple[int, slice]]:
+        """Splits rows into runs of consecutive rows.
+
+        :param rows: Rows, in the order of the columns of the chunk.
+        :type rows: list[int]
+        :return: Returns the first column and the rows of each run.
+        :rtype: list[tuple[int, slice]]
+        """
+        runs = []
+        for column, row in enumerate(rows):
+            if len(runs) > 0 and runs[-1][1].stop == row:
+                runs[-1] = (runs[-1][0], slice(runs[-1][1].start, row + 1))
+            else:
+                runs.append((column, slice(row, row + 1)))
+        return runs
+
+    def _new_samples(self, data_type: str, preset: BrainFlowPresets) -> np.ndarray:
+        """Returns the latest samples of a preset, covering at least all samples since the previous push if they
+        are still in the ring buffer. The number of samples taken is estimated from the timestamp of the latest
+        sample, which also holds for boards running ahead of the wall clock, see `SimulatedBoard`, and only if
+        that falls short all samples in the ring buffer are taken.
+
+        :param data_type: Data type, one of 'eeg', 'gyro' and 'ppg'.
+        :type data_type: str
+        :param preset: Brainflow preset of the data type.
+        :type preset: BrainFlowPresets
+        :return: Returns the samples as Brainflow data, with samples in columns.
+        :rtype: np.ndarray
+        """
+        timestamp_column = self.timestamp_channels[data_type]
+        previous_timestamp = self.previous_timestamp[data_type]
+        available = self.board_shim.get_board_data_count(preset)
+        if previous_timestamp == 0:
+            # nothing pushed yet, start with the most recent samples only.
+            return self.board_shim.get_current_board_data(min(available, 1024), preset)
+
+        # estimate the number of new samples from the latest sample, with a margin for jitter.
+        latest = self.board_shim.get_current_board_data(1, preset)
+        if latest.shape[1] == 0:
+            return latest
+        expected = max(0, int((latest[timestamp_column, -1] - previous_timestamp) * self.rates[data_type] * 1.5))
+        expected += 32
+        data = self.board_shim.get_current_board_data(min(available, expected), preset)
+        if data.shape[1] > 0 and data[timestamp_column, 0] > previous_timestamp and expected < available:
+            data = self.board_shim.get_current_board_data(available, preset)
+        if data.shape[1] > 0 and data[timestamp_column, 0] > previous_timestamp and available > 0 \
+                and data.shape[1] == available and data_type not in self.resumed:
+            # the ring buffer does not reach back to the previous push anymore.
+            lost = max(0, round((data[timestamp_column, 0] - previous_timestamp) * self.rates[data_type]) - 1)
+            self.counts[data_type]['overruns'] += 1
+            self.counts[data_type]['lost'] += lost
+            logging.warning(f"Brainflow ring buffer overrun, about {lost} {data_type} samples were not pushed.")
+        return data
+
+    def _count_gaps(self, data_type: str, previous_timestamp: float, timestamps: np.ndarray) -> None:
+        """Counts the gaps between consecutive samples, including the gap to the previously pushed sample.
+
+        :param data_type: Data type, one of 'eeg', 'gyro' and 'ppg'.
+        :type data_type: str
+        :param previous_timestamp: Timestamp of the previously pushed sample, 0 if none.
+        :type previous_timestamp: float
+        :param timestamps: Timestamps of the samples to push.
+        :type timestamps: np.ndarray
+        """
+        if previous_timestamp > 0:
+            timestamps = np.concatenate(([previous_timestamp], timestamps))
+        periods = np.diff(timestamps) * self.rates[data_type]
+        gaps = periods[periods > self.gap_tolerance]
+        if len(gaps) > 0:
+            missing = int(np.sum(np.round(gaps) - 1))
+            self.counts[data_type]['gaps'] += len(gaps)
+            self.counts[data_type]['missing'] += missing
+            logging.debug(f"{len(gaps)} gap(s) in {data_type} data, about {missing} samples missing.")
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Returns per data type the number of pushed samples, the number of gaps in the data and the estimated
+        number of samples missing in those gaps, and the number of ring buffer overruns and the estimated number of
+        samples lost by them.
+
+        :return: Returns the statistics by data type.
+        :rtype: dict[str, dict[str, int]]
+        """
+        return {data_type: dict(counts) for data_type, counts in self.counts.items()}
 
     def get_channels(self, preset: BrainFlowPresets) -> dict[int, str]:
         channels = {}
-        description = BoardShim.get_board_descr(self.board_id, preset)
+        description = self.board_shim.get_board_descr(self.board_id, preset)
         if preset == BrainFlowPresets.DEFAULT_PRESET:
             channels.update(dict(zip(description['eeg_channels'], description['eeg_names'].split(","))))
         elif preset == BrainFlowPresets.AUXILIARY_PRESET:
@@ -0,0 +1,166 @@
+import logging
+import statistics
+import time
+from collections import deque
+from threading import Event, Lock, Thread
+
+import numpy as np
+from pylsl import StreamInlet, local_clock
+from pylsl.util import LostError
+from pylsl.util import TimeoutError as LslTimeoutError
+
+
+class ClockSync(Thread):
+    """Shared clock synchronization service that maps between the LSL clock (`pylsl.local_clock`) and the wall
+    clock (`time.time`) used by Brainflow timestamps, executed in it's own thread of control.
+
+    Every interval the offset between both clocks is measured, the offset at a given LSL time is then estimated
+    by a least squares fit of offset and drift over the most recent measurements, so the estimate follows a slowly
+    drifting offset during long sessions and single measurements disturbed by scheduling are smoothed out.
+
+    Timestamps of remote LSL sources, e.g. marker streams of other machines, are first mapped to the local LSL clock
+    using the LSL time correction of their inlet, see `register_inlet`. Time corrections are refreshed every interval
+    as well, the median of the most recent time corrections is used.
+
+    Without being started, the estimate is based on the measurement taken on object instantiation.
+
+    :param stay_alive: Life line to indicate that the thread should stay alive.
+    :type stay_alive: Event
+    :param interval: Time between measurements, in s, defaults to 1.0
+    :type interval: float, optional
+    :param window: Number of most recent measurements to fit the offset and drift on, defaults to 300
+    :type window: int, optional
+    :param thread_name: Thread name, defaults to "clock_sync"
+    :type thread_name: str, optional
+    :param thread_daemon: Sets thread as daemon, or not, defaults to False
+    :type thread_daemon: bool, optional
+    """
+
+    def __init__(self, stay_alive: Event, interval: float = 1.0, window: int = 300,
+                 thread_name: str = "clock_sync", thread_daemon: bool = False) -> None:
+        Thread.__init__(self, name=thread_name, daemon=thread_daemon)
+        self.stay_alive = stay_alive
+        self.interval = interval
+        self.lock = Lock()
+        self.measurements = deque(maxlen=window)
+        self.time_corrections = {}
+        self.reference_time = local_clock()
+        self.offset = 0.0  # wall clock minus LSL clock at reference_time, in s.
+        self.drift = 0.0  # change of the offset per second LSL time.
+        self.update()
+
+    def run(self) -> None:
+        """Once a thread object is created, its activity must be started by calling the thread’s start() method.
+        This invokes the run() method in a separate thread of control.
+        """
+        while self.stay_alive.is_set():
+            time.sleep(self.interval)
+            self.update()
+            for inlet in list(self.time_corrections):
+                self._update_time_correction(inlet)
+        logging.info(f"Clock offset {self.offset * 1000:.3f} ms, drift {self.drift * 1e6:.3f} us/s.")
+
+    def measure(self, num_tries: int = 5) -> tuple[float, float]:
+        """Measures the offset between the wall clock and the LSL clock. The wall clock is read in between two
+        readings of the LSL clock, the reading with the smallest gap between both LSL readings is used.
+
+        :param num_tries: Number of readings, defaults to 5
+        :type num_tries: int, optional
+        :return: Returns the LSL time and the offset at that time, in s.
+        :rtype: tuple[float, float]
+        """
+        readings = []
+        for _ in range(num_tries):
+            before = local_clock()
+            wall = time.time()
+            after = local_clock()
+            readings.append((after - before, (before + after) / 2, wall))
+        _, lsl_time, wall = min(readings)
+        return lsl_time, wall - lsl_time
+
+    def update(self) -> None:
+        """Takes a new measurement and fits the offset and drift again."""
+        lsl_time, offset = self.measure()
+        with self.lock:
+            self.measurements.append((lsl_time, offset))
+            times, offsets = np.array(self.measurements).T
+            if len(times) > 2 and times[-1] - times[0] > 0:
+                self.drift, self.offset = np.polyfit(times - lsl_time, offsets, 1)
+            else:
+                self.drift, self.offset = 0.0, float(np.mean(offsets))
+            self.reference_time = lsl_time
+
+    def lsl_to_local(self, lsl_timestamp: float) -> float:
+        """Converts a timestamp of the local LSL clock to the wall clock.
+
+        :param lsl_timestamp: LSL timestamp, in s.
+        :type lsl_timestamp: float
+        :return: Returns the wall clock timestamp, in s.
+        :rtype: float
+        """
+        with self.lock:
+            return lsl_timestamp + self.offset + self.drift * (lsl_timestamp - self.reference_time)
+
+    def local_to_lsl(self, local_timestamp: float) -> float:
+        """Converts a wall clock timestamp, e.g. of Brainflow, to the local LSL clock.
+
+        :param local_timestamp: Wall clock timestamp, in s.
+        :type local_timestamp: float
+        :return: Returns the LSL timestamp, in s.
+        :rtype: float
+        """
+        with self.lock:
+            # Solve local = lsl + offset + drift * (lsl - reference) for lsl.
+            return (local_timestamp - self.offset + self.drift * self.reference_time) / (1 + self.drift)
+
+    def register_inlet(self, inlet: StreamInlet, timeout: float = 2.0) -> None:
+        """Registers the inlet of a (possibly remote) LSL source, so its timestamps can be converted with
+        `remote_to_local`. Blocks until a first time correction has been received, or timeout has passed.
+
+        :param inlet: Inlet of the source.
+        :type inlet: StreamInlet
+        :param timeout: Maximum time to wait for the first time correction, in s, defaults to 2.0
+        :type timeout: float, optional
+        """
+        with self.lock:
+            self.time_corrections.setdefault(inlet, deque(maxlen=10))
+        self._update_time_correction(inlet, timeout)
+
+    def unregister_inlet(self, inlet: StreamInlet) -> None:
+        with self.lock:
+            self.time_corrections.pop(inlet, None)
+
+    def _update_time_correction(self, inlet: StreamInlet, timeout: float = 0.5) -> None:
+        try:
+            correction = inlet.time_correction(timeout=timeout)
+        except (LostError, LslTimeoutError) as e:
+            logging.debug(f"No time correction received: {e}")
+            return
+        with self.lock:
+            if inlet in self.time_corrections:
+                self.time_corrections[inlet].append(correction)
+
+    def time_correction(self, inlet: StreamInlet) -> float:
+        """Returns the median of the most recent time corrections of a registered inlet,
+        0.0 if none have been received.
+
+        :param inlet: Registered inlet.
+        :type inlet: StreamInlet
+        :return: Returns the time correction, in s, to add to the timestamps of the inlet.
+        :rtype: float
+        """
+        with self.lock:
+            corrections = self.time_corrections.get(inlet)
+            return statistics.median(corrections) if corrections else 0.0
+
+    def remote_to_local(self, inlet: StreamInlet, timestamp: float) -> float:
+        """Converts a timestamp received by a registered inlet to the wall clock.
+
+        :param inlet: Registered inlet the timestamp was received by.
+        :type inlet: StreamInlet
+        :param timestamp: Timestamp of the remote source, in s.
+        :type timestamp: float
+        :return: Returns the wall clock timestamp, in s.
+        :rtype: float
+        """
+        return self.lsl_to_local(timestamp + self.time_correction(inlet))
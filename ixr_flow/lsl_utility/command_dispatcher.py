@@ -0,0 +1,114 @@
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition
+
+
+class CommandDispatcher:
+    """Executes commands in a fixed size pool of worker threads, with an ordered queue per key (e.g. classifier name).
+    Commands with the same key are executed one at a time, in the order they were submitted,
+    commands with different keys are executed in parallel.
+
+    Queues are bounded: submitting to a full queue blocks until there is room again, or a timeout has passed,
+    so a burst of commands for one key can not grow its queue unbounded.
+    Per key the current and maximum queue depth, and the time commands waited in the queue are tracked, see `stats`.
+
+    :param max_workers: Number of worker threads, defaults to 4
+    :type max_workers: int, optional
+    :param max_queue_depth: Maximum number of queued commands per key, defaults to 16
+    :type max_queue_depth: int, optional
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue_depth: int = 16) -> None:
+        self.max_queue_depth = max_queue_depth
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lsl_event_worker')
+        self.condition = Condition()
+        self.queues = {}
+        self.running = set()  # keys of which a command is being executed.
+        self.key_stats = {}
+
+    def submit(self, key: str, fn: callable, *args, timeout: float | None = None) -> bool:
+        """Queues fn(*args) to be executed after all commands queued before with the same key.
+        Blocks while the queue of the key is full.
+
+        :param key: Key of the queue, e.g. classifier name.
+        :type key: str
+        :param fn: Function to execute, exceptions are logged.
+        :type fn: callable
+        :param timeout: Maximum time to wait for room in a full queue, in s, defaults to None (no limit)
+        :type timeout: float | None, optional
+        :return: Returns True if the command was queued, False if the queue stayed full until the timeout.
+        :rtype: bool
+        """
+        with self.condition:
+            stats = self.key_stats.setdefault(key, {'depth': 0, 'max_depth': 0, 'started': 0, 'executed': 0,
+                                                    'rejected': 0, 'wait_time': 0.0, 'max_wait_time': 0.0})
+            queue = self.queues.setdefault(key, deque())
+            if not self.condition.wait_for(lambda: len(queue) < self.max_queue_depth, timeout):
+                stats['rejected'] += 1
+                return False
+            queue.append((fn, args, time.perf_counter()))
+            stats['depth'] = len(queue)
+            stats['max_depth'] = max(stats['max_depth'], len(queue))
+            if key not in self.running:
+                self.running.add(key)
+                self.executor.submit(self._execute_next, key)
+            return True
+
+    def _execute_next(self, key: str) -> None:
+        """Executes the next command of a key, then hands the key back to the pool if more commands are queued,
+        so keys with many commands do not keep a worker to themselves."""
+        with self.condition:
+            fn, args, queued_at = self.queues[key].popleft()
+            stats = self.key_stats[key]
+            wait_time = time.perf_counter() - queued_at
+            stats['depth'] = len(self.queues[key])
+            stats['started'] += 1
+            stats['wait_time'] += wait_time
+            stats['max_wait_time'] = max(stats['max_wait_time'], wait_time)
+            self.condition.notify_all()
+
+        try:
+            fn(*args)
+        except Exception:
+            logging.exception(f"Unexpected exception while executing a command of '{key}'.")
+
+        with self.condition:
+            stats['executed'] += 1
+            if len(self.queues[key]) > 0:
+                self.executor.submit(self._execute_next, key)
+            else:
+                self.running.discard(key)
+                self.condition.notify_all()
+
+    def stats(self, prefix: str = '') -> dict[str, dict]:
+        """Returns per key the current and maximum queue depth, the number of executed and rejected commands,
+        and the mean and maximum time commands waited in the queue, in s.
+
+        :param prefix: Only returns the keys starting with prefix, without the prefix, e.g. the keys of one of
+                       several event listeners sharing the dispatcher, defaults to '' (all keys)
+        :type prefix: str, optional
+        :return: Returns the statistics by key.
+        :rtype: dict[str, dict]
+        """
+        with self.condition:
+            return {key[len(prefix):]: {'depth': stats['depth'], 'max_depth': stats['max_depth'],
+                                        'executed': stats['executed'], 'rejected': stats['rejected'],
+                                        'mean_wait_time': stats['wait_time'] / max(stats['started'], 1),
+                                        'max_wait_time': stats['max_wait_time']}
+                    for key, stats in self.key_stats.items() if key.startswith(prefix)}
+
+    def wait_idle(self, prefix: str = '') -> None:
+        """Waits until all queued commands of the keys starting with prefix have been executed.
+
+        :param prefix: Prefix of the keys to wait for, defaults to '' (all keys)
+        :type prefix: str, optional
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: not any(key.startswith(prefix) for key in self.running))
+
+    def shutdown(self) -> None:
+        """Waits until all queued commands have been executed, then stops the worker threads."""
+        self.wait_idle()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,241 @@
+import json
+from dataclasses import dataclass, fields
+
+
+class DecodeError(Exception):
+    pass
+
+
+@dataclass
+class Command:
+    """Base class of the commands sent over LSL, see `./doc/lsl.md`.
+    Every command type has a task name, and fields that are parsed from a message once, before the command
+    is executed. The name identifies the classifier the command is meant for, it is empty for global commands.
+    """
+    name: str = ''
+
+    task = ''
+    # converters of the fields after the name, in order, for the `;`-separated format.
+    converters = ()
+    required = ()
+
+    @classmethod
+    def from_fields(cls, name: str, values: list[str]) -> 'Command':
+        """Creates a command from the `;`-separated fields following the task and name.
+        Missing trailing fields, and empty fields, keep their default values.
+
+        :raises DecodeError: "Missing fields" or "Invalid fields", when fields can not be converted.
+        """
+        kwargs = {}
+        for field, converter, value in zip(fields(cls)[1:], cls.converters, values):
+            if value != '':
+                try:
+                    kwargs[field.name] = converter(value)
+                except ValueError as e:
+                    raise DecodeError(f"Invalid field {field.name} of {cls.task}: {e}")
+        missing = [field_name for field_name in cls.required if field_name not in kwargs]
+        if len(missing) > 0:
+            raise DecodeError(f"Missing fields of {cls.task}: {', '.join(missing)}")
+        return cls(name, **kwargs)
+
+    @classmethod
+    def from_json(cls, values: dict) -> 'Command':
+        """Creates a command from a JSON object holding the fields by name.
+        Values are converted as the fields of the `;`-separated format, see `_json_value`, null values keep
+        their default values.
+
+        :raises DecodeError: "Missing fields", "Unknown fields" or "Invalid fields", when values can not be converted.
+        """
+        converters = dict(zip([field.name for field in fields(cls)], (str,) + cls.converters))
+        unknown = [key for key in values if key not in converters]
+        if len(unknown) > 0:
+            raise DecodeError(f"Unknown fields of {cls.task}: {', '.join(unknown)}")
+        kwargs = {}
+        for key, value in values.items():
+            if value is not None:
+                try:
+                    kwargs[key] = _json_value(converters[key], value)
+                except ValueError as e:
+                    raise DecodeError(f"Invalid field {key} of {cls.task}: {e}")
+        missing = [field_name for field_name in cls.required if field_name not in kwargs]
+        if len(missing) > 0:
+            raise DecodeError(f"Missing fields of {cls.task}: {', '.join(missing)}")
+        return cls(**kwargs)
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(',')]
+
+
+def _float_list(value: str) -> list[float]:
+    return [float(item) for item in value.split(',')]
+
+
+def _flag(value: str) -> bool:
+    return bool(int(value))
+
+
+def _json_number(number_type: type, value: any) -> int | float:
+    if isinstance(value, bool) or not isinstance(value, int if number_type is int else (int, float)):
+        raise ValueError(f"expected {number_type.__name__}, got {value!r}")
+    return number_type(value)
+
+
+def _json_value(converter: callable, value: any) -> any:
+    """Converts a JSON value with the converter of its field: strings as in the `;`-separated format,
+    numbers, lists of numbers and booleans only if they match the type of the field.
+
+    :raises ValueError: If the value does not match the type of the field.
+    """
+    if isinstance(value, str):
+        return converter(value)
+    if converter is str:
+        raise ValueError(f"expected str, got {value!r}")
+    if converter in (_int_list, _float_list):
+        if not isinstance(value, list):
+            raise ValueError(f"expected a list, got {value!r}")
+        return [_json_number(int if converter is _int_list else float, item) for item in value]
+    if converter is _flag:
+        return value if isinstance(value, bool) else bool(_json_number(int, value))
+    return _json_number(converter, value)
+
+
+@dataclass
+class CreateCommand(Command):
+    model_type: str = None
+    time_range: list[int] = None
+    filter_freq_cutoff: list[float] = None
+    method: str = None
+    task = 'create'
+    converters = (str, _int_list, _float_list, str)
+    required = ('model_type', 'time_range', 'filter_freq_cutoff', 'method')
+
+
+@dataclass
+class LoadCommand(Command):
+    path: str = None
+    task = 'load'
+    converters = (str,)
+    required = ('path',)
+
+
+@dataclass
+class SaveCommand(Command):
+    path: str = None
+    task = 'save'
+    converters = (str,)
+    required = ('path',)
+
+
+@dataclass
+class CollectCommand(Command):
+    label: int = None
+    task = 'collect'
+    converters = (int,)
+    required = ('label',)
+
+
+@dataclass
+class RefeaturizeCommand(Command):
+    time_range: list[int] | None = None
+    filter_freq_cutoff: list[float] | None = None
+    method: str | None = None
+    task = 'refeaturize'
+    converters = (_int_list, _float_list, str)
+
+
+@dataclass
+class TrainCommand(Command):
+    task = 'train'
+
+
+@dataclass
+class PredictCommand(Command):
+    task = 'predict'
+
+
+@dataclass
+class PredictAllCommand(Command):
+    task = 'predict-all'
+
+
+@dataclass
+class AutoUpdateCommand(Command):
+    enabled: bool = True
+    task = 'auto-update'
+    converters = (_flag,)
+
+
+@dataclass
+class StreamCommand(Command):
+    rate: float = None
+    task = 'stream'
+    converters = (float,)
+    required = ('rate',)
+
+
+@dataclass
+class StatusCommand(Command):
+    task = 'status'
+
+
+COMMANDS = {command.task: command for command in [
+    CreateCommand, LoadCommand, SaveCommand, CollectCommand, RefeaturizeCommand, TrainCommand, PredictCommand,
+    PredictAllCommand, AutoUpdateCommand, StreamCommand, StatusCommand]}
+
+
+def parse_command(message: str) -> Command:
+    """Parses a single command in the `;`-separated format: `<task>;<name>;<field>;<field>...`.
+
+    :param message: Command encoded as str.
+    :type message: str
+    :raises DecodeError: "Got empty command"
+    :raises DecodeError: "Unrecognized task"
+    :return: Returns the typed command.
+    :rtype: Command
+    """
+    if message == '':
+        raise DecodeError("Got empty command when decoding.")
+    task, _, rest = message.partition(';')
+    if task not in COMMANDS:
+        raise DecodeError(f"Unrecognized task when decoding: {task}")
+    name, *values = rest.split(';') if rest != '' else ['']
+    return COMMANDS[task].from_fields(name, values)
+
+
+def parse_json_command(values: dict) -> Command:
+    """Parses a single command encoded as JSON object: `{"task": <task>, "name": <name>, <field>: <value>, ...}`.
+
+    :param values: Command decoded from JSON.
+    :type values: dict
+    :raises DecodeError: "Unrecognized task"
+    :return: Returns the typed command.
+    :rtype: Command
+    """
+    if not isinstance(values, dict) or not isinstance(values.get('task'), str) or values['task'] not in COMMANDS:
+        raise DecodeError(f"Unrecognized task when decoding: {values}")
+    values = dict(values)
+    return COMMANDS[values.pop('task')].from_json(values)
+
+
+def parse_message(message: str) -> list[Command]:
+    """Parses an LSL event message into commands, see `./doc/lsl.md`.
+    A message holds a single command (version 1), or several commands (version 2), either separated by new lines,
+    or encoded as a JSON object or array of objects.
+
+    :param message: LSL event encoded as str.
+    :type message: str
+    :raises DecodeError: If any of the commands can not be parsed, none are returned.
+    :return: Returns the typed commands, in order.
+    :rtype: list[Command]
+    """
+    message = message.strip()
+    if message == '':
+        raise DecodeError("Got empty event message when decoding.")
+    if message[0] in '[{':
+        try:
+            values = json.loads(message)
+        except json.JSONDecodeError as e:
+            raise DecodeError(f"Invalid JSON message: {e}")
+        return [parse_json_command(command) for command in (values if isinstance(values, list) else [values])]
+    return [parse_command(line.strip()) for line in message.splitlines() if line.strip() != '']
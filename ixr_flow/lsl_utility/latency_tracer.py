@@ -0,0 +1,99 @@
+import json
+import logging
+import time
+from collections import deque
+from threading import Lock
+
+import numpy as np
+from pylsl import StreamInfo, StreamOutlet
+
+from ixr_flow.classifiers import STAGES, EventTrace
+
+from .stream_names import namespaced
+
+
+class LatencyTracer:
+    """Collects the traces of handled events, see `EventTrace`, and keeps the durations of the most recent events
+    per classifier, task and stage, to compute rolling latency percentiles from.
+
+    The percentiles are published as JSON on the LSL stream `ixr-flow-latency`, at most once per publish_interval,
+    in the format returned by `summary`, and can be dumped to a file at shutdown, see `dump`.
+
+    :param window: Number of most recent events to compute percentiles over, defaults to 1000
+    :type window: int, optional
+    :param publish_interval: Minimum time between publishing percentiles, in s, defaults to 1.0
+    :type publish_interval: float, optional
+    :param namespace: Name of the board, prefixed to the stream name when running several boards, see `namespaced`,
+                      defaults to '' (single board)
+    :type namespace: str, optional
+    """
+
+    percentiles = (50, 95, 99)
+
+    def __init__(self, window: int = 1000, publish_interval: float = 1.0, namespace: str = '') -> None:
+        self.window = window
+        self.publish_interval = publish_interval
+        self.lock = Lock()
+        self.durations = {}
+        self.last_published = 0.0
+        name = namespaced('ixr-flow-latency', namespace)
+        logging.info(f"Starting '{name}' LSL latency stream.")
+        self.outlet = StreamOutlet(StreamInfo(name=name, type='Markers', channel_count=1, nominal_srate=0,
+                                              channel_format='string', source_id=name))
+        logging.info(f"'{self.outlet.get_info().name()}' LSL latency stream started.")
+
+    def finish(self, trace: EventTrace) -> None:
+        """Adds the durations of a completely handled event, and publishes the percentiles if due.
+
+        :param trace: Trace of the handled event.
+        :type trace: EventTrace
+        """
+        with self.lock:
+            stages = self.durations.setdefault(trace.name, {}).setdefault(trace.task, {})
+            for stage, duration in trace.durations().items():
+                stages.setdefault(stage, deque(maxlen=self.window)).append(duration)
+            now = time.monotonic()
+            if now - self.last_published < self.publish_interval:
+                return
+            self.last_published = now
+        self.outlet.push_sample([json.dumps(self.summary())])
+
+    def summary(self) -> dict[str, dict]:
+        """Returns per classifier name, task and stage, the number of events and the p50, p95 and p99 durations
+        over the most recent events, in ms. Stages are ordered as handled, followed by the total duration.
+
+        :return: Returns the percentiles by classifier name, task and stage.
+        :rtype: dict[str, dict]
+        """
+        with self.lock:
+            snapshot = {name: {task: {stage: np.array(durations) for stage, durations in stages.items()}
+                               for task, stages in tasks.items()} for name, tasks in self.durations.items()}
+        order = {stage: index for index, stage in enumerate(STAGES + ('total',))}
+        summary = {}
+        for name, tasks in snapshot.items():
+            for task, stages in tasks.items():
+                summary.setdefault(name, {})[task] = {
+                    stage: self._percentiles(durations)
+                    for stage, durations in sorted(stages.items(), key=lambda item: order[item[0]])}
+        return summary
+
+    def _percentiles(self, durations: np.ndarray) -> dict[str, float]:
+        values = np.percentile(durations, self.percentiles)
+        return {'count': len(durations), **{f'p{percentile}': float(value)
+                                            for percentile, value in zip(self.percentiles, values)}}
+
+    def dump(self, path: str | None = None) -> None:
+        """Logs the percentiles, and writes them to a JSON file if path is given.
+
+        :param path: File to write the percentiles to, defaults to None
+        :type path: str | None, optional
+        """
+        summary = self.summary()
+        for name, tasks in summary.items():
+            for task, stages in tasks.items():
+                logging.info(f"Latency of {task} {name}: " + ", ".join(
+                    f"{stage} {values['p50']:.1f}/{values['p95']:.1f}/{values['p99']:.1f} ms"
+                    for stage, values in stages.items()) + " (p50/p95/p99)")
+        if path is not None:
+            with open(path, 'w') as file:
+                json.dump(summary, file, indent=4)
@@ -1,22 +1,41 @@
+import json
 import logging
+import math
 import time
-from asyncio import Event
-from threading import Thread
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+import numpy as np
 
 from brainflow import BoardShim
-from pylsl import (StreamInfo, StreamInlet, StreamOutlet, local_clock,
-                   resolve_byprop)
-from ixr_flow.classifiers import Classifier, ClfError
+from pylsl import StreamInfo, StreamInlet, StreamOutlet, resolve_byprop
 
+from ixr_flow.board import BoardStateBus, DataReadyNotifier, HealthMonitor
+from ixr_flow.classifiers import Classifier, ClfError, EpochCache, EventTrace, predict_all
+from ixr_flow.recording import SessionRecorder
 
-class DecodeError(Exception):
-    pass
+from .clock_sync import ClockSync
+from .command_dispatcher import CommandDispatcher
+from .commands import (AutoUpdateCommand, CollectCommand, Command, CreateCommand, DecodeError, LoadCommand,
+                       PredictAllCommand, PredictCommand, RefeaturizeCommand, SaveCommand, StatusCommand,
+                       StreamCommand, TrainCommand, parse_message)
+from .latency_tracer import LatencyTracer
+from .lsl_prediction_streamer import LslPredictionStreamer
+from .stream_names import namespaced
 
 
 class LslEventListener(Thread):
-    """Class that listens to incoming LSL events. Per incoming LSL event it starts
-    a child worker (thread) that will decode the message and depending on the content
+    """Class that listens to incoming LSL events. Incoming LSL events are read in chunks and parsed into commands,
+    see `parse_message`, which are handled by a fixed size pool of worker threads that depending on the command
     will create a classifier instance, collect data, train and/or predict the models.
+    Events for the same classifier are handled one at a time in the order they arrived, events for different
+    classifiers in parallel, see `CommandDispatcher`. The `status` event pushes the queue statistics, and the health
+    of the board connection if given.
+    The latency of every stage of handling an event is traced, see `LatencyTracer`.
+    When running several boards in one process, each board has its own event listener, with its own namespace, see
+    `namespaced`, sharing the worker threads and the training processes with the listeners of the other boards.
     Instances of this class are executed in it's own thread of control.
 
     The instance will automatically shutdown if the stay_alive event has been cleared.
@@ -31,121 +50,343 @@ class LslEventListener(Thread):
     :type board_shim: BoardShim
     :param stay_alive: Life line to indicate that the thread should stay alive.
     :type stay_alive: Event
+    :param reference: Re-referencing method passed on to created classifiers, defaults to 'mean'
+    :type reference: str, optional
+    :param stream_filter: Let created classifiers keep a running filter state, defaults to False
+    :type stream_filter: bool, optional
+    :param data_ready: Notifies created classifiers when board data has arrived, defaults to None
+    :type data_ready: DataReadyNotifier | None, optional
+    :param train_workers: Number of worker processes to train classifiers in, defaults to None (number of CPUs)
+    :type train_workers: int | None, optional
+    :param train_executor: Executor to train classifiers in, shared with other event listeners and shut down by its
+                           owner, defaults to None (a process pool of train_workers processes of its own)
+    :type train_executor: Executor | None, optional
+    :param epoch_dir: Directory to memory-map the raw epochs of created classifiers to, in a subdirectory
+                      per classifier name, defaults to None (kept in memory)
+    :type epoch_dir: str | None, optional
+    :param event_workers: Number of worker threads handling events, defaults to 4
+    :type event_workers: int, optional
+    :param max_queue_depth: Maximum number of queued events per classifier, when full the listener waits
+                            up to queue_timeout for room, after which the event is dropped, defaults to 16
+    :type max_queue_depth: int, optional
+    :param dispatcher: Dispatcher to handle events in, shared with other event listeners and shut down by its owner,
+                       defaults to None (a dispatcher of event_workers threads of its own)
+    :type dispatcher: CommandDispatcher | None, optional
+    :param queue_timeout: Maximum time to wait for room in a full queue, in s, defaults to 5.0
+    :type queue_timeout: float, optional
+    :param latency_dump: File to write the latency percentiles to at shutdown, defaults to None
+    :type latency_dump: str | None, optional
+    :param clock_sync: Clock synchronization service to convert event timestamps to Brainflow timestamps,
+                       defaults to None (the clock offset is measured once)
+    :type clock_sync: ClockSync | None, optional
+    :param board_state: State of the board connection, passed on to created classifiers, defaults to None
+    :type board_state: BoardStateBus | None, optional
+    :param health: Health of the board connection, pushed on the `status` event, defaults to None
+    :type health: HealthMonitor | None, optional
+    :param recorder: Records the received events as markers, defaults to None
+    :type recorder: SessionRecorder | None, optional
+    :param namespace: Name of the board, prefixed to the names of the event stream listened to and of all streams
+                      pushed, see `namespaced`, defaults to '' (single board)
+    :type namespace: str, optional
     :param thread_name: Thread name, defaults to "lsl_event_listener"
     :type thread_name: str, optional
     :param thread_daemon: Sets thread as daemon, or not, defaults to True
     :type thread_daemon: bool, optional
     """
 
-    def __init__(self, board_shim: BoardShim, stay_alive: Event, reference: str = 'mean',
-                 thread_name: str = "lsl_event_listener", thread_daemon: bool = False) -> None:
+    streamer_stop_timeout = 5.0  # in s, time a prediction streamer gets to stop before it is replaced.
+
+    def __init__(self, board_shim: BoardShim, stay_alive: Event, reference: str = 'mean', stream_filter: bool = False,
+                 data_ready: DataReadyNotifier | None = None, train_workers: int | None = None,
+                 train_executor: Executor | None = None, epoch_dir: str | None = None, event_workers: int = 4,
+                 max_queue_depth: int = 16, dispatcher: CommandDispatcher | None = None, queue_timeout: float = 5.0,
+                 latency_dump: str | None = None, clock_sync: ClockSync | None = None,
+                 board_state: BoardStateBus | None = None, health: HealthMonitor | None = None,
+                 recorder: SessionRecorder | None = None, namespace: str = '', thread_name: str = "lsl_event_listener",
+                 thread_daemon: bool = False) -> None:
         Thread.__init__(self, name=thread_name, daemon=thread_daemon)
         self.stay_alive = stay_alive
         self.board_shim = board_shim
         self.reference = reference
+        self.stream_filter = stream_filter
+        self.data_ready = data_ready
+        self.board_state = board_state
+        self.health = health
+        self.recorder = recorder
+        self.namespace = namespace
+        # shared pools are shut down by their owner, once all event listeners have shut down.
+        self.owns_train_executor = train_executor is None
+        # the training processes are spawned, forking a process running LSL threads is not safe.
+        self.train_executor = ProcessPoolExecutor(max_workers=train_workers, mp_context=get_context('spawn')) \
+            if train_executor is None else train_executor
+        self.epoch_dir = epoch_dir
+        self.epoch_cache = EpochCache()
+        self.owns_dispatcher = dispatcher is None
+        self.dispatcher = CommandDispatcher(event_workers, max_queue_depth) if dispatcher is None else dispatcher
+        # queues of a shared dispatcher are keyed by namespace and classifier name.
+        self.queue_prefix = f'{namespace}/' if namespace != '' else ''
+        self.queue_timeout = queue_timeout
+        self.tracer = LatencyTracer(namespace=namespace)
+        self.latency_dump = latency_dump
+        self.clock_sync = clock_sync if clock_sync is not None else ClockSync(stay_alive)
+        self.lock = Lock()  # lock for classifiers and streamers, events of different classifiers run in parallel.
         self.classifiers = {}
-        name = 'ixr-flow-lsl-relay'
+        self.streamers = {}
+        name = namespaced('ixr-flow-lsl-relay', namespace)
         logging.info(f"Starting '{name}' LSL event relay stream.")
         self.outlet = StreamOutlet(StreamInfo(name=name, type='Markers', channel_count=3,
-                                   nominal_srate=0, channel_format='string', source_id='ixr-flow-lsl-relay'))
+                                   nominal_srate=0, channel_format='string', source_id=name))
         logging.info(f"'{self.outlet.get_info().name()}' LSL event relay stream started.")
 
     def run(self) -> None:
         """Once a thread object is created, its activity must be started by calling the thread’s start() method.
         This invokes the run() method in a separate thread of control.
         """
-        threads = []
-        connections = []
         inlet = None
-
-        while self.stay_alive.is_set() and len(connections) == 0:
+        while self.stay_alive.is_set() and inlet is None:
             # Poll for connections as long the thread is alive.
-            # Make sure resolve_byprop has a timeout, otherwise the thread hangs.
-            connections = resolve_byprop("name", "SendMarkersOnClick", timeout=1.0)
-
-        if len(connections) > 0:  # Only build connection when previous loop was exited because a connection was found.
-            logging.info(f"LSL event stream found: {connections[0].name()}, connecting ...")
-            inlet = StreamInlet(connections[0])
-            logging.info(f"LSL event stream established: {inlet.info().name()}")
+            inlet = self.connect(timeout=1.0)
 
         while self.stay_alive.is_set() and inlet is not None:
             # Poll for incoming events as long the thread is alive.
-            # Make sure pull_sample has a timeout, otherwise the thread hangs.
-            event_sample, event_timestamp = inlet.pull_sample(timeout=1.0)
-            if event_sample is not None:
-                thread = Thread(target=self._lsl_event_worker, args=(event_sample, event_timestamp))
-                threads.append(thread)
-                thread.start()
-
-        # Once stay_alive is cleared, wait for threads to finish
-        for thread in threads:
-            thread.join()
-
-    def _lsl_event_worker(self, event_sample: list[str], event_timestamp: float) -> None:
-        """Thread worker that will handle/decode and incoming LSL and
-        takes the appropriate actions based on the event.
-
-        :param event_sample: List with possible event samples, will always take the first sample to decode.
-        :type event_sample: List of str
-        :param event_timestamp: The original event timestamp
-        :type event_timestamp: float
+            self.handle_events(self.pull_events(inlet, timeout=1.0))
+
+        self.shutdown(inlet)
+
+    def connect(self, timeout: float) -> StreamInlet | None:
+        """Looks for the LSL event stream, and connects to it if found.
+
+        :param timeout: Maximum time to look for the stream, in s, make sure it is set, otherwise the call hangs.
+        :type timeout: float
+        :return: Returns the inlet of the event stream, None if the stream was not found.
+        :rtype: StreamInlet | None
+        """
+        connections = resolve_byprop("name", namespaced("SendMarkersOnClick", self.namespace), timeout=timeout)
+        if len(connections) == 0:
+            return None
+        logging.info(f"LSL event stream found: {connections[0].name()}, connecting ...")
+        inlet = StreamInlet(connections[0])
+        # Event timestamps of remote sources are corrected with the LSL time correction of the inlet.
+        self.clock_sync.register_inlet(inlet)
+        logging.info(f"LSL event stream established: {inlet.info().name()}")
+        return inlet
+
+    def pull_events(self, inlet: StreamInlet, timeout: float) -> list[tuple[str, float]]:
+        """Blocks until an event arrives, and takes all events that have arrived meanwhile at once,
+        as events often arrive in bursts.
+
+        :param inlet: Inlet of the event stream.
+        :type inlet: StreamInlet
+        :param timeout: Maximum time to wait for an event, in s, make sure it is set, otherwise the call hangs.
+        :type timeout: float
+        :return: Returns the events and their timestamps, converted to the wall clock, empty if none arrived.
+        :rtype: list[tuple[str, float]]
+        """
+        event_sample, event_timestamp = inlet.pull_sample(timeout=timeout)
+        if event_sample is None:
+            return []
+        event_samples, event_timestamps = inlet.pull_chunk(timeout=0.0)
+        return [(sample[0], self.clock_sync.remote_to_local(inlet, timestamp))
+                for sample, timestamp in zip([event_sample] + event_samples, [event_timestamp] + event_timestamps)]
+
+    def handle_events(self, events: list[tuple[str, float]]) -> None:
+        """Parses events and queues their commands, see `pull_events`.
+
+        :param events: Events and their timestamps.
+        :type events: list[tuple[str, float]]
         """
-        lsl_local_time = local_clock()
-        local_time = time.time()
-        event_timestamp = event_timestamp + (local_time - lsl_local_time)
+        for message, event_timestamp in events:
+            if self.recorder is not None:
+                self.recorder.record_marker(message, event_timestamp)
+            self._dispatch(message, event_timestamp)
+
+    def shutdown(self, inlet: StreamInlet | None = None) -> None:
+        """Waits for queued events to finish, and stops all streamers and trainings. Shared pools keep running.
+
+        :param inlet: Inlet of the event stream, if connected, defaults to None
+        :type inlet: StreamInlet | None, optional
+        """
+        if self.owns_dispatcher:
+            self.dispatcher.shutdown()
+        else:
+            self.dispatcher.wait_idle(self.queue_prefix)
+        if inlet is not None:
+            self.clock_sync.unregister_inlet(inlet)
+        logging.info(f"Event queue statistics: {json.dumps(self.dispatcher.stats(self.queue_prefix))}")
+        self.tracer.dump(self.latency_dump)
+        with self.lock:
+            streamers = list(self.streamers.values())
+        for streamer in streamers:
+            streamer.join()
+        if self.owns_train_executor:
+            self.train_executor.shutdown(cancel_futures=True)
+
+    def _dispatch(self, message: str, event_timestamp: float) -> None:
+        """Parses an incoming LSL event into commands, and queues them per classifier name.
 
+        :param message: LSL event encoded as str, holding one or more commands.
+        :type message: str
+        :param event_timestamp: The original event timestamp, converted to the wall clock.
+        :type event_timestamp: float
+        """
+        received = time.perf_counter()
         logging.info(f"LSL event received, timestamps: "
-                     f"\n\tLSL local timestamp: \t{lsl_local_time}"
-                     f"\n\tLocal timestamp: \t{local_time}"
+                     f"\n\tLocal timestamp: \t{time.time()}"
                      f"\n\tEvent timestamp: \t{event_timestamp}")
 
         try:
-            self._message_decode(event_sample[0], event_timestamp)
+            commands = parse_message(message)
+        except DecodeError as e:
+            logging.warning(f"{e}. Skipping event, please try again.")
+            return
+        except Exception:
+            # a malformed event should never stop the listener.
+            logging.exception(f"Failed to decode event {message!r}. Skipping event, please try again.")
+            return
+        decoded = time.perf_counter()
+        for command in commands:
+            trace = EventTrace(command.name, command.task, {'received': received, 'decoded': decoded})
+            if not self.dispatcher.submit(self.queue_prefix + command.name, self._lsl_event_worker, command,
+                                          event_timestamp, trace, timeout=self.queue_timeout):
+                logging.warning(f"Event queue of '{command.name}' is full, dropped command: {command}")
+
+    def _lsl_event_worker(self, command: Command, event_timestamp: float, trace: EventTrace) -> None:
+        """Worker that takes the appropriate actions based on a command of an incoming LSL event.
+
+        :param command: Command parsed from the event.
+        :type command: Command
+        :param event_timestamp: The original event timestamp
+        :type event_timestamp: float
+        :param trace: Trace of the event, finished once the command has been executed.
+        :type trace: EventTrace
+        """
+        trace.mark('started')
+        try:
+            self._execute(command, event_timestamp, trace)
         except (DecodeError, ClfError) as e:
-            logging.warning(f"{e}. Stopping thread, please try again.")
+            logging.warning(f"{e}. Stopping {command.task}, please try again.")
+            return
+        self.tracer.finish(trace)
+
+    def _epoch_dir(self, name: str) -> Path | None:
+        return Path(self.epoch_dir) / name if self.epoch_dir is not None else None
 
-    def _message_decode(self, message: str, event_timestamp: float) -> str:
-        """Parsers, decodes and executes LSL events passed as message.
-        Returns a success notification or raises a DecodeError.
+    def _train_done(self, name: str, future: Future) -> None:
+        """Callback for finished trainings, logs the scores and pushes the mean scores and train duration
+        over the relay stream as JSON. A failed training is pushed as `train-failed`, with the error as JSON.
+
+        :param name: Classifier name.
+        :type name: str
+        :param future: Future holding the train scores.
+        :type future: Future
+        """
+        try:
+            scores = future.result()
+        except ClfError as e:
+            logging.warning(f"{e}. Training {name} failed, please try again.")
+            self.outlet.push_sample([name, 'train-failed', json.dumps({'error': str(e)})])
+            return
+        except Exception as e:  # e.g. a single class collected, or a broken train pool.
+            logging.exception(f"Training {name} failed, please try again.")
+            self.outlet.push_sample([name, 'train-failed', json.dumps({'error': f'{type(e).__name__}: {e}'})])
+            return
+        logging.info(f"Trained model {name} successfully, with scores:.")
+        for key, value in scores.items():
+            logging.info(f"    {key}: {value}")
+        mean_scores = {key: float(np.mean(value)) for key, value in scores.items()}
+        self.outlet.push_sample([name, 'train', json.dumps(mean_scores)])
+
+    def _execute(self, command: Command, event_timestamp: float, trace: EventTrace | None = None) -> None:
+        """Executes a command parsed from an LSL event, raises a DecodeError if it can not be executed.
 
         A description of lsl can be found at: `./doc/lsl.md`
 
-        :param message: LSL event encoded as str.
-        :type message: str
+        :param command: Command parsed from the event.
+        :type command: Command
         :param event_timestamp: The original event timestamp
         :type event_timestamp: float
+        :param trace: Trace to record the stages of handling the event in, defaults to None
+        :type trace: EventTrace | None, optional
         :raises DecodeError: "Unknown classifier instance, please create one"
         :raises DecodeError: "Unrecognized task when decoding"
-        :return: Returns success message
-        :rtype: str
         """
-        if message == '':
-            raise DecodeError("Got empty event message when decoding.")
-        message_list = message.split(';')
-        task = message_list.pop(0)
-        name = message_list.pop(0)
-        if task == 'create':
-            model_type = message_list.pop(0)
-            time_range = [int(value) for value in message_list.pop(0).split(',')]
-            filter_freq_cutoff = [float(value) for value in message_list.pop(0).split(',')]
-            method = message_list.pop(0)
-            self.classifiers[name] = Classifier(self.board_shim, model_type, time_range,
-                                                filter_freq_cutoff, method, self.reference)
+        name = command.name
+        with self.lock:
+            clf = self.classifiers.get(name)
+        if isinstance(command, CreateCommand):
+            clf = Classifier(self.board_shim, command.model_type, command.time_range, command.filter_freq_cutoff,
+                             command.method, self.reference, self.stream_filter, self.data_ready,
+                             self.train_executor, self.epoch_cache, self._epoch_dir(name), self.board_state)
+            with self.lock:
+                self.classifiers[name] = clf
             logging.info(f"Created classifier instance, with name {name}.")
-        elif task == 'collect' and name in self.classifiers:
-            label = int(message_list.pop(0))
-            self.classifiers[name].collect_sample(label, event_timestamp)
-            logging.info(f"Collected sample with, label: {label}.")
-        elif task == 'train' and name in self.classifiers:
-            scores = self.classifiers[name].train()
-            logging.info(f"Trained model successfully, with scores:.")
-            for key, value in scores.items():
-                logging.info(f"    {key}: {value}")
-        elif task == 'predict' and name in self.classifiers:
-            prediction, distance = self.classifiers[name].predict(event_timestamp)
-            logging.info(f"Prediction: {prediction[0]}, with distance: {distance[0]}.")
-            self.outlet.push_sample([name, str(prediction[0]), str(distance[0])])
-        elif name not in self.classifiers:
+        elif isinstance(command, LoadCommand):
+            clf = Classifier.load(command.path, self.board_shim, stream_filter=self.stream_filter,
+                                  data_ready=self.data_ready, executor=self.train_executor,
+                                  epoch_cache=self.epoch_cache, epoch_dir=self._epoch_dir(name),
+                                  board_state=self.board_state)
+            with self.lock:
+                self.classifiers[name] = clf
+            logging.info(f"Loaded classifier instance {name} from {command.path}, with {len(clf.train_y)} samples.")
+        elif isinstance(command, StatusCommand):
+            self.outlet.push_sample(['status', 'queues', json.dumps(self.dispatcher.stats(self.queue_prefix))])
+            if self.health is not None:
+                self.outlet.push_sample(['status', 'board', json.dumps(self.health.stats())])
+        elif isinstance(command, PredictAllCommand):
+            with self.lock:
+                classifiers = dict(self.classifiers)
+            predictions = predict_all(classifiers, event_timestamp, trace)
+            for clf_name, (prediction, distance) in predictions.items():
+                logging.info(f"Prediction {clf_name}: {prediction[0]}, with distance: {distance[0]}.")
+            self.outlet.push_sample(['predict-all',
+                                     json.dumps({key: value[0].item() for key, (value, _) in predictions.items()}),
+                                     json.dumps({key: value[0].tolist() for key, (_, value) in predictions.items()})])
+            if trace is not None:
+                trace.mark('pushed')
+        elif clf is None:
             raise DecodeError("Unknown classifier instance, please create one.")
+        elif isinstance(command, SaveCommand):
+            clf.save(command.path)
+            logging.info(f"Saved classifier instance {name} to {command.path}.")
+        elif isinstance(command, RefeaturizeCommand):
+            clf.refeaturize(command.time_range, command.filter_freq_cutoff, command.method)
+            logging.info(f"Refeaturized {len(clf.train_y)} samples of classifier {name}, please train it again.")
+        elif isinstance(command, CollectCommand):
+            clf.collect_sample(command.label, event_timestamp, trace)
+            logging.info(f"Collected sample with, label: {command.label}.")
+        elif isinstance(command, TrainCommand):
+            clf.train_async().add_done_callback(lambda future: self._train_done(name, future))
+            logging.info(f"Started training model {name}.")
+        elif isinstance(command, AutoUpdateCommand):
+            clf.set_auto_update(command.enabled)
+            logging.info(f"{'Enabled' if command.enabled else 'Disabled'} auto updating model on collect.")
+        elif isinstance(command, StreamCommand):
+            if not math.isfinite(command.rate) or command.rate > clf.eeg_sample_rate:
+                raise ClfError(f"Streaming rate should be at most the sampling rate of {clf.eeg_sample_rate} Hz, "
+                               f"got {command.rate}")
+            with self.lock:
+                streamer = self.streamers.pop(name, None)
+            if streamer is not None:
+                # the new streamer opens an outlet of the same name, wait for the old one to finish its last tick.
+                streamer.stop()
+                streamer.join(self.streamer_stop_timeout)
+                if streamer.is_alive():
+                    logging.warning(f"Streaming predictions of {name} did not stop within "
+                                    f"{self.streamer_stop_timeout} s.")
+            if command.rate > 0:
+                streamer = LslPredictionStreamer(clf, name, command.rate, self.stay_alive, self.clock_sync,
+                                                 self.namespace)
+                with self.lock:
+                    self.streamers[name] = streamer
+                streamer.start()
+                logging.info(f"Streaming predictions of {name} at {command.rate} Hz.")
+            else:
+                logging.info(f"Stopped streaming predictions of {name}.")
+        elif isinstance(command, PredictCommand):
+            prediction, distance = clf.predict(event_timestamp, trace)
+            self.outlet.push_sample([name, str(prediction[0]), str(distance[0])])
+            if trace is not None:
+                trace.mark('pushed')
+            logging.info(f"Prediction: {prediction[0]}, with distance: {distance[0]}.")
         else:
             raise DecodeError("Unrecognized task when decoding.")
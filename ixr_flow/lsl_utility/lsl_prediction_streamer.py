@@ -0,0 +1,132 @@
+import logging
+import time
+from threading import Event, Thread
+
+import numpy as np
+from brainflow import BrainFlowError, BrainFlowExitCodes
+from pylsl import StreamInfo, StreamOutlet, cf_double64
+
+from ixr_flow.classifiers import Classifier, ClfError
+
+from .clock_sync import ClockSync
+from .stream_names import namespaced
+
+
+class LslPredictionStreamer(Thread):
+    """Class that continuously decodes the latest board data with a trained classifier, at a fixed rate,
+    and pushes the predictions and decision function values over a numeric LSL stream.
+    Executed in it's own thread of control.
+
+    Every tick the classifier is applied on a sliding window ending at the latest sample.
+    Successive windows overlap, samples are filtered once by a streaming filter, only new samples are filtered.
+    Predictions are pushed with the (LSL) timestamp of the last sample of the window.
+
+    The instance will shutdown if either the stay_alive event has been cleared or `stop()` is called.
+
+    :param classifier: Trained classifier used to decode.
+    :type classifier: Classifier
+    :param name: Classifier name, used to name the LSL stream `ixr-flow-<name>-predictions`.
+    :type name: str
+    :param rate: Decoding rate, in Hz.
+    :type rate: float
+    :param stay_alive: Life line to indicate that the thread should stay alive.
+    :type stay_alive: Event
+    :param clock_sync: Clock synchronization service to convert Brainflow timestamps to LSL timestamps,
+                       defaults to None (the clock offset is measured once)
+    :type clock_sync: ClockSync | None, optional
+    :param namespace: Name of the board, prefixed to the stream name when running several boards, see `namespaced`,
+                      defaults to '' (single board)
+    :type namespace: str, optional
+    :param thread_daemon: Sets thread as daemon, or not, defaults to False
+    :type thread_daemon: bool, optional
+    :raises ClfError: "Classifier has to be trained before streaming predictions"
+    """
+
+    def __init__(self, classifier: Classifier, name: str, rate: float, stay_alive: Event,
+                 clock_sync: ClockSync | None = None, namespace: str = '', thread_daemon: bool = False) -> None:
+        Thread.__init__(self, name=namespaced(f"lsl_prediction_streamer_{name}", namespace), daemon=thread_daemon)
+        if not hasattr(classifier.model, 'classes_') or len(classifier.model.classes_) < 2:
+            raise ClfError("Classifier has to be trained before streaming predictions")
+        self.classifier = classifier
+        self.rate = rate
+        self.stay_alive = stay_alive
+        self.stopped = Event()
+        self.eeg_filter = classifier.create_streaming_filter()
+        self.filter_key = classifier.feature_key  # features the filter was created for, see `_decode`.
+        self.clock_sync = clock_sync if clock_sync is not None else ClockSync(stay_alive)
+
+        # Two class models have a single decision value, other models one per class.
+        num_classes = len(classifier.model.classes_)
+        channel_count = 1 + (1 if num_classes == 2 else num_classes)
+        stream_name = namespaced(f'ixr-flow-{name}-predictions', namespace)
+        logging.info(f"Starting '{stream_name}' LSL prediction stream.")
+        info = StreamInfo(name=stream_name, type='Predictions', channel_count=channel_count, nominal_srate=rate,
+                          channel_format=cf_double64, source_id=stream_name)
+        channels = info.desc().append_child("channels")
+        channels.append_child("channel").append_child_value("label", "prediction")
+        for i in range(channel_count - 1):
+            channels.append_child("channel").append_child_value("label", f"decision_{i}")
+        self.outlet = StreamOutlet(info)
+        logging.info(f"'{self.outlet.get_info().name()}' LSL prediction stream started.")
+
+    @property
+    def window_end(self) -> float:
+        """Time from the event start up to the end of the last averaging window, in s, read from the classifier
+        on every tick, as the time range can change, see `Classifier.refeaturize`."""
+        return (self.classifier.time_range[1] + self.classifier.window_size) / 1000
+
+    def stop(self) -> None:
+        """Stops streaming predictions, the thread exits after finishing the current tick."""
+        self.stopped.set()
+
+    def run(self) -> None:
+        """Once a thread object is created, its activity must be started by calling the thread’s start() method.
+        This invokes the run() method in a separate thread of control.
+        """
+        interval = 1 / self.rate
+        next_tick = time.perf_counter()
+        board_state = self.classifier.board_state
+        while self.stay_alive.is_set() and not self.stopped.is_set():
+            if board_state is not None and not board_state.is_ready():
+                # block until the board is ready again, instead of failing every tick.
+                board_state.wait_ready(timeout=1.0)
+                next_tick = time.perf_counter()
+                continue
+            try:
+                self._decode()
+            except ClfError as e:
+                logging.debug(f"{e}. Skipping prediction.")
+            next_tick += interval
+            # if decoding took longer than an interval, skip the missed ticks instead of catching up.
+            next_tick = max(next_tick, time.perf_counter())
+            self.stopped.wait(next_tick - time.perf_counter())
+
+    def _decode(self) -> None:
+        clf = self.classifier
+        if not clf.board_shim.is_prepared():
+            raise ClfError("BoardShim not prepared")
+        if clf.feature_key != self.filter_key:
+            # refeaturized, e.g. with another filter or time range, start over with a matching filter.
+            self.eeg_filter = clf.create_streaming_filter()
+            self.filter_key = clf.feature_key
+        try:
+            data_eeg = clf.board_shim.get_current_board_data(clf.eeg_num_samples, clf.eeg_preset)
+            data_motion = clf.board_shim.get_current_board_data(clf.motion_num_samples, clf.motion_preset) \
+                if clf.use_motion else None
+        except BrainFlowError as e:
+            # Right after board preparation the Brainflow connection might be a bit unstable.
+            # In that case Brainflow throws an INVALID_ARGUMENTS_ERROR exception, try again next tick.
+            if e.exit_code == BrainFlowExitCodes.INVALID_ARGUMENTS_ERROR:
+                raise ClfError(e)
+            raise e
+        if data_eeg.shape[1] < 1 or (data_motion is not None and data_motion.shape[1] < 1):
+            raise ClfError("No board data received yet")
+
+        # end the window on the latest sample available for all presets.
+        last_timestamp = data_eeg[clf.eeg_timestamp_channel, -1]
+        if data_motion is not None:
+            last_timestamp = min(last_timestamp, data_motion[clf.motion_timestamp_channel, -1])
+        x_data = clf.extract_features(data_eeg, last_timestamp - self.window_end, data_motion, self.eeg_filter)
+        prediction, distance = clf.predict_features(x_data)
+        self.outlet.push_sample(np.concatenate([prediction, np.ravel(distance)]).astype(np.float64).tolist(),
+                                self.clock_sync.local_to_lsl(last_timestamp))
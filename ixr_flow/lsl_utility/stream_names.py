@@ -0,0 +1,13 @@
+def namespaced(name: str, namespace: str = '') -> str:
+    """Returns the name of an LSL stream, or its source id, of the board given by namespace, when running several
+    boards in one process. Names are prefixed with the namespace, e.g. `p1-ixr-flow-eeg-data`, without a namespace
+    names are kept as they are.
+
+    :param name: Stream name or source id.
+    :type name: str
+    :param namespace: Name of the board, defaults to '' (single board)
+    :type namespace: str, optional
+    :return: Returns the namespaced name.
+    :rtype: str
+    """
+    return f'{namespace}-{name}' if namespace != '' else name
@@ -0,0 +1,331 @@
+import argparse
+import logging
+import queue
+import signal
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing import connection, get_context, resource_tracker
+from multiprocessing.context import SpawnProcess
+from multiprocessing.queues import Queue
+from multiprocessing.synchronize import Condition, Event
+from pathlib import Path
+from threading import Thread
+
+from brainflow.board_shim import BoardShim, BrainFlowInputParams
+
+from ixr_flow.board import BrainFlowHandler, PlaybackBoard, SharedBoardBuffer, SyntheticBoard
+from ixr_flow.gui import DashboardApp, IXRDashboard
+from ixr_flow.lsl_utility import BfLslDataPublisher, ClockSync, CommandDispatcher, LslEventListener, namespaced
+from ixr_flow.recording import SessionRecorder
+
+BoardFactory = Callable[[argparse.Namespace, tuple[str, list], BrainFlowInputParams, str],
+                        BoardShim | PlaybackBoard | SyntheticBoard]
+BoardFile = Callable[[str | None, str], str | None]
+
+
+class MarkerForwarder:
+    """Takes the place of the session recorder of a board in the classifier service process, forwarding the markers
+    received by the event listener to the recorder in the publisher process, see `MarkerRelay`.
+
+    :param markers: Queue to the publisher process.
+    :type markers: Queue
+    :param namespace: Name of the board.
+    :type namespace: str
+    """
+
+    def __init__(self, markers: Queue, namespace: str) -> None:
+        self.markers = markers
+        self.namespace = namespace
+
+    def record_marker(self, message: str, timestamp: float) -> None:
+        self.markers.put((self.namespace, message, timestamp))
+
+
+class MarkerRelay(Thread):
+    """Hands over the markers forwarded by the classifier service process to the session recorder of their board,
+    executed in it's own thread of control, see `MarkerForwarder`.
+
+    :param markers: Queue from the classifier service process.
+    :type markers: Queue
+    :param recorders: Session recorder by board name.
+    :type recorders: dict[str, SessionRecorder]
+    :param stay_alive: Life line to indicate that the thread should stay alive.
+    :type stay_alive: Event
+    :param thread_name: Thread name, defaults to "marker_relay"
+    :type thread_name: str, optional
+    :param thread_daemon: Sets thread as daemon, or not, defaults to False
+    :type thread_daemon: bool, optional
+    """
+
+    def __init__(self, markers: Queue, recorders: dict[str, SessionRecorder], stay_alive: Event,
+                 thread_name: str = "marker_relay", thread_daemon: bool = False) -> None:
+        Thread.__init__(self, name=thread_name, daemon=thread_daemon)
+        self.markers = markers
+        self.recorders = recorders
+        self.stay_alive = stay_alive
+
+    def run(self) -> None:
+        while self.stay_alive.is_set():
+            try:
+                namespace, message, timestamp = self.markers.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self.recorders[namespace].record_marker(message, timestamp)
+
+
+class ProcessRuntime:
+    """Runs IXR-flow split over processes, so the acquisition of the boards, the dashboard, the data publishers and
+    the classifiers do not compete for the GIL of a single process:
+
+    - acquisition: one process per board, draining the board into a `SharedBoardBuffer`.
+    - dashboard: one process with the windows of all boards.
+    - publisher: one process with the data publishers and session recorders of all boards.
+    - classifier service: one process with the event listeners of all boards, training in a process pool.
+
+    Board data is read from shared memory by all processes, without copying it between processes. Markers to record
+    are passed from the classifier service to the publisher process over a queue, and log records from all processes
+    to the handlers of the root logger of this process. Processes are started with spawn, the same on all platforms.
+
+    IXR-flow runs as long as the dashboard is open: once it is closed, or any other process exits, all processes are
+    told to stop, see `shutdown`. Processes ignore SIGINT, Ctrl-C shuts down through this process.
+
+    :param args: Parsed arguments of IXR-flow.
+    :type args: argparse.Namespace
+    :param create_board: Creates the board of a source in the acquisition process, see `IXRFlow.create_board`.
+    :type create_board: BoardFactory
+    :param board_file: Returns the file of a board given a file argument, see `IXRFlow.board_file`.
+    :type board_file: BoardFile
+    :param record_path: Directory to record the sessions to, None to not record, defaults to None
+    :type record_path: Path | None, optional
+    :param shutdown_timeout: Time processes get to stop, in s, before they are terminated, defaults to 30.0
+    :type shutdown_timeout: float, optional
+    """
+
+    def __init__(self, args: argparse.Namespace, create_board: BoardFactory, board_file: BoardFile,
+                 record_path: Path | None = None, shutdown_timeout: float = 30.0) -> None:
+        self.args = args
+        self.create_board = create_board
+        self.board_file = board_file
+        self.record_path = record_path
+        self.shutdown_timeout = shutdown_timeout
+        # without --board a single board is run, of which the streams are not namespaced.
+        self.boards = args.boards if args.boards is not None else [('', args.source)]
+        self.context = get_context('spawn')
+        self.stay_alive = self.context.Event()
+        self.conditions = {name: self.context.Condition() for name, _ in self.boards}
+        self.log_queue = self.context.Queue()
+        self.markers = self.context.Queue()  # markers to record, from the classifier service to the publisher.
+        self.specs_queue = self.context.Queue()  # specs of the shared buffers, from the acquisition processes.
+        self.specs = {}  # spec of the shared buffer by board name, as received.
+        self.acquisitions = {}  # acquisition process by board name.
+        self.consumers = []
+        self.dashboard = None
+
+    def run(self) -> None:
+        """Starts all processes, and blocks until IXR-flow is shut down."""
+        # share the resource tracker of this process, so shared memory is not reported as leaked by the consumers.
+        resource_tracker.ensure_running()
+        log_listener = QueueListener(self.log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+        log_listener.start()
+        self.stay_alive.set()
+        try:
+            specs = self._start_acquisitions()
+            if specs is not None:
+                self._start_consumers(specs)
+                logging.info("Running IXR-flow as long as the dashboard is open, please close the dashboard to "
+                             "close IXR-flow.")
+                self._wait()
+        except KeyboardInterrupt:
+            logging.info("Interrupted.")
+        finally:
+            self.shutdown()
+            log_listener.stop()
+
+    def shutdown(self) -> None:
+        """Tells all processes to stop, the consumers first, then the acquisitions, and terminates processes that
+        did not stop within the shutdown timeout, e.g. the dashboard if it is still open. The shared buffers of
+        acquisition processes that did not exit cleanly are freed here, as they did not free them."""
+        logging.info("Terminating all processes.")
+        self.stay_alive.clear()
+        for process in self.consumers + list(self.acquisitions.values()):
+            process.join(self.shutdown_timeout)
+            if process.is_alive():
+                logging.warning(f"Process {process.name} did not stop, terminating it.")
+                process.terminate()
+                process.join()
+        if self.dashboard is not None:
+            self.dashboard.terminate()
+            self.dashboard.join()
+        self._receive_specs()  # specs sent after the runtime stopped waiting for them.
+        for name, process in self.acquisitions.items():
+            if process.exitcode != 0 and name in self.specs:
+                SharedBoardBuffer.remove(self.specs[name])
+        logging.info("Successfully shutdown.")
+
+    def _start_acquisitions(self) -> dict[str, dict] | None:
+        """Starts the acquisition processes, and waits for the spec of the shared buffer of each board.
+
+        :return: Returns the spec of the buffer by board name, None if an acquisition process exited.
+        :rtype: dict[str, dict] | None
+        """
+        for name, source in self.boards:
+            self.acquisitions[name] = self._process(namespaced("acquisition", name), run_acquisition, name, source,
+                                                    self.args, self.create_board, self.conditions[name],
+                                                    self.specs_queue)
+        while len(self.specs) < len(self.boards):
+            if not self._receive_specs(timeout=1.0) and \
+                    not all(process.is_alive() for process in self.acquisitions.values()):
+                logging.error("An acquisition process exited before sharing its board.")
+                return None
+        return dict(self.specs)
+
+    def _receive_specs(self, timeout: float | None = None) -> bool:
+        """Receives the specs sent by the acquisition processes, see `specs`.
+
+        :param timeout: Time to wait for a spec, in s, defaults to None (only receives the specs already sent)
+        :type timeout: float | None, optional
+        :return: Returns whether any spec was received.
+        :rtype: bool
+        """
+        received = False
+        try:
+            while True:
+                name, spec = self.specs_queue.get(block=not received and timeout is not None, timeout=timeout)
+                self.specs[name] = spec
+                received = True
+        except queue.Empty:
+            return received
+
+    def _start_consumers(self, specs: dict[str, dict]) -> None:
+        self.dashboard = self._process("dashboard", run_dashboards, specs, self.args, self.conditions)
+        self.consumers.append(self._process("publisher", run_publishers, specs, self.args, self.conditions,
+                                            self.markers, self.record_path))
+        self.consumers.append(self._process("classifier_service", run_service, specs, self.args, self.conditions,
+                                            self.board_file, self.markers if self.record_path is not None else None))
+
+    def _process(self, name: str, target: Callable, *args: any) -> SpawnProcess:
+        process = self.context.Process(target=run_child, name=name,
+                                       args=(target, self.log_queue, self.stay_alive) + args)
+        process.start()
+        return process
+
+    def _wait(self) -> None:
+        """Blocks until a process exits, the dashboard when it is closed, any other process only on failure."""
+        processes = {process.sentinel: process
+                     for process in list(self.acquisitions.values()) + self.consumers + [self.dashboard]}
+        for sentinel in connection.wait(list(processes)):
+            process = processes[sentinel]
+            process.join()
+            if process is self.dashboard and process.exitcode == 0:
+                logging.info("IXR-flow dashboard closed.")
+            else:
+                logging.error(f"Process {process.name} exited unexpectedly with exit code {process.exitcode}.")
+
+
+def run_child(target: Callable, log_queue: Queue, stay_alive: Event, *args: any) -> None:
+    """Entry point of all processes: passes log records on to the main process, and runs target.
+
+    :param target: Runs the process, called with stay_alive and args.
+    :type target: Callable
+    :param log_queue: Queue to the log listener of the main process.
+    :type log_queue: Queue
+    :param stay_alive: Life line to indicate that the process should stay alive.
+    :type stay_alive: Event
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # records are formatted by the handlers of the main process.
+    logging.basicConfig(level=logging.INFO, format="%(message)s", handlers=[QueueHandler(log_queue)], force=True)
+    target(stay_alive, *args)
+
+
+def run_acquisition(stay_alive: Event, name: str, source: tuple[str, list], args: argparse.Namespace,
+                    create_board: BoardFactory, condition: Condition, specs: Queue) -> None:
+    """Drains a board into a shared board buffer, and sends the spec of the buffer to the main process."""
+    if args.log_brainflow:
+        BoardShim.enable_board_logger()
+        BoardShim.set_log_file(args.log_file)
+    params = BrainFlowInputParams()
+    params.timeout = args.timeout
+    board_shim = create_board(args, source, params, name)
+    brainflow_thread = BrainFlowHandler(board_shim, params, stay_alive, args.streamer_params,
+                                        thread_name=namespaced("thread_brainflow", name))
+    board_buffer = brainflow_thread.share(condition)
+    try:
+        specs.put((name, board_buffer.spec))
+        brainflow_thread.start()
+        brainflow_thread.join()
+        brainflow_thread.release_brainflow()
+    finally:
+        board_buffer.unlink()
+
+
+def run_dashboards(stay_alive: Event, specs: dict[str, dict], args: argparse.Namespace,
+                   conditions: dict[str, Condition]) -> None:
+    """Runs the dashboards of all boards, in the main thread of the process, until all windows are closed."""
+    dashboards = []
+    for name, spec in specs.items():
+        board_buffer = SharedBoardBuffer.attach(spec, conditions[name])
+        dashboard = IXRDashboard(board_buffer, args.reference, args.display_ref, board_state=board_buffer.board_state,
+                                 namespace=name)
+        dashboard.set_parameters(args.calib_length, args.power_length, args.scale, args.offset, args.head_impact)
+        dashboards.append(dashboard)
+    logging.info("Starting dashboard.")
+    DashboardApp(dashboards).run()
+
+
+def run_publishers(stay_alive: Event, specs: dict[str, dict], args: argparse.Namespace,
+                   conditions: dict[str, Condition], markers: Queue, record_path: Path | None) -> None:
+    """Runs the data publishers, and the session recorders if recording, of all boards."""
+    clock_sync = ClockSync(stay_alive, interval=args.clock_sync_interval)
+    clock_sync.start()
+    threads, recorders = [clock_sync], {}
+    for name, spec in specs.items():
+        board_buffer = SharedBoardBuffer.attach(spec, conditions[name])
+        if record_path is not None:
+            recorders[name] = SessionRecorder(record_path / name, stay_alive,
+                                              thread_name=namespaced("session_recorder", name))
+            threads.append(recorders[name])
+        threads.append(BfLslDataPublisher(board_buffer, push_full_vec=args.push_full_vec, float32=args.lsl_float32,
+                                          push_interval=args.push_interval, chunk_size=args.lsl_chunk_size,
+                                          max_buffered=args.lsl_max_buffered, stay_alive=stay_alive,
+                                          clock_sync=clock_sync, board_state=board_buffer.board_state,
+                                          recorder=recorders.get(name), namespace=name,
+                                          thread_name=namespaced("lsl_data_pusher", name), thread_daemon=False))
+    if record_path is not None:
+        threads.append(MarkerRelay(markers, recorders, stay_alive))
+    logging.info("Starting Brainflow LSL data publisher.")
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_service(stay_alive: Event, specs: dict[str, dict], args: argparse.Namespace,
+                conditions: dict[str, Condition], board_file: BoardFile, markers: Queue | None) -> None:
+    """Runs the event listeners and classifiers of all boards, the boards share the training processes and the event
+    worker threads."""
+    clock_sync = ClockSync(stay_alive, interval=args.clock_sync_interval)
+    clock_sync.start()
+    train_executor = ProcessPoolExecutor(max_workers=args.train_workers, mp_context=get_context('spawn'))
+    dispatcher = CommandDispatcher(args.event_workers, args.event_queue_depth)
+    listeners = []
+    for name, spec in specs.items():
+        board_buffer = SharedBoardBuffer.attach(spec, conditions[name])
+        listeners.append(LslEventListener(board_buffer, reference=args.reference, stream_filter=args.stream_filter,
+                                          data_ready=board_buffer.data_ready, train_executor=train_executor,
+                                          epoch_dir=str(Path(args.epoch_dir) / name)
+                                          if args.epoch_dir is not None else None,
+                                          dispatcher=dispatcher, latency_dump=board_file(args.latency_dump, name),
+                                          clock_sync=clock_sync, board_state=board_buffer.board_state,
+                                          recorder=MarkerForwarder(markers, name) if markers is not None else None,
+                                          namespace=name, stay_alive=stay_alive,
+                                          thread_name=namespaced("lsl_event_listener", name), thread_daemon=False))
+    logging.info("Starting LSL event listener.")
+    for listener in listeners:
+        listener.start()
+    for listener in listeners:
+        listener.join()
+    dispatcher.shutdown()
+    train_executor.shutdown(cancel_futures=True)
+    clock_sync.join()
@@ -0,0 +1,2 @@
+from .session_recorder import SessionRecorder
+from .session_recording import SessionRecording
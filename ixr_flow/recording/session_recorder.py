@@ -0,0 +1,164 @@
+import json
+import logging
+import queue
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import BinaryIO
+
+import numpy as np
+import numpy.typing as npt
+
+META_FILE = 'meta.json'
+MARKERS_FILE = 'markers.jsonl'
+SAMPLE_DTYPE = np.float64
+
+
+class SessionRecorder(Thread):
+    """Records a session to a directory, executed in it's own thread of control: the samples of numeric streams,
+    e.g. the Brainflow presets, and the markers received over LSL.
+
+    Producers hand over copies of their samples with `record` and `record_marker`, which never block on disk I/O.
+    The recorder thread appends them to the files of each stream, in chunks as they were recorded:
+
+    - `<stream>.bin`: samples as float64, samples by channels.
+    - `<stream>.ts`: timestamp of each sample as float64, ascending.
+    - `<stream>.idx`: coarse timestamp index, a (timestamp, sample number) float64 pair every index_step samples,
+      so a time range can be located without searching all timestamps, see `SessionRecording`.
+    - `markers.jsonl`: markers as JSON `[timestamp, message]`, one per line.
+    - `meta.json`: channel count, sampling rate, type, channel labels and source description of each stream.
+
+    All files are append-only, also when recording to an existing recording, so a recording can be read while
+    being written, and is usable after a crash up to the last chunk written.
+    Timestamps are wall clock timestamps, as Brainflow's.
+
+    :param path: Directory to record to, created if it does not exist.
+    :type path: str | Path
+    :param stay_alive: Life line to indicate that the thread should stay alive.
+    :type stay_alive: Event
+    :param index_step: Number of samples between entries of the timestamp index, defaults to 1024
+    :type index_step: int, optional
+    :param thread_name: Thread name, defaults to "session_recorder"
+    :type thread_name: str, optional
+    :param thread_daemon: Sets thread as daemon, or not, defaults to False
+    :type thread_daemon: bool, optional
+    """
+
+    def __init__(self, path: str | Path, stay_alive: Event, index_step: int = 1024,
+                 thread_name: str = "session_recorder", thread_daemon: bool = False) -> None:
+        Thread.__init__(self, name=thread_name, daemon=thread_daemon)
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.stay_alive = stay_alive
+        self.index_step = index_step
+        self.queue = queue.SimpleQueue()
+        self.lock = Lock()  # lock for meta
+        self.meta = {'streams': {}}
+        if (self.path / META_FILE).exists():
+            with open(self.path / META_FILE) as file:
+                self.meta = json.load(file)
+        self.files = {}
+        self.num_samples = {}
+
+    def add_stream(self, name: str, channel_count: int, rate: float, stream_type: str,
+                   labels: list[str] | None = None, description: dict | None = None) -> None:
+        """Adds a numeric stream to record, before recording its samples.
+
+        :param name: Stream name, used as file name.
+        :type name: str
+        :param channel_count: Number of channels.
+        :type channel_count: int
+        :param rate: Nominal sampling rate, in Hz.
+        :type rate: float
+        :param stream_type: Stream type, e.g. 'eeg'.
+        :type stream_type: str
+        :param labels: Channel labels, defaults to None
+        :type labels: list[str] | None, optional
+        :param description: Description of the source of the stream, e.g. the Brainflow board description, so
+                            the recording can be played back as that source, see `PlaybackBoard`, defaults to None
+        :type description: dict | None, optional
+        """
+        # continue numbering samples when recording to an existing recording.
+        timestamps_path = self.path / f'{name}.ts'
+        self.num_samples.setdefault(name, timestamps_path.stat().st_size // 8 if timestamps_path.exists() else 0)
+        with self.lock:
+            self.meta['streams'][name] = {'channel_count': channel_count, 'rate': rate, 'type': stream_type,
+                                          'labels': labels or [], 'dtype': np.dtype(SAMPLE_DTYPE).str}
+            if description is not None:
+                self.meta['streams'][name]['description'] = description
+            self._write_meta()
+
+    def record(self, name: str, samples: npt.ArrayLike, timestamps: npt.ArrayLike) -> None:
+        """Hands over samples of a stream to be written, the samples are copied.
+
+        :param name: Stream name, see `add_stream`.
+        :type name: str
+        :param samples: Samples, samples by channels.
+        :type samples: npt.ArrayLike
+        :param timestamps: Timestamp of each sample, ascending and later than the samples recorded before.
+        :type timestamps: npt.ArrayLike
+        """
+        self.queue.put((name, np.array(samples, dtype=SAMPLE_DTYPE, order='C'),
+                        np.array(timestamps, dtype=np.float64)))
+
+    def record_marker(self, message: str, timestamp: float) -> None:
+        """Hands over a marker to be written.
+
+        :param message: Marker message.
+        :type message: str
+        :param timestamp: Marker timestamp.
+        :type timestamp: float
+        """
+        self.queue.put((None, message, timestamp))
+
+    def run(self) -> None:
+        """Once a thread object is created, its activity must be started by calling the thread’s start() method.
+        This invokes the run() method in a separate thread of control.
+        """
+        logging.info(f"Recording session to {self.path}.")
+        try:
+            while self.stay_alive.is_set():
+                try:
+                    self._write(*self.queue.get(timeout=0.5))
+                except queue.Empty:
+                    continue
+            # write what has been handed over before stopping.
+            while True:
+                try:
+                    self._write(*self.queue.get_nowait())
+                except queue.Empty:
+                    break
+        finally:
+            for file in self.files.values():
+                file.close()
+            with self.lock:
+                self._write_meta()
+        logging.info(f"Recorded session to {self.path}: {self.num_samples}.")
+
+    def _write(self, name: str | None, samples: npt.NDArray | str, timestamps: npt.NDArray | float) -> None:
+        if name is None:
+            self._file(MARKERS_FILE).write(json.dumps([timestamps, samples]).encode() + b'\n')
+            self._file(MARKERS_FILE).flush()
+            return
+        if len(samples) == 0:
+            return
+        start = self.num_samples.get(name, 0)
+        end = start + len(samples)
+        # index every index_step-th sample of the recording, that falls within this chunk.
+        indexed = np.arange(-(-start // self.index_step) * self.index_step, end, self.index_step)
+        self._file(f'{name}.bin').write(samples.tobytes())
+        self._file(f'{name}.ts').write(timestamps.tobytes())
+        if len(indexed) > 0:
+            index = np.column_stack([timestamps[indexed - start], indexed]).astype(np.float64)
+            self._file(f'{name}.idx').write(index.tobytes())
+        for suffix in ('bin', 'ts', 'idx'):
+            self._file(f'{name}.{suffix}').flush()
+        self.num_samples[name] = end
+
+    def _file(self, name: str) -> BinaryIO:
+        if name not in self.files:
+            self.files[name] = open(self.path / name, 'ab')
+        return self.files[name]
+
+    def _write_meta(self) -> None:
+        with open(self.path / META_FILE, 'w') as file:
+            json.dump(self.meta, file, indent=4)
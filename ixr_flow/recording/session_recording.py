@@ -0,0 +1,198 @@
+import json
+import struct
+from pathlib import Path
+from typing import BinaryIO
+from xml.sax.saxutils import escape
+
+import numpy as np
+import numpy.typing as npt
+
+from .session_recorder import MARKERS_FILE, META_FILE
+
+
+class SessionRecording:
+    """Reads a session recorded by `SessionRecorder`. Samples are memory-mapped, and time ranges are located with
+    the coarse timestamp index, so an epoch of a recording of hours is sliced without reading the recording.
+    A recording can be read while it is being written, only complete samples are read.
+
+    :param path: Directory of the recording.
+    :type path: str | Path
+    """
+
+    xdf_block_size = 4096  # number of samples per XDF samples chunk.
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with open(self.path / META_FILE) as file:
+            self.streams = json.load(file)['streams']
+
+    def num_samples(self, name: str) -> int:
+        """Returns the number of complete samples recorded of a stream.
+
+        :param name: Stream name.
+        :type name: str
+        :return: Returns the number of samples.
+        :rtype: int
+        """
+        stream = self.streams[name]
+        if not (self.path / f'{name}.ts').exists():
+            return 0  # nothing recorded yet.
+        sample_size = np.dtype(stream['dtype']).itemsize * stream['channel_count']
+        # the samples and timestamps of a chunk may be partially written while recording.
+        return min((self.path / f'{name}.bin').stat().st_size // sample_size,
+                   (self.path / f'{name}.ts').stat().st_size // 8)
+
+    def samples(self, name: str) -> npt.NDArray:
+        """Returns all samples of a stream, memory-mapped, samples by channels.
+
+        :param name: Stream name.
+        :type name: str
+        :return: Returns the samples.
+        :rtype: npt.NDArray
+        """
+        stream = self.streams[name]
+        num_samples = self.num_samples(name)
+        if num_samples == 0:
+            return np.empty((0, stream['channel_count']), dtype=stream['dtype'])
+        return np.memmap(self.path / f'{name}.bin', dtype=stream['dtype'], mode='r',
+                         shape=(num_samples, stream['channel_count']))
+
+    def timestamps(self, name: str) -> npt.NDArray[np.float64]:
+        """Returns the timestamps of all samples of a stream, memory-mapped.
+
+        :param name: Stream name.
+        :type name: str
+        :return: Returns the timestamps.
+        :rtype: npt.NDArray[np.float64]
+        """
+        num_samples = self.num_samples(name)
+        if num_samples == 0:
+            return np.empty(0, dtype=np.float64)
+        return np.memmap(self.path / f'{name}.ts', dtype=np.float64, mode='r', shape=(num_samples,))
+
+    def _locate(self, name: str, timestamps: npt.NDArray[np.float64], timestamp: float, side: str) -> int:
+        """Finds the sample number at which timestamp would be inserted, see `np.searchsorted`,
+        only searching the timestamps between the surrounding entries of the index.
+        """
+        index_path = self.path / f'{name}.idx'
+        index = np.fromfile(index_path, dtype=np.float64).reshape(-1, 2) if index_path.exists() \
+            else np.empty((0, 2))
+        index = index[index[:, 1] < len(timestamps)]
+        position = np.searchsorted(index[:, 0], timestamp, side=side)
+        low = int(index[position - 1, 1]) if position > 0 else 0
+        high = int(index[position, 1]) + 1 if position < len(index) else len(timestamps)
+        return low + int(np.searchsorted(timestamps[low:high], timestamp, side=side))
+
+    def slice(self, name: str, start: float, end: float) -> tuple[npt.NDArray, npt.NDArray[np.float64]]:
+        """Returns the samples of a stream with timestamps from start up to and including end.
+
+        :param name: Stream name.
+        :type name: str
+        :param start: Start timestamp, in s.
+        :type start: float
+        :param end: End timestamp, in s.
+        :type end: float
+        :return: Returns the samples, samples by channels, and their timestamps, as memory-mapped views.
+        :rtype: tuple[npt.NDArray, npt.NDArray[np.float64]]
+        """
+        timestamps = self.timestamps(name)
+        first = self._locate(name, timestamps, start, 'left')
+        last = self._locate(name, timestamps, end, 'right')
+        return self.samples(name)[first:last], timestamps[first:last]
+
+    def epoch(self, name: str, event_timestamp: float,
+              time_range: list[int]) -> tuple[npt.NDArray, npt.NDArray[np.float64]]:
+        """Returns the samples of a stream within a time range around an event.
+
+        :param name: Stream name.
+        :type name: str
+        :param event_timestamp: Event timestamp, in s.
+        :type event_timestamp: float
+        :param time_range: Time range relative to the event, in ms.
+        :type time_range: list[int]
+        :return: Returns the samples, samples by channels, and their timestamps, as memory-mapped views.
+        :rtype: tuple[npt.NDArray, npt.NDArray[np.float64]]
+        """
+        return self.slice(name, event_timestamp + time_range[0] / 1000, event_timestamp + time_range[1] / 1000)
+
+    def markers(self) -> list[tuple[float, str]]:
+        """Returns all markers, an incompletely written last marker is skipped.
+
+        :return: Returns the timestamp and message of each marker.
+        :rtype: list[tuple[float, str]]
+        """
+        markers = []
+        if not (self.path / MARKERS_FILE).exists():
+            return markers
+        with open(self.path / MARKERS_FILE) as file:
+            for line in file:
+                try:
+                    timestamp, message = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                markers.append((timestamp, message))
+        return markers
+
+    def export_xdf(self, path: str | Path, marker_stream: str = 'SendMarkersOnClick') -> None:
+        """Exports the recording to an XDF file, e.g. to be loaded with `pyxdf.load_xdf`.
+        Every stream becomes an XDF stream, the markers a string stream named marker_stream.
+        Timestamps are exported as recorded, no clock offsets are written.
+
+        :param path: XDF file to write.
+        :type path: str | Path
+        :param marker_stream: Name of the marker stream, defaults to 'SendMarkersOnClick'
+        :type marker_stream: str, optional
+        """
+        with open(path, 'wb') as file:
+            file.write(b'XDF:')
+            self._write_chunk(file, 1, b'<?xml version="1.0"?><info><version>1.0</version></info>')
+            for stream_id, (name, stream) in enumerate(self.streams.items(), start=1):
+                samples, timestamps = self.samples(name), self.timestamps(name)
+                self._write_header(file, stream_id, name, stream['type'], stream['channel_count'], stream['rate'],
+                                   'double64', stream['labels'])
+                record = np.dtype([('timestamp_bytes', 'u1'), ('timestamp', '<f8'),
+                                   ('values', '<f8', (stream['channel_count'],))])
+                for start in range(0, len(timestamps), self.xdf_block_size):
+                    block = np.empty(min(self.xdf_block_size, len(timestamps) - start), dtype=record)
+                    block['timestamp_bytes'] = 8
+                    block['timestamp'] = timestamps[start:start + len(block)]
+                    block['values'] = samples[start:start + len(block)]
+                    self._write_chunk(file, 3, struct.pack('<I', stream_id) + self._varlen(len(block))
+                                      + block.tobytes())
+                self._write_footer(file, stream_id, timestamps)
+
+            markers = self.markers()
+            stream_id = len(self.streams) + 1
+            self._write_header(file, stream_id, marker_stream, 'Markers', 1, 0, 'string', [])
+            if len(markers) > 0:
+                self._write_chunk(file, 3, struct.pack('<I', stream_id) + self._varlen(len(markers)) + b''.join(
+                    b'\x08' + struct.pack('<d', timestamp) + self._varlen(len(message.encode()))
+                    + message.encode() for timestamp, message in markers))
+            self._write_footer(file, stream_id, np.array([timestamp for timestamp, _ in markers]))
+
+    @staticmethod
+    def _varlen(value: int) -> bytes:
+        """Encodes a length as XDF variable length integer."""
+        if value < 2 ** 8:
+            return struct.pack('<BB', 1, value)
+        if value < 2 ** 32:
+            return struct.pack('<BI', 4, value)
+        return struct.pack('<BQ', 8, value)
+
+    def _write_chunk(self, file: BinaryIO, tag: int, content: bytes) -> None:
+        file.write(self._varlen(len(content) + 2) + struct.pack('<H', tag) + content)
+
+    def _write_header(self, file: BinaryIO, stream_id: int, name: str, stream_type: str, channel_count: int,
+                      rate: float, channel_format: str, labels: list[str]) -> None:
+        channels = ''.join(f'<channel><label>{escape(label)}</label></channel>' for label in labels)
+        info = (f'<?xml version="1.0"?><info><name>{escape(name)}</name><type>{escape(stream_type)}</type>'
+                f'<channel_count>{channel_count}</channel_count><nominal_srate>{rate}</nominal_srate>'
+                f'<channel_format>{channel_format}</channel_format><created_at>0</created_at>'
+                f'<desc><channels>{channels}</channels></desc></info>')
+        self._write_chunk(file, 2, struct.pack('<I', stream_id) + info.encode())
+
+    def _write_footer(self, file: BinaryIO, stream_id: int, timestamps: npt.NDArray[np.float64]) -> None:
+        first, last = (timestamps[0], timestamps[-1]) if len(timestamps) > 0 else (0.0, 0.0)
+        info = (f'<?xml version="1.0"?><info><first_timestamp>{first}</first_timestamp>'
+                f'<last_timestamp>{last}</last_timestamp><sample_count>{len(timestamps)}</sample_count></info>')
+        self._write_chunk(file, 6, struct.pack('<I', stream_id) + info.encode())
@@ -0,0 +1,18 @@
+import time
+
+import pytest
+
+from ixr_flow.board import SyntheticBoard
+
+
+@pytest.fixture(scope='session')
+def board():
+    """Synthetic board streaming in real time, holding two seconds of samples before the first test uses it.
+    Classifiers fetch the latest samples, so events should lie within the last second.
+    """
+    board = SyntheticBoard()
+    board.prepare_session()
+    board.start_stream()
+    time.sleep(2.0)
+    yield board
+    board.release_session()
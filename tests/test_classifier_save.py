@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+import pytest
+
+from ixr_flow.classifiers import Classifier, ClfError
+from ixr_flow.classifiers.epoch_store import EpochStore, save_array
+
+
+@pytest.fixture
+def classifier(board):
+    classifier = Classifier(board, 'lda', [-400, 600], [1, 30], 'windowed-average-EEG')
+    for i in range(20):
+        classifier.collect_sample(i % 2, board.time() - 0.8)
+    classifier.train(use_cv=False)
+    return classifier
+
+
+def assert_same_classifier(loaded, classifier):
+    np.testing.assert_array_equal(loaded.train_x.data, classifier.train_x.data)
+    assert loaded.train_y == classifier.train_y
+    assert len(loaded.epochs) == len(classifier.epochs)
+    for key in classifier.epochs.shapes:
+        np.testing.assert_array_equal(loaded.epochs.epochs[key].data, classifier.epochs.epochs[key].data)
+    np.testing.assert_array_equal(loaded.model.coef_, classifier.model.coef_)
+
+
+def test_save_and_load(classifier, board, tmp_path):
+    classifier.save(tmp_path)
+    loaded = Classifier.load(tmp_path, board)
+    assert isinstance(loaded.train_x.data, np.memmap)
+    assert_same_classifier(loaded, classifier)
+
+
+def test_save_over_the_directory_loaded_from(classifier, board, tmp_path):
+    classifier.save(tmp_path)
+    loaded = Classifier.load(tmp_path, board)
+    loaded.save(tmp_path)
+    loaded.save(tmp_path)
+    assert_same_classifier(Classifier.load(tmp_path, board), classifier)
+    assert not any(path.suffix == '.tmp' for path in tmp_path.iterdir())
+
+
+def test_save_after_collecting_more_samples(classifier, board, tmp_path):
+    classifier.save(tmp_path)
+    loaded = Classifier.load(tmp_path, board)
+    loaded.collect_sample(1, board.time() - 0.8)
+    loaded.save(tmp_path)
+    reloaded = Classifier.load(tmp_path, board)
+    assert len(reloaded.train_y) == len(reloaded.epochs) == 21
+    np.testing.assert_array_equal(reloaded.train_x.data[:20], classifier.train_x.data)
+
+
+def test_load_without_save(board, tmp_path):
+    with pytest.raises(ClfError, match="No saved classifier found"):
+        Classifier.load(tmp_path, board)
+
+
+def test_load_incomplete_save(classifier, board, tmp_path):
+    classifier.save(tmp_path)
+    (tmp_path / 'params.json').unlink()
+    with pytest.raises(ClfError, match="corrupt"):
+        Classifier.load(tmp_path, board)
+
+
+@pytest.mark.parametrize('name, content', [('params.json', b'{"board_id": '), ('model.pkl', b'not a pickle'),
+                                           ('train_x.npy', b'not an array')])
+def test_load_corrupt_save(classifier, board, tmp_path, name, content):
+    classifier.save(tmp_path)
+    (tmp_path / name).write_bytes(content)
+    with pytest.raises(ClfError, match="corrupt"):
+        Classifier.load(tmp_path, board)
+
+
+def test_load_save_of_another_board(classifier, board, tmp_path):
+    classifier.save(tmp_path)
+    params = json.loads((tmp_path / 'params.json').read_text())
+    (tmp_path / 'params.json').write_text(json.dumps(params | {'board_id': params['board_id'] + 1}))
+    with pytest.raises(ClfError, match="another board"):
+        Classifier.load(tmp_path, board)
+
+
+def test_save_array_over_its_memory_map(tmp_path):
+    path = tmp_path / 'array.npy'
+    np.save(path, np.arange(100_000, dtype=np.float64))
+    mapped = np.load(path, mmap_mode='r')
+    save_array(path, mapped)
+    np.testing.assert_array_equal(np.load(path), np.arange(100_000, dtype=np.float64))
+    np.testing.assert_array_equal(mapped, np.arange(100_000, dtype=np.float64))
+
+
+def test_epoch_store_save_over_the_directory_loaded_from(tmp_path):
+    store = EpochStore(-0.5, {'eeg': (3, 10)}, {'eeg': 2})
+    rng = np.random.default_rng(0)
+    for event in range(5):
+        data = rng.standard_normal((3, 40))
+        data[2] = event + np.arange(40) / 20 - 1.0
+        store.append(float(event), {'eeg': data})
+    store.save(tmp_path)
+
+    loaded = EpochStore(-0.5, {'eeg': (3, 10)}, {'eeg': 2})
+    loaded.load(tmp_path)
+    loaded.save(tmp_path)
+    reloaded = EpochStore(-0.5, {'eeg': (3, 10)}, {'eeg': 2})
+    reloaded.load(tmp_path)
+    assert len(reloaded) == 5
+    for index in range(5):
+        np.testing.assert_array_equal(reloaded.get(index)['eeg'], store.get(index)['eeg'])
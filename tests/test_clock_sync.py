@@ -0,0 +1,37 @@
+import time
+from threading import Event
+
+import pytest
+from pylsl import local_clock
+
+from ixr_flow.lsl_utility.clock_sync import ClockSync
+
+
+def test_maps_the_lsl_clock_to_the_wall_clock():
+    clock_sync = ClockSync(Event())
+    assert clock_sync.lsl_to_local(local_clock()) == pytest.approx(time.time(), abs=0.01)
+    assert clock_sync.local_to_lsl(time.time()) == pytest.approx(local_clock(), abs=0.01)
+
+
+def test_follows_a_drifting_offset(monkeypatch):
+    clock_sync = ClockSync(Event(), window=10)
+    clock_sync.measurements.clear()
+    lsl_times = iter(range(100, 130))
+    # the wall clock runs 100 ppm fast, the offset is 5 s at LSL time 0.
+    monkeypatch.setattr(clock_sync, 'measure', lambda: (lsl_time := next(lsl_times), 5.0 + 1e-4 * lsl_time))
+    for _ in range(30):
+        clock_sync.update()
+    assert len(clock_sync.measurements) == 10
+    assert clock_sync.drift == pytest.approx(1e-4)
+    assert clock_sync.lsl_to_local(200.0) == pytest.approx(200.0 + 5.0 + 0.02)
+    assert clock_sync.local_to_lsl(clock_sync.lsl_to_local(200.0)) == pytest.approx(200.0)
+
+
+def test_smooths_out_a_disturbed_measurement(monkeypatch):
+    clock_sync = ClockSync(Event(), window=50)
+    clock_sync.measurements.clear()
+    measurements = iter([(float(lsl_time), 0.5 if lsl_time == 25 else 1.0) for lsl_time in range(50)])
+    monkeypatch.setattr(clock_sync, 'measure', lambda: next(measurements))
+    for _ in range(50):
+        clock_sync.update()
+    assert clock_sync.lsl_to_local(50.0) == pytest.approx(51.0, abs=0.02)
@@ -0,0 +1,83 @@
+import threading
+import time
+
+from ixr_flow.lsl_utility.command_dispatcher import CommandDispatcher
+
+
+def nothing():
+    pass
+
+
+def test_commands_of_a_key_run_in_order():
+    dispatcher = CommandDispatcher(max_workers=4)
+    executed = {'a': [], 'b': []}
+    for number in range(50):
+        for key in executed:
+            # later commands are faster, so they would overtake earlier ones when run in parallel.
+            dispatcher.submit(key, lambda key, number: (time.sleep((50 - number) / 50000),
+                                                        executed[key].append(number)), key, number)
+    dispatcher.shutdown()
+    assert executed == {'a': list(range(50)), 'b': list(range(50))}
+
+
+def test_commands_of_a_key_run_one_at_a_time():
+    dispatcher = CommandDispatcher(max_workers=4)
+    running, overlaps = [], []
+
+    def command():
+        running.append(1)
+        overlaps.append(len(running))
+        time.sleep(0.001)
+        running.pop()
+
+    for _ in range(20):
+        dispatcher.submit('a', command)
+    dispatcher.shutdown()
+    assert overlaps == [1] * 20
+
+
+def test_commands_of_different_keys_run_in_parallel():
+    dispatcher = CommandDispatcher(max_workers=2)
+    barrier = threading.Barrier(2, timeout=5)
+    dispatcher.submit('a', barrier.wait)
+    dispatcher.submit('b', barrier.wait)
+    dispatcher.shutdown()
+    assert not barrier.broken
+    assert dispatcher.stats()['a']['executed'] == dispatcher.stats()['b']['executed'] == 1
+
+
+def test_a_full_queue_rejects_commands_after_the_timeout():
+    dispatcher = CommandDispatcher(max_workers=1, max_queue_depth=2)
+    release = threading.Event()
+    dispatcher.submit('a', release.wait)
+    while dispatcher.stats()['a']['depth'] > 0:  # wait until the first command left its queue.
+        time.sleep(0.001)
+    assert dispatcher.submit('a', nothing) and dispatcher.submit('a', nothing)
+    assert not dispatcher.submit('a', nothing, timeout=0.05)
+    release.set()
+    dispatcher.shutdown()
+    stats = dispatcher.stats()['a']
+    assert (stats['executed'], stats['rejected'], stats['max_depth']) == (3, 1, 2)
+
+
+def test_exceptions_do_not_stop_the_queue(caplog):
+    dispatcher = CommandDispatcher()
+    executed = []
+    dispatcher.submit('a', lambda: 1 / 0)
+    dispatcher.submit('a', executed.append, 1)
+    dispatcher.shutdown()
+    assert executed == [1]
+    assert "command of 'a'" in caplog.text
+
+
+def test_wait_idle_and_stats_by_prefix():
+    dispatcher = CommandDispatcher()
+    release = threading.Event()
+    dispatcher.submit('p1/a', release.wait)
+    dispatcher.submit('p2/a', nothing)
+    dispatcher.wait_idle('p2/')
+    assert dispatcher.stats('p2/') == {'a': dispatcher.stats()['p2/a']}
+    assert dispatcher.stats('p1/')['a']['executed'] == 0
+    release.set()
+    dispatcher.shutdown()
+    assert dispatcher.stats('p1/')['a']['executed'] == 1
@@ -0,0 +1,70 @@
+import pytest
+
+from ixr_flow.lsl_utility.commands import (AutoUpdateCommand, CollectCommand, CreateCommand, DecodeError,
+                                           PredictCommand, RefeaturizeCommand, StreamCommand, TrainCommand,
+                                           parse_message)
+
+
+def test_parses_a_single_command():
+    assert parse_message('create;w;lda;-400,600;1,30;filter-bank') == \
+        [CreateCommand('w', 'lda', [-400, 600], [1.0, 30.0], 'filter-bank')]
+
+
+def test_parses_commands_separated_by_new_lines():
+    assert parse_message('collect;w;1\ntrain;w\n\npredict;w') == \
+        [CollectCommand('w', 1), TrainCommand('w'), PredictCommand('w')]
+
+
+def test_empty_fields_keep_their_defaults():
+    assert parse_message('refeaturize;w;;5,30') == [RefeaturizeCommand('w', None, [5.0, 30.0], None)]
+    assert parse_message('auto-update;w') == [AutoUpdateCommand('w', True)]
+
+
+def test_parses_json_objects_and_arrays():
+    assert parse_message('{"task": "collect", "name": "w", "label": 1}') == [CollectCommand('w', 1)]
+    assert parse_message('[{"task": "stream", "name": "w", "rate": 20}, {"task": "train", "name": "w"}]') == \
+        [StreamCommand('w', 20.0), TrainCommand('w')]
+
+
+def test_json_values_may_be_strings_as_in_the_separated_format():
+    assert parse_message('{"task": "create", "name": "w", "model_type": "lda", "time_range": "-400,600", '
+                         '"filter_freq_cutoff": [1, 30], "method": "windowed-average-EEG"}') == \
+        [CreateCommand('w', 'lda', [-400, 600], [1.0, 30.0], 'windowed-average-EEG')]
+
+
+def test_json_null_values_keep_their_defaults():
+    assert parse_message('{"task": "auto-update", "name": "w", "enabled": null}') == [AutoUpdateCommand('w', True)]
+    assert parse_message('{"task": "auto-update", "name": "w", "enabled": false}') == [AutoUpdateCommand('w', False)]
+
+
+@pytest.mark.parametrize('message', [
+    '',
+    '   \n ',
+    'unknown;w',
+    'collect;w',
+    'collect;w;one',
+    'create;w;lda;-400,600;1,30',
+    '{"task": "collect", "name": "w"',
+    '{"name": "w"}',
+    '{"task": [1]}',
+    '{"task": {"task": "train"}}',
+    '[{"task": 1}]',
+    '"train"',
+    '[1, 2]',
+    '{"task": "train", "name": "w", "label": 1}',
+    '{"task": "train", "name": 1}',
+    '{"task": "collect", "name": "w", "label": 1.5}',
+    '{"task": "collect", "name": "w", "label": true}',
+    '{"task": "collect", "name": "w", "label": [1]}',
+    '{"task": "create", "name": "w", "model_type": "lda", "time_range": [-400, "x"], '
+    '"filter_freq_cutoff": [1, 30], "method": "windowed-average-EEG"}',
+    '{"task": "stream", "name": "w", "rate": {}}',
+])
+def test_rejects_invalid_messages(message):
+    with pytest.raises(DecodeError):
+        parse_message(message)
+
+
+def test_a_message_with_an_invalid_command_is_rejected_as_a_whole():
+    with pytest.raises(DecodeError):
+        parse_message('collect;w;1\ncollect;w;x')
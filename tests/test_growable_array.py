@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from ixr_flow.classifiers.epoch_store import GrowableArray
+
+
+@pytest.mark.parametrize('in_file', [False, True])
+def test_appends_rows_beyond_the_capacity(tmp_path, in_file):
+    array = GrowableArray(capacity=2, path=tmp_path / 'rows.dat' if in_file else None)
+    rows = np.arange(30, dtype=np.float64).reshape(10, 3)
+    for row in rows:
+        array.append(row)
+    assert len(array) == 10
+    assert array.capacity >= 10
+    np.testing.assert_array_equal(array.data, rows)
+    assert isinstance(array.buffer, np.memmap) == in_file
+
+
+def test_empty_array_has_the_row_shape():
+    assert GrowableArray((2, 3)).data.shape == (0, 2, 3)
+    assert GrowableArray().data.shape == (0,)
+
+
+def test_rejects_rows_of_another_shape():
+    array = GrowableArray()
+    array.append([1.0, 2.0])
+    with pytest.raises(ValueError):
+        array.append([1.0, 2.0, 3.0])
+
+
+@pytest.mark.parametrize('in_file', [False, True])
+def test_views_are_snapshots_that_survive_growing(tmp_path, in_file):
+    array = GrowableArray((), capacity=1, path=tmp_path / 'rows.dat' if in_file else None)
+    array.append(1.0)
+    view = array.data
+    for value in range(2, 10):
+        array.append(value)
+    np.testing.assert_array_equal(view, [1.0])
+    np.testing.assert_array_equal(array.data, np.arange(1, 10))
+
+
+def test_grows_into_new_files_and_removes_the_previous_ones(tmp_path):
+    array = GrowableArray((), capacity=1, path=tmp_path / 'rows.dat')
+    for value in range(5):
+        array.append(value)
+    assert array.generation > 1
+    assert [path.name for path in tmp_path.iterdir()] == [f'rows.{array.generation}.dat']
+
+
+def test_wrap_copies_only_when_appending(tmp_path):
+    np.save(tmp_path / 'rows.npy', np.ones((3, 2)))
+    mapped = np.load(tmp_path / 'rows.npy', mmap_mode='r')
+    array = GrowableArray.wrap(mapped)
+    assert np.shares_memory(array.data, mapped)
+    array.append([2.0, 2.0])
+    np.testing.assert_array_equal(array.data, [[1.0, 1.0]] * 3 + [[2.0, 2.0]])
+    np.testing.assert_array_equal(mapped, np.ones((3, 2)))
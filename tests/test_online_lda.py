@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+from sklearn.exceptions import NotFittedError
+
+from ixr_flow.classifiers.online import OnlineLDA
+
+
+def make_data(n_samples, n_features=8, seed=0):
+    """Two classes of correlated features, the same distribution for every seed."""
+    mixing = np.random.default_rng(n_features).standard_normal((n_features, n_features)) / np.sqrt(n_features)
+    y = np.arange(n_samples) % 2
+    x = np.random.default_rng(seed).standard_normal((n_samples, n_features)) @ mixing + y[:, None]
+    return x, y
+
+
+def test_partial_fit_in_chunks_equals_fit():
+    x, y = make_data(60)
+    fitted = OnlineLDA().fit(x, y)
+    online = OnlineLDA()
+    for start in range(0, 60, 7):
+        online.partial_fit(x[start:start + 7], y[start:start + 7])
+    np.testing.assert_allclose(online.means_, fitted.means_)
+    np.testing.assert_allclose(online.scatter_, fitted.scatter_)
+    np.testing.assert_allclose(online.decision_function(x), fitted.decision_function(x))
+
+
+def test_fit_resets_the_model():
+    x, y = make_data(40)
+    model = OnlineLDA().fit(*make_data(40, seed=1))
+    model.fit(x, y)
+    np.testing.assert_allclose(model.decision_function(x), OnlineLDA().fit(x, y).decision_function(x))
+    np.testing.assert_array_equal(model.counts_, [20, 20])
+
+
+def test_without_shrinkage_the_discriminant_is_the_one_of_lda():
+    x, y = make_data(200)
+    online = OnlineLDA(shrinkage=0.0).fit(x, y)
+    online.predict(x)
+    reference = LinearDiscriminantAnalysis(solver='lsqr').fit(x, y)
+    # the pooled covariance is normalised differently, so the discriminants only agree in direction.
+    coef = online._coef[1] - online._coef[0]
+    np.testing.assert_allclose(coef / np.linalg.norm(coef), reference.coef_[0] / np.linalg.norm(reference.coef_[0]))
+
+
+@pytest.mark.parametrize('n_samples', [10, 20, 40, 200])
+def test_predictions_agree_with_shrinkage_lda(n_samples):
+    x, y = make_data(n_samples, n_features=16)
+    test_x, test_y = make_data(400, n_features=16, seed=1)
+    online = OnlineLDA().fit(x, y)
+    reference = LinearDiscriminantAnalysis(solver='lsqr', shrinkage='auto').fit(x, y)
+    assert np.mean(online.predict(test_x) == reference.predict(test_x)) >= 0.9
+    assert online.score(test_x, test_y) >= reference.score(test_x, test_y) - 0.1
+
+
+def test_auto_shrinkage_decreases_with_more_samples():
+    def shrinkage(model):
+        covariance = model._covariance()
+        return 1 - covariance[0, 1] / (model.scatter_[0, 1] / (model.counts_.sum() - 2))
+
+    x, y = make_data(1000, n_features=16)
+    assert 0.0 < shrinkage(OnlineLDA().fit(x[:20], y[:20])) <= 1.0
+    assert shrinkage(OnlineLDA().fit(x, y)) < shrinkage(OnlineLDA().fit(x[:20], y[:20]))
+
+
+def test_predicts_more_than_two_classes():
+    rng = np.random.default_rng(0)
+    y = np.arange(90) % 3
+    x = rng.standard_normal((90, 4)) + 3.0 * np.eye(4)[y]
+    model = OnlineLDA().fit(x, y)
+    assert model.decision_function(x).shape == (90, 3)
+    assert model.score(x, y) > 0.9
+
+
+def test_predicting_needs_two_classes():
+    model = OnlineLDA()
+    with pytest.raises(NotFittedError):
+        model.predict(np.zeros((1, 3)))
+    model.partial_fit(np.ones((3, 3)), [0, 0, 0])
+    with pytest.raises(NotFittedError):
+        model.predict(np.zeros((1, 3)))
+    model.partial_fit(np.zeros((1, 3)), [1])
+    assert model.predict(np.ones((1, 3))) == [0]
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from ixr_flow.board.board_buffer import SampleRing
+
+
+def samples(first, count):
+    """Board data of two rows, the sample number and its negation."""
+    numbers = np.arange(first, first + count, dtype=np.float64)
+    return np.stack([numbers, -numbers])
+
+
+def test_empty_ring_returns_no_samples():
+    ring = SampleRing(2, 8)
+    assert len(ring) == 0
+    assert ring.latest(4).shape == (2, 0)
+
+
+def test_returns_the_latest_samples():
+    ring = SampleRing(2, 8)
+    ring.write(samples(0, 5))
+    assert len(ring) == 5
+    np.testing.assert_array_equal(ring.latest(3), samples(2, 3))
+    np.testing.assert_array_equal(ring.latest(100), samples(0, 5))
+    assert ring.latest(0).shape == (2, 0)
+
+
+@pytest.mark.parametrize('chunk', [1, 3, 7, 8, 20])
+def test_keeps_the_latest_capacity_samples_across_wraparounds(chunk):
+    ring = SampleRing(2, 8)
+    written = 0
+    while written < 50:
+        ring.write(samples(written, chunk))
+        written += chunk
+        assert ring.count == written
+        assert len(ring) == min(written, 8)
+        for num_samples in range(9):
+            expected = samples(max(written - num_samples, written - 8, 0), min(num_samples, written))
+            np.testing.assert_array_equal(ring.latest(num_samples), expected)
+
+
+def test_latest_is_a_contiguous_read_only_view():
+    ring = SampleRing(2, 8)
+    ring.write(samples(0, 13))
+    view = ring.latest(8)
+    assert np.shares_memory(view, ring.data)
+    with pytest.raises(ValueError):
+        view[0, 0] = 1.0
+
+
+def test_views_stay_valid_until_overwritten():
+    ring = SampleRing(2, 8)
+    ring.write(samples(0, 6))
+    view = ring.latest(3)
+    ring.write(samples(6, 5))
+    np.testing.assert_array_equal(view, samples(3, 3))
@@ -0,0 +1,81 @@
+from multiprocessing import get_context
+
+import numpy as np
+import pytest
+from brainflow import BrainFlowPresets
+
+from ixr_flow.board import SyntheticBoard
+from ixr_flow.board.board_state import BoardState
+from ixr_flow.board.shared_board_buffer import SharedBoardBuffer
+
+
+@pytest.fixture
+def context():
+    return get_context('spawn')
+
+
+@pytest.fixture
+def buffer(context):
+    buffer = SharedBoardBuffer.create(SyntheticBoard(num_channels=2, sampling_rate=100), 2.0, context.Condition())
+    yield buffer
+    buffer.shared_memory.close()
+    SharedBoardBuffer.remove(buffer.spec)
+
+
+def read_latest(spec, condition, num_samples, results):
+    """Reads the latest samples from a buffer attached to in another process."""
+    buffer = SharedBoardBuffer.attach(spec, condition)
+    results.put((buffer.board_state.state, buffer.get_current_board_data(num_samples).copy()))
+    buffer.shared_memory.close()
+
+
+def board_data(buffer, first, count):
+    rows = buffer.descriptions[int(BrainFlowPresets.DEFAULT_PRESET)]['num_rows']
+    return np.arange(first, first + count, dtype=np.float64) + np.arange(rows)[:, None] * 1000
+
+
+def test_describes_the_board(buffer):
+    board_id = buffer.get_board_id()
+    assert buffer.get_sampling_rate(board_id) == 100
+    assert buffer.get_eeg_channels(board_id) == [1, 2]
+    assert buffer.get_sampling_rate(board_id, BrainFlowPresets.AUXILIARY_PRESET) == 52
+    assert buffer.get_board_data_count() == 0
+    assert not buffer.is_prepared()
+
+
+def test_attached_buffers_share_the_samples(buffer):
+    attached = SharedBoardBuffer.attach(buffer.spec, buffer.board_state.condition)
+    buffer.write(BrainFlowPresets.DEFAULT_PRESET, board_data(buffer, 0, 300))
+    assert attached.get_board_data_count() == buffer.get_board_data_count() == 200
+    np.testing.assert_array_equal(attached.get_current_board_data(10), board_data(buffer, 290, 10))
+    attached.shared_memory.close()
+
+
+def test_another_process_reads_the_samples(buffer, context):
+    buffer.write(BrainFlowPresets.DEFAULT_PRESET, board_data(buffer, 0, 100))
+    buffer.board_state.state = BoardState.READY
+    results = context.Queue()
+    process = context.Process(target=read_latest, args=(buffer.spec, buffer.board_state.condition, 20, results))
+    process.start()
+    state, data = results.get(timeout=30)
+    process.join(timeout=30)
+    assert process.exitcode == 0
+    assert state == BoardState.READY
+    np.testing.assert_array_equal(data, board_data(buffer, 80, 20))
+
+
+def test_every_preset_has_its_own_ring(buffer):
+    rows = buffer.descriptions[int(BrainFlowPresets.AUXILIARY_PRESET)]['num_rows']
+    buffer.write(BrainFlowPresets.AUXILIARY_PRESET, np.ones((rows, 30)))
+    buffer.write(BrainFlowPresets.DEFAULT_PRESET, board_data(buffer, 0, 10))
+    assert buffer.get_board_data_count(BrainFlowPresets.AUXILIARY_PRESET) == 30
+    assert buffer.get_board_data_count(BrainFlowPresets.ANCILLARY_PRESET) == 0
+    np.testing.assert_array_equal(buffer.get_current_board_data(50, BrainFlowPresets.AUXILIARY_PRESET),
+                                  np.ones((rows, 30)))
+
+
+def test_remove_frees_the_shared_memory_once(buffer):
+    SharedBoardBuffer.remove(buffer.spec)
+    with pytest.raises(FileNotFoundError):
+        SharedBoardBuffer.attach(buffer.spec, buffer.board_state.condition)
+    SharedBoardBuffer.remove(buffer.spec)
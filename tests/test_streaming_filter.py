@@ -0,0 +1,57 @@
+import numpy as np
+from scipy import signal
+
+from ixr_flow.classifiers.filters import StreamingFilter, bandpass_sos
+
+
+def stream(num_samples=2000, sample_rate=250.0):
+    rng = np.random.default_rng(0)
+    data = np.cumsum(rng.standard_normal((3, num_samples)), axis=1) + 50.0
+    return data, 1000.0 + np.arange(num_samples) / sample_rate
+
+
+def filtered_at_once(sos, data):
+    zi = signal.sosfilt_zi(sos)[:, np.newaxis, :] * data[:, :1]
+    return signal.sosfilt(sos, data, axis=1, zi=zi)[0]
+
+
+def test_overlapping_windows_equal_filtering_at_once():
+    sos = bandpass_sos((1.0, 30.0), 250.0)
+    data, timestamps = stream()
+    expected = filtered_at_once(sos, data)
+    streaming = StreamingFilter(sos, 3, 500)
+    # windows of 250 samples, every 37 samples, as when predicting on a sliding window.
+    for end in range(250, 2000, 37):
+        window = slice(end - 250, end)
+        np.testing.assert_allclose(streaming.filter(data[:, window], timestamps[window]), expected[:, window])
+    assert streaming.last_timestamp == timestamps[end - 1]
+
+
+def test_windows_with_a_gap_start_over():
+    sos = bandpass_sos((1.0, 30.0), 250.0)
+    data, timestamps = stream()
+    streaming = StreamingFilter(sos, 3, 500)
+    streaming.filter(data[:, :250], timestamps[:250])
+    np.testing.assert_allclose(streaming.filter(data[:, 600:850], timestamps[600:850]),
+                               filtered_at_once(sos, data[:, 600:850]))
+
+
+def test_windows_before_the_history_start_over():
+    sos = bandpass_sos((1.0, 30.0), 250.0)
+    data, timestamps = stream()
+    streaming = StreamingFilter(sos, 3, 100)
+    streaming.filter(data[:, :500], timestamps[:500])
+    np.testing.assert_allclose(streaming.filter(data[:, 300:600], timestamps[300:600]),
+                               filtered_at_once(sos, data[:, 300:600]))
+    assert streaming.history.shape == (3, 100)
+
+
+def test_reset_clears_the_state():
+    sos = bandpass_sos((1.0, 30.0), 250.0)
+    data, timestamps = stream()
+    streaming = StreamingFilter(sos, 3, 500)
+    streaming.filter(data[:, :250], timestamps[:250])
+    streaming.reset()
+    assert streaming.last_timestamp == 0.0
+    np.testing.assert_allclose(streaming.filter(data[:, 100:350], timestamps[100:350]),
+                               filtered_at_once(sos, data[:, 100:350]))